@@ -0,0 +1,185 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read-only, memory-mapped store of the Chemical Component Dictionary (CCD).
+
+Both engines ship the CCD as one pickle (`ccd.pickle` of CIF dicts for the JAX
+engine, `ccd_v2.pkl` of RDKit molecules for the PyTorch engine) that every
+process unpickles in full at startup: several GB of resident memory and tens of
+seconds per process, repeated for every per-GPU worker and preprocessing worker
+on a node, although a run only ever touches a few hundred components.
+
+`open_for_pickle` converts the pickle once into a store file next to it
+(`<name>.ccdstore`, rebuilt when the pickle is newer) and maps it read-only:
+
+  header   magic, index offset, index length
+  entries  one encoded component after the other
+  index    JSON {component id: [offset, length]}
+
+Opening a store only parses the index; a component is decoded on first access
+and kept for later ones. The entries stay in the page cache, shared by every
+process on the node that maps the same file. `CcdStore` is a read-only mapping,
+so it can stand in for the unpickled dict.
+
+Like `intellifold.msa_cache`, this module is dependency-free so both engines can
+import it; each engine passes the codec of its component type.
+"""
+
+from __future__ import annotations
+
+import collections.abc
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, BinaryIO, Callable, Iterator, Mapping
+
+try:
+  import fcntl
+except ImportError:  # Not POSIX: concurrent first builds are wasted, not wrong.
+  fcntl = None
+
+_MAGIC = b'IFCCDST1'
+_HEADER = struct.Struct('<8sQQ')
+
+
+def store_path_for(pickle_path: os.PathLike[str] | str) -> str:
+  """The path of the store built from `pickle_path`."""
+  return os.path.splitext(os.fspath(pickle_path))[0] + '.ccdstore'
+
+
+def build(
+    components: Mapping[str, Any],
+    path: os.PathLike[str] | str,
+    encode: Callable[[Any], bytes],
+) -> None:
+  """Writes `components` to a store at `path`, atomically."""
+  path = os.fspath(path)
+  fd, tmp_path = tempfile.mkstemp(
+      prefix=f'.{os.path.basename(path)}.', dir=os.path.dirname(path) or '.'
+  )
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(b'\0' * _HEADER.size)
+      index = {}
+      offset = _HEADER.size
+      for key, value in components.items():
+        data = encode(value)
+        f.write(data)
+        index[key] = (offset, len(data))
+        offset += len(data)
+      index_data = json.dumps(index, separators=(',', ':')).encode()
+      f.write(index_data)
+      f.seek(0)
+      f.write(_HEADER.pack(_MAGIC, offset, len(index_data)))
+    os.chmod(tmp_path, 0o644)  # mkstemp creates it private; others map it too.
+    os.replace(tmp_path, path)
+  except BaseException:
+    os.unlink(tmp_path)
+    raise
+
+
+class CcdStore(collections.abc.Mapping):
+  """A memory-mapped store, as a read-only mapping of decoded components.
+
+  Attributes:
+    path: Path of the store file.
+  """
+
+  def __init__(
+      self, path: os.PathLike[str] | str, decode: Callable[[bytes], Any]
+  ):
+    self.path = os.fspath(path)
+    self._decode = decode
+    with open(self.path, 'rb') as f:
+      self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, index_offset, index_length = _HEADER.unpack_from(self._mmap, 0)
+    if magic != _MAGIC:
+      raise ValueError(f'{self.path} is not a CCD store.')
+    self._index: dict[str, list[int]] = json.loads(
+        self._mmap[index_offset : index_offset + index_length]
+    )
+    self._decoded: dict[str, Any] = {}
+
+  def __getitem__(self, key: str) -> Any:
+    try:
+      return self._decoded[key]
+    except KeyError:
+      pass
+    offset, length = self._index[key]
+    value = self._decode(self._mmap[offset : offset + length])
+    self._decoded[key] = value
+    return value
+
+  def __contains__(self, key: object) -> bool:
+    return key in self._index
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self._index)
+
+  def __len__(self) -> int:
+    return len(self._index)
+
+  def __reduce__(self):
+    # Processes reopen (and share) the mapping rather than copying it.
+    return CcdStore, (self.path, self._decode)
+
+
+def open_for_pickle(
+    pickle_path: os.PathLike[str] | str,
+    *,
+    load: Callable[[BinaryIO], Mapping[str, Any]],
+    encode: Callable[[Any], bytes],
+    decode: Callable[[bytes], Any],
+) -> CcdStore:
+  """Opens the store of a CCD pickle, building it first if needed.
+
+  The store is (re)built when it is missing or older than the pickle. Workers
+  starting together serialise on a lock, so only the first one builds it.
+
+  Args:
+    pickle_path: The CCD pickle.
+    load: Loads the pickle from an open file (only called to build the store).
+    encode: Encodes one component.
+    decode: Decodes one component; must be picklable (e.g. a module-level
+      function) for the store to be.
+
+  Returns:
+    The store.
+
+  Raises:
+    OSError: If the store cannot be built, e.g. in a read-only directory.
+  """
+  pickle_path = os.fspath(pickle_path)
+  path = store_path_for(pickle_path)
+
+  def is_stale() -> bool:
+    try:
+      store_mtime = os.path.getmtime(path)
+    except OSError:
+      return True
+    try:
+      return store_mtime < os.path.getmtime(pickle_path)
+    except OSError:
+      return False  # Only the store is left.
+
+  if is_stale():
+    with open(f'{path}.lock', 'a') as lock:
+      if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+      if is_stale():  # Another worker may have built it while we waited.
+        with open(pickle_path, 'rb') as f:
+          build(load(f), path, encode)
+  return CcdStore(path, decode)
@@ -18,6 +18,10 @@ Usage
 -----
   intellifold predict INPUT [--model-dir model_v2] [--gpus all] \\
       [--output-dir out] [--flash cudnn] [-- <extra AlphaFold 3 flags>]
+  intellifold warmup [--model-dir model_v2] [--gpus all] [--flash cudnn] \\
+      [-- <extra AlphaFold 3 flags>]
+  intellifold serve [--model-dir model_v2] [--port 8765 | --socket PATH] \\
+      [--output-dir out] [-- <extra AlphaFold 3 flags>]
 
 On first use the IntelliFold-v2 weights are auto-downloaded from Hugging Face and
 converted into --model-dir (default ./model_v2); later runs just load them.
@@ -65,6 +69,38 @@ _EPILOG = textwrap.dedent("""\
     """)
 
 
+_WARMUP_EPILOG = textwrap.dedent("""\
+    examples:
+      # compile every default bucket into the cache, split across all GPUs:
+      intellifold warmup --gpus all
+
+      # match the production settings (they are part of the compiled program):
+      intellifold warmup --gpus all -- --num_diffusion_samples=5 --num_recycles=10
+
+    notes:
+      * inputs are synthetic (one chain per bucket, no MSA), so no databases or
+        input files are needed; the compiled programs are the ones real inputs of
+        the same bucket use.
+      * the cache is specific to the GPU model and the jax/jaxlib version; run it on
+        the same hardware image as production.
+    """)
+
+
+_SERVE_EPILOG = textwrap.dedent("""\
+    examples:
+      # keep the model resident on GPU 0, then submit jobs with curl:
+      CUDA_VISIBLE_DEVICES=0 intellifold serve --output-dir out -- --norun_data_pipeline
+      curl --data-binary @fold_input.json http://127.0.0.1:8765/predict
+      curl http://127.0.0.1:8765/health
+
+    notes:
+      * /predict streams one JSON event per line (accepted, queued, running, done
+        or error); outputs are written under --output-dir as with predict.
+      * one server drives one GPU; run one server per GPU (different ports) to use
+        several.
+    """)
+
+
 def _build_parser() -> argparse.ArgumentParser:
   p = argparse.ArgumentParser(
       prog='intellifold',
@@ -83,25 +119,8 @@ def _build_parser() -> argparse.ArgumentParser:
   )
   pred.add_argument('input', metavar='INPUT',
                     help='an AF3 fold-input JSON file, OR a directory of JSON files (batch)')
-  pred.add_argument('--model-dir', default='model_v2',
-                    help='directory for the IntelliFold-v2 weights '
-                         '(intellifold_v2.bin.zst + intellifold_v2_fourier.npz). On first use it is '
-                         'auto-created and the pre-converted weights are downloaded from Hugging '
-                         'Face into it; later runs just load them. Default: ./model_v2')
-  pred.add_argument('--fourier', default=os.environ.get('INTFOLD_FOURIER'),
-                    help="path to the Fourier npz (default: "
-                         "<model-dir>/intellifold_v2_fourier.npz, from the auto-conversion)")
+  _add_model_args(pred)
   pred.add_argument('--output-dir', default='out', help='where to write predictions (default: ./out)')
-  pred.add_argument('--flash', choices=['cudnn', 'xla', 'triton'], default='cudnn',
-                    help='flash-attention implementation (default: cudnn)')
-  pred.add_argument('--cache-dir',
-                    default=os.path.join(
-                        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
-                        'intellifold', 'jax_compilation'),
-                    help='persistent XLA compilation cache directory (on by default). The first '
-                         'run of each input size compiles slowly (~minutes); later runs of the '
-                         'same size reuse the cache and skip compilation. '
-                         'Default: ~/.cache/intellifold/jax_compilation')
   pred.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None,
                     help='disable the persistent compilation cache (always recompile)')
   pred.add_argument('--gpus', default=None,
@@ -114,13 +133,65 @@ def _build_parser() -> argparse.ArgumentParser:
   pred.add_argument('--reset-stale', action='store_true',
                     help='with --gpus, clear orphaned .claim locks from crashed workers before '
                          'starting (only safe when no other workers are running this queue)')
-  pred.add_argument('--full-fat', dest='full_fat', action='store_true', default=True,
-                    help='use IntelliFold-v2 (full_fat) config dims [default]')
-  pred.add_argument('--no-full-fat', dest='full_fat', action='store_false',
-                    help='run the stock AF3 config instead (for stock af3.bin)')
+
+  warm = sub.add_parser(
+      'warmup',
+      help='precompile the model for every bucket size into the compilation cache',
+      formatter_class=argparse.RawDescriptionHelpFormatter,
+      epilog=_WARMUP_EPILOG,
+  )
+  _add_model_args(warm)
+  warm.add_argument('--gpus', default=None,
+                    help="compile on several GPUs of this machine in parallel: 'all' or a comma "
+                         "list like '0,2,3'; the buckets are split between them. Omit to compile "
+                         "every bucket on one GPU.")
+
+  srv = sub.add_parser(
+      'serve',
+      help='run a persistent local server that keeps the model loaded between requests',
+      formatter_class=argparse.RawDescriptionHelpFormatter,
+      epilog=_SERVE_EPILOG,
+  )
+  _add_model_args(srv)
+  srv.add_argument('--output-dir', default='out',
+                   help='where to write predictions (default: ./out)')
+  srv.add_argument('--host', default='127.0.0.1',
+                   help='address to listen on (default: 127.0.0.1, local only)')
+  srv.add_argument('--port', type=int, default=8765, help='HTTP port (default: 8765)')
+  srv.add_argument('--socket', default=None,
+                   help='listen on this Unix socket path instead of TCP')
+  srv.add_argument('--max-pending', type=int, default=32,
+                   help='requests admitted at once; beyond this clients get HTTP 503 and '
+                        'should retry (default: 32)')
   return p
 
 
+def _add_model_args(p: argparse.ArgumentParser) -> None:
+  """Options shared by every subcommand that builds the model."""
+  p.add_argument('--model-dir', default='model_v2',
+                 help='directory for the IntelliFold-v2 weights '
+                      '(intellifold_v2.bin.zst + intellifold_v2_fourier.npz). On first use it is '
+                      'auto-created and the pre-converted weights are downloaded from Hugging '
+                      'Face into it; later runs just load them. Default: ./model_v2')
+  p.add_argument('--fourier', default=os.environ.get('INTFOLD_FOURIER'),
+                 help="path to the Fourier npz (default: "
+                      "<model-dir>/intellifold_v2_fourier.npz, from the auto-conversion)")
+  p.add_argument('--flash', choices=['cudnn', 'xla', 'triton'], default='cudnn',
+                 help='flash-attention implementation (default: cudnn)')
+  p.add_argument('--cache-dir',
+                 default=os.path.join(
+                     os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                     'intellifold', 'jax_compilation'),
+                 help='persistent XLA compilation cache directory (on by default). The first '
+                      'run of each input size compiles slowly (~minutes); later runs of the '
+                      'same size reuse the cache and skip compilation. '
+                      'Default: ~/.cache/intellifold/jax_compilation')
+  p.add_argument('--full-fat', dest='full_fat', action='store_true', default=True,
+                 help='use IntelliFold-v2 (full_fat) config dims [default]')
+  p.add_argument('--no-full-fat', dest='full_fat', action='store_false',
+                 help='run the stock AF3 config instead (for stock af3.bin)')
+
+
 def _require_engine() -> None:
   """Fail fast with actionable guidance if the AlphaFold 3 JAX engine is absent.
 
@@ -139,13 +210,14 @@ def _require_engine() -> None:
         '  See the Setup section of the README.')
 
 
-def _run_predict(args, af3_extra) -> int:
-  _require_engine()  # fail fast (before any download) if alphafold3 is missing
+def _ensure_weights(args) -> None:
+  """Auto-bootstrap the IntelliFold-v2 weights into --model-dir.
 
-  # Auto-bootstrap the IntelliFold-v2 weights: on first use, download the
-  # pre-converted intellifold_v2.bin.zst + intellifold_v2_fourier.npz from Hugging
-  # Face into --model-dir (no torch / no conversion); later runs just load them.
-  # (full_fat only; --no-full-fat expects a user-supplied stock af3.bin.zst.)
+  On first use, download the pre-converted intellifold_v2.bin.zst +
+  intellifold_v2_fourier.npz from Hugging Face (no torch / no conversion); later
+  runs just load them. (full_fat only; --no-full-fat expects a user-supplied
+  stock af3.bin.zst.)
+  """
   if args.full_fat:
     from intellifold.weights import ensure_weights
     _bin, _fourier = ensure_weights(args.model_dir)
@@ -154,6 +226,11 @@ def _run_predict(args, af3_extra) -> int:
   elif not args.fourier:
     sys.exit('error: --fourier is required with --no-full-fat (no auto-conversion).')
 
+
+def _run_predict(args, af3_extra) -> int:
+  _require_engine()  # fail fast (before any download) if alphafold3 is missing
+  _ensure_weights(args)
+
   # Multi-GPU / multi-node batch: become an orchestrator that spawns one
   # single-GPU worker per GPU, all sharing a work queue under <output-dir>/.queue.
   if args.gpus is not None:
@@ -198,6 +275,19 @@ def _run_predict(args, af3_extra) -> int:
   return 0
 
 
+def _af3_buckets(af3_extra, flag: str = 'buckets') -> list[int] | None:
+  """The value of a bucket-list flag among the AF3 pass-through flags, if given."""
+  for i, arg in enumerate(af3_extra):
+    if arg.startswith(f'--{flag}='):
+      value = arg.split('=', 1)[1]
+    elif arg == f'--{flag}' and i + 1 < len(af3_extra):
+      value = af3_extra[i + 1]
+    else:
+      continue
+    return [int(b) for b in value.split(',') if b]
+  return None
+
+
 def _run_orchestrator(args, af3_extra) -> int:
   """Single-machine multi-GPU batch driver.
 
@@ -215,7 +305,8 @@ def _run_orchestrator(args, af3_extra) -> int:
 
   queue_dir = os.path.abspath(os.path.join(args.output_dir, '.queue'))
   os.makedirs(queue_dir, exist_ok=True)
-  q = parallel.WorkQueue(args.input, queue_dir, retry_failed=args.retry_failed)
+  q = parallel.WorkQueue(args.input, queue_dir, retry_failed=args.retry_failed,
+                         buckets=_af3_buckets(af3_extra))
   if args.reset_stale:
     n = q.reset_stale()
     print(f'[orchestrator] cleared {n} stale .claim lock(s)')
@@ -226,6 +317,17 @@ def _run_orchestrator(args, af3_extra) -> int:
     print('[orchestrator] nothing to do (queue already drained).')
     return 0
 
+  # Estimate every target's cost once, before the workers start, so they all
+  # claim from the same largest-first order.
+  schedule = q.schedule()
+  if schedule:
+    by_name = sorted(schedule, key=lambda e: e['stem'])
+    lpt = parallel.estimated_makespan([e['cost'] for e in schedule], len(gpus))
+    naive = parallel.estimated_makespan([e['cost'] for e in by_name], len(gpus))
+    print(f'[orchestrator] largest target: {schedule[0]["stem"]} '
+          f'(~{schedule[0]["tokens"]} tokens, bucket {schedule[0]["bucket"]}) | '
+          f'estimated makespan {lpt:.3g} largest-first vs {naive:.3g} by filename')
+
   # Each worker is this same CLI in classic single-GPU mode, with the work-queue
   # flag appended so run_jax_inference pulls from the shared queue instead of looping
   # the whole directory. CUDA_VISIBLE_DEVICES pins it to one GPU.
@@ -245,15 +347,120 @@ def _run_orchestrator(args, af3_extra) -> int:
   worker_argv += ['--cache-dir', args.cache_dir] if args.cache_dir else ['--no-cache']
   worker_argv += ['--', *worker_extra]
 
+  # Pin buckets to workers so each compiles as few XLA shapes as possible.
+  partition = parallel.partition_buckets(schedule, len(gpus))
+  for g, buckets in zip(gpus, partition):
+    print(f'[orchestrator] GPU {g} buckets: {",".join(map(str, buckets)) or "-"}')
+
   rc = parallel.spawn_workers(
       worker_argv, gpus, queue_dir,
-      log_dir=os.path.join(args.output_dir, 'worker_logs'))
+      log_dir=os.path.join(args.output_dir, 'worker_logs'),
+      per_worker_argv=[
+          [f'--work_queue_buckets={",".join(map(str, b))}'] if b else []
+          for b in partition
+      ])
   s = q.stats()
   print(f'[orchestrator] finished | {s["done"]} done, {s["failed"]} failed, '
         f'{s["remaining"]} remaining (rerun with the same --output-dir to resume)')
   return rc
 
 
+def _run_warmup(args, af3_extra) -> int:
+  """Precompiles every bucket into the persistent compilation cache.
+
+  With --gpus, the buckets are dealt out largest-first across one worker per
+  GPU (compile time grows with the bucket size), each compiling its share into
+  the shared cache directory.
+  """
+  _require_engine()
+  _ensure_weights(args)
+  if not args.cache_dir:
+    sys.exit('error: warmup needs a --cache-dir to compile into.')
+  os.makedirs(args.cache_dir, exist_ok=True)
+
+  if args.gpus is not None:
+    from intellifold import parallel
+
+    gpus = parallel.resolve_gpus(args.gpus)
+    if not gpus:
+      sys.exit(f'error: no GPUs resolved from --gpus {args.gpus!r}.')
+    buckets = (_af3_buckets(af3_extra, 'warmup_buckets')
+               or _af3_buckets(af3_extra) or list(parallel.DEFAULT_BUCKETS))
+    loads = [0] * len(gpus)
+    shares: list[list[int]] = [[] for _ in gpus]
+    for b in sorted(buckets, reverse=True):
+      w = loads.index(min(loads))
+      shares[w].append(b)
+      loads[w] += b ** 3
+    worker_argv = [
+        sys.executable, '-m', 'intellifold.cli', 'warmup',
+        '--model-dir', args.model_dir,
+        '--flash', args.flash,
+        '--cache-dir', args.cache_dir,
+    ]
+    if args.fourier:
+      worker_argv += ['--fourier', args.fourier]
+    if not args.full_fat:
+      worker_argv += ['--no-full-fat']
+    worker_argv += ['--', *af3_extra]
+    keep = [(g, share) for g, share in zip(gpus, shares) if share]
+    rc = parallel.spawn_workers(
+        worker_argv, [g for g, _ in keep], args.cache_dir,
+        per_worker_argv=[[f'--warmup_buckets={",".join(map(str, share))}']
+                         for _, share in keep])
+    num_files = num_bytes = 0
+    for root, _, files in os.walk(args.cache_dir):
+      for name in files:
+        num_files += 1
+        num_bytes += os.path.getsize(os.path.join(root, name))
+    print(f'[warmup] cache {args.cache_dir}: {num_files} entries, '
+          f'{num_bytes / 2**20:.1f} MiB')
+    return rc
+
+  if args.full_fat:
+    os.environ['INTFOLD_FULLFAT'] = '1'
+    os.environ['INTFOLD_FOURIER'] = os.path.abspath(args.fourier)
+  af3_argv = [
+      'intellifold-warmup',
+      f'--model_dir={args.model_dir}',
+      f'--flash_attention_implementation={args.flash}',
+      f'--jax_compilation_cache_dir={args.cache_dir}',
+      *af3_extra,
+  ]
+  from absl import app
+  from intellifold import run_jax_inference
+
+  app.run(run_jax_inference.warmup_main, argv=af3_argv)
+  return 0
+
+
+def _run_serve(args, af3_extra) -> int:
+  _require_engine()
+  _ensure_weights(args)
+  if args.full_fat:
+    os.environ['INTFOLD_FULLFAT'] = '1'
+    os.environ['INTFOLD_FOURIER'] = os.path.abspath(args.fourier)
+  if args.cache_dir and not any(a.startswith('--jax_compilation_cache_dir') for a in af3_extra):
+    os.makedirs(args.cache_dir, exist_ok=True)
+    af3_extra = [*af3_extra, f'--jax_compilation_cache_dir={args.cache_dir}']
+  af3_argv = [
+      'intellifold-serve',
+      f'--model_dir={args.model_dir}',
+      f'--output_dir={args.output_dir}',
+      f'--flash_attention_implementation={args.flash}',
+      f'--serve_host={args.host}',
+      f'--serve_port={args.port}',
+      f'--serve_max_pending={args.max_pending}',
+      *([f'--serve_socket={args.socket}'] if args.socket else []),
+      *af3_extra,
+  ]
+  from absl import app
+  from intellifold import run_jax_inference
+
+  app.run(run_jax_inference.serve_main, argv=af3_argv)
+  return 0
+
+
 def main(argv=None) -> int:
   if argv is None:
     argv = sys.argv[1:]
@@ -271,6 +478,10 @@ def main(argv=None) -> int:
   args = parser.parse_args(own)
   if args.command == 'predict':
     return _run_predict(args, af3_extra)
+  if args.command == 'warmup':
+    return _run_warmup(args, af3_extra)
+  if args.command == 'serve':
+    return _run_serve(args, af3_extra)
   parser.print_help()
   return 0
 
@@ -0,0 +1,144 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk store of RDKit reference conformers, shared by both engines.
+
+Ligand featurisation embeds a reference conformer for every ligand of every
+target (`rdkit_utils.get_random_conformer` in the JAX data pipeline, for each
+seed and again for the deterministic frames; `compute_3d_conformer` in the
+PyTorch input parser). Screens of one receptor against a ligand library, or of
+many designs with the same cofactors, repeat the same embeddings over and over.
+With a cache directory set, every conformer is stored under
+
+  `molecule_key(mol, **settings)`
+
+which hashes the canonical SMILES of the molecule, its atoms and bonds in the
+order they are embedded (RDKit's embedding depends on the atom order, so two
+spellings of one molecule are stored separately), the generation settings
+(method, seed, maximum iterations) and the RDKit version, so an upgrade does not
+serve conformers of the previous one. Where the embedding is seeded (the JAX
+data pipeline) a cached conformer is exactly the one it would have produced.
+The PyTorch parser embeds with unseeded ETKDG, whose result varies from run to
+run; there a hit returns the conformer of the first embedding, which makes
+later runs reproducible rather than identical to a fresh embedding. Failed
+embeddings are stored too, as retrying them is the slowest case.
+
+Entries are small JSON documents kept in an `intellifold.msa_cache.MsaCache`
+text store, so they get its atomic writes and cross-process locking: concurrent
+workers that miss on the same ligand embed it once.
+
+Like `intellifold.msa_cache`, this only depends on what both engines already
+need (RDKit and numpy).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Callable
+
+import numpy as np
+import rdkit
+from rdkit import Chem
+from rdkit import Geometry
+
+from intellifold import msa_cache
+
+
+def molecule_key(mol: Chem.Mol, **settings: Any) -> str:
+  """The key of a conformer of `mol` generated with `settings`."""
+  atoms = [
+      (
+          atom.GetAtomicNum(),
+          atom.GetFormalCharge(),
+          atom.GetIsotope(),
+          atom.GetNumExplicitHs(),
+          str(atom.GetChiralTag()),
+      )
+      for atom in mol.GetAtoms()
+  ]
+  bonds = [
+      (
+          bond.GetBeginAtomIdx(),
+          bond.GetEndAtomIdx(),
+          str(bond.GetBondType()),
+          str(bond.GetStereo()),
+          list(bond.GetStereoAtoms()),
+      )
+      for bond in mol.GetBonds()
+  ]
+  return hashlib.blake2b(
+      json.dumps(
+          {
+              'smiles': Chem.MolToSmiles(mol),
+              'atoms': atoms,
+              'bonds': bonds,
+              'settings': settings,
+              'rdkit': rdkit.__version__,
+          },
+          sort_keys=True,
+          default=str,
+      ).encode(),
+      digest_size=16,
+  ).hexdigest()
+
+
+def _to_text(conformer: Chem.Conformer | None) -> str:
+  if conformer is None:
+    return json.dumps({'positions': None})
+  return json.dumps({'positions': conformer.GetPositions().tolist()})
+
+
+def _from_text(text: str) -> Chem.Conformer | None:
+  positions = json.loads(text)['positions']
+  if positions is None:
+    return None
+  positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+  conformer = Chem.Conformer(len(positions))
+  for i, (x, y, z) in enumerate(positions):
+    conformer.SetAtomPosition(i, Geometry.Point3D(x, y, z))
+  conformer.Set3D(True)
+  return conformer
+
+
+class ConformerCache:
+  """Reference conformers stored on disk, one entry per key.
+
+  Attributes:
+    cache_dir: Root directory of the store.
+  """
+
+  def __init__(self, cache_dir: str):
+    self.cache_dir = cache_dir
+    self._store = msa_cache.MsaCache(cache_dir)
+
+  def get_or_compute(
+      self,
+      key: str,
+      compute: Callable[[], Chem.Conformer | None],
+  ) -> Chem.Conformer | None:
+    """The conformer stored under `key`, computing and storing it on a miss.
+
+    Args:
+      key: Cache key, see `molecule_key`.
+      compute: Embeds the conformer; returns None if the embedding failed.
+
+    Returns:
+      The conformer (a copy detached from any molecule), or None if the
+      embedding failed.
+    """
+    (text,) = self._store.get_or_compute(
+        [key], lambda missing: [_to_text(compute())]
+    )
+    return _from_text(text)
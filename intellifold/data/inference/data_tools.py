@@ -25,11 +25,19 @@ import shutil
 import pickle
 import logging
 import pandas as pd
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Iterator, Mapping, Optional, Union
+from rdkit import Chem
+from rdkit.Chem.rdchem import Mol
 from tqdm import tqdm
+from intellifold.ccd_store import open_for_pickle
 from intellifold.data import const
-from intellifold.data.types import MSA, Manifest, Record
+from intellifold.data.types import MSA, Manifest, Record, Target
 from intellifold.data.msa.mmseqs2 import run_mmseqs2
+from intellifold.conformer_cache import ConformerCache
+from intellifold.msa_cache import MsaCache
 from intellifold.data.parse.a3m import parse_a3m
 from intellifold.data.parse.csv import parse_csv
 from intellifold.data.parse.yaml import parse_yaml
@@ -140,6 +148,7 @@ def compute_msa(
     msa_pairing_strategy: str,
     use_pairing=True,
     use_template=False,
+    msa_cache=None,
 ) -> None:
     """Compute the MSA for the input data.
 
@@ -157,6 +166,8 @@ def compute_msa(
         The MSA server URL.
     msa_pairing_strategy : str
         The MSA pairing strategy.
+    msa_cache : MsaCache, optional
+        The MSA cache consulted before querying the MSA server, if any.
 
     """
     if len(data) > 1 and use_pairing:
@@ -167,6 +178,7 @@ def compute_msa(
             use_pairing=True,
             host_url=msa_server_url,
             pairing_strategy=msa_pairing_strategy,
+            msa_cache=msa_cache,
         )
     else:
         paired_msas = [""] * len(data)
@@ -178,6 +190,7 @@ def compute_msa(
         use_pairing=False,
         host_url=msa_server_url,
         pairing_strategy=msa_pairing_strategy,
+        msa_cache=msa_cache,
     )
 
     for idx, name in enumerate(data):
@@ -338,6 +351,146 @@ def compute_similar_sequence(
             os.remove(f'{processed_simirity_sequence_dir}/nucleotide_results.m8')
         
 
+def _encode_ccd_mol(mol: Mol) -> bytes:
+    # Keep the atom names / conformer tags and the exact coordinates
+    return mol.ToBinary(
+        Chem.PropertyPickleOptions.AllProps
+        | Chem.PropertyPickleOptions.CoordsAsDouble
+    )
+
+
+def _decode_ccd_mol(data: bytes) -> Mol:
+    return Mol(data)
+
+
+def load_ccd(ccd_path: Path) -> Mapping[str, Mol]:
+    """Load the CCD, memory-mapped where possible.
+
+    The pickle is converted once into a memory-mapped store next to it (see
+    `intellifold.ccd_store`), so every process only decodes the components it
+    uses and the store is shared through the page cache.
+
+    Parameters
+    ----------
+    ccd_path : Path
+        The path to the CCD pickle.
+
+    Returns
+    -------
+    Mapping[str, Mol]
+        The CCD components by id.
+
+    """
+    try:
+        return open_for_pickle(
+            ccd_path,
+            load=pickle.load,
+            encode=_encode_ccd_mol,
+            decode=_decode_ccd_mol,
+        )
+    except OSError as e:
+        logger.warning(f"Cannot use a CCD store for {ccd_path} ({e}), unpickling it.")
+    with ccd_path.open("rb") as file:
+        return pickle.load(file)  # noqa: S301
+
+
+# CCD and conformer cache of a preprocessing worker process, set once by its
+# initializer
+_WORKER_CCD = None
+_WORKER_CONFORMER_CACHE = None
+
+
+def _init_preprocessing_worker(
+    ccd_path: Path, conformer_cache_dir: Optional[str] = None
+) -> None:
+    global _WORKER_CCD, _WORKER_CONFORMER_CACHE  # noqa: PLW0603
+    _WORKER_CCD = load_ccd(ccd_path)
+    if conformer_cache_dir:
+        _WORKER_CONFORMER_CACHE = ConformerCache(conformer_cache_dir)
+
+
+def parse_target(
+    path: Path,
+    ccd: Optional[Mapping[str, Mol]] = None,
+    conformer_cache: Optional[ConformerCache] = None,
+) -> Target:
+    """Parse an input file into a target.
+
+    This generates the RDKit conformers of the ligands, so it is the CPU
+    bound part of preprocessing.
+
+    Parameters
+    ----------
+    path : Path
+        The input file.
+    ccd : Mapping[str, Mol], optional
+        The CCD dictionary, by default the one of the preprocessing worker.
+    conformer_cache : ConformerCache, optional
+        The on-disk conformer store, by default the one of the preprocessing
+        worker, if any.
+
+    Returns
+    -------
+    Target
+        The parsed target.
+
+    """
+    if ccd is None:
+        ccd = _WORKER_CCD
+    if conformer_cache is None:
+        conformer_cache = _WORKER_CONFORMER_CACHE
+    if path.suffix in (".yml", ".yaml"):
+        return parse_yaml(path, ccd, conformer_cache)
+    elif path.is_dir():
+        msg = f"Found directory {path} instead of .yaml, skipping."
+        raise RuntimeError(msg)
+    else:
+        msg = (
+            f"Unable to parse filetype {path.suffix}, "
+            "please provide a .yaml file."
+        )
+        raise RuntimeError(msg)
+
+
+def _try_parse_target(
+    path: Path, ccd: Mapping[str, Mol], conformer_cache: Optional[ConformerCache]
+) -> Union[Target, Exception]:
+    try:
+        return parse_target(path, ccd, conformer_cache)
+    except Exception as e:
+        return e
+
+
+def _parse_targets_in_pool(
+    data: list[Path],
+    pool: ProcessPoolExecutor,
+    prefetch: int,
+) -> Iterator[tuple[Path, Union[Target, Exception]]]:
+    """Parse the inputs on a process pool, in order, a few inputs ahead."""
+    pending = []
+    paths = iter(data)
+    while True:
+        while len(pending) < prefetch:
+            path = next(paths, None)
+            if path is None:
+                break
+            pending.append((path, pool.submit(parse_target, path)))
+        if not pending:
+            return
+        path, future = pending.pop(0)
+        try:
+            yield path, future.result()
+        except Exception as e:
+            yield path, e
+
+
+def dump_manifest(records: list[Record], manifest_path: Path) -> None:
+    """Atomically replace the manifest, so readers never see a partial file."""
+    tmp_path = manifest_path.with_name(f".{manifest_path.name}.tmp")
+    Manifest(records).dump(tmp_path)
+    os.replace(tmp_path, manifest_path)
+
+
 def process_inputs(  # noqa: C901, PLR0912, PLR0915
     args,
     data: list[Path],
@@ -367,6 +520,11 @@ def process_inputs(  # noqa: C901, PLR0912, PLR0915
     use_template : bool, optional
         Whether to use Protein templates for prediction, by default False.
 
+    Inputs are parsed on `args.num_preprocessing_workers` processes (in this
+    process if 0), and up to `args.max_concurrent_msa_requests` targets query
+    the MSA server and run the template search at the same time. The manifest
+    is updated atomically after every processed target.
+
     Returns
     -------
     BoltzProcessedInput
@@ -426,195 +584,265 @@ def process_inputs(  # noqa: C901, PLR0912, PLR0915
         processed_polymer_fasta_dir.mkdir(parents=True, exist_ok=True)
     predictions_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load CCD
-    with ccd_path.open("rb") as file:
-        ccd = pickle.load(file)  # noqa: S301
-
     if existing_records is not None:
         logger.info(
             f"Found {len(existing_records)} records. Adding them to records"
         )
 
-    # Parse input data
-    records: list[Record] = existing_records if existing_records is not None else []
-    protein_seqs = []
-    nucleotide_seqs = []
-    for path in tqdm(data, desc=f"Data Preprocessing"):
-        try:
-            # Parse data
-            if path.suffix in (".yml", ".yaml"):
-                target = parse_yaml(path, ccd)
-            elif path.is_dir():
-                msg = f"Found directory {path} instead of .yaml, skipping."
-                raise RuntimeError(msg)
-            else:
-                msg = (
-                    f"Unable to parse filetype {path.suffix}, "
-                    "please provide a .yaml file."
-                )
-                raise RuntimeError(msg)
-
-            # Get target id
-            target_id = target.record.id
-
-            #### save each polymer chain seqs
-            if args.return_similar_seq:
-                prot_id = const.chain_type_ids["PROTEIN"]
-                rna_id = const.chain_type_ids["RNA"]
-                dna_id = const.chain_type_ids["DNA"]
-                exists_protein_entity_ids = []
-                exists_nucleotide_entity_ids = []
-                for chain in target.record.chains:
-                    ### protein polymer
-                    if (chain.mol_type == prot_id):
-                        entity_id = chain.entity_id
-                        if entity_id not in exists_protein_entity_ids:
-                            protein_seqs.append(f'>{target_id}-{chain.chain_name}')
-                            protein_seqs.append(f'{target.sequences[entity_id]}')
-                            exists_protein_entity_ids.append(entity_id)
-                    if chain.mol_type == rna_id or chain.mol_type == dna_id:
-                        entity_id = chain.entity_id
-                        if entity_id not in exists_nucleotide_entity_ids:
-                            nucleotide_seqs.append(f'>{target_id}-{chain.chain_name}')
-                            nucleotide_seqs.append(f'{target.sequences[entity_id]}')
-                            exists_nucleotide_entity_ids.append(entity_id)            
-
-            # Get all MSA ids and decide whether to generate MSA
-            to_generate = {}
-            generate_template = {}
-            to_generate_template = {}
+    # MSAs are shared across targets and runs through the MSA cache, if set
+    msa_cache = None
+    if getattr(args, "msa_cache_dir", None):
+        max_gb = getattr(args, "msa_cache_max_gb", None)
+        msa_cache = MsaCache(
+            args.msa_cache_dir,
+            max_bytes=int(max_gb * 1024**3) if max_gb else None,
+        )
+
+    def process_target(path, target):
+        """Generate the MSAs and templates of a parsed target and dump it.
+
+        Runs on the MSA thread pool, as it mostly waits on the MSA server.
+
+        """
+        protein_seqs = []
+        nucleotide_seqs = []
+
+        # Get target id
+        target_id = target.record.id
+
+        #### save each polymer chain seqs
+        if args.return_similar_seq:
             prot_id = const.chain_type_ids["PROTEIN"]
+            rna_id = const.chain_type_ids["RNA"]
+            dna_id = const.chain_type_ids["DNA"]
+            exists_protein_entity_ids = []
+            exists_nucleotide_entity_ids = []
             for chain in target.record.chains:
-                # Add to generate list, assigning entity id
-                # if (chain.mol_type == prot_id) and (chain.msa_id == 0):
-                if chain.mol_type == prot_id:
-                    ### MSA And template will only be generated for protein chains without MSA/template provided in the input yaml
-                    if chain.msa_id == 0 and chain.template_id == 0:
-                        entity_id = chain.entity_id
-                        msa_id = f"{target_id}_{entity_id}"
-                        to_generate[msa_id] = target.sequences[entity_id]
-                        generate_template[msa_id] = False
-                        chain.msa_id = msa_dir / f"{msa_id}.csv"
-                        if use_template:
-                            chain.template_id = msa_dir / f"{msa_id}_hmmsearch.a3m"
-                            generate_template[msa_id] = True
-                    ## If MSA provided but no template provided, will generate template based on the MSA if use_template is True
-                    elif chain.msa_id != 0 and chain.template_id == 0:
-                        if use_template:
-                            msa_id = chain.msa_id
-                            entity_id = chain.entity_id
-                            template_id = temp_dir / f"{target_id}_{entity_id}_hmmsearch.a3m"
-                            chain.template_id = template_id
-                            to_generate_template[entity_id] = msa_id
-                    ## If no MSA provided but template provided, we will only generate MSA, and use template provided in the input yaml
-                    elif chain.msa_id == 0 and chain.template_id != 0:
+                ### protein polymer
+                if (chain.mol_type == prot_id):
+                    entity_id = chain.entity_id
+                    if entity_id not in exists_protein_entity_ids:
+                        protein_seqs.append(f'>{target_id}-{chain.chain_name}')
+                        protein_seqs.append(f'{target.sequences[entity_id]}')
+                        exists_protein_entity_ids.append(entity_id)
+                if chain.mol_type == rna_id or chain.mol_type == dna_id:
+                    entity_id = chain.entity_id
+                    if entity_id not in exists_nucleotide_entity_ids:
+                        nucleotide_seqs.append(f'>{target_id}-{chain.chain_name}')
+                        nucleotide_seqs.append(f'{target.sequences[entity_id]}')
+                        exists_nucleotide_entity_ids.append(entity_id)            
+
+        # Get all MSA ids and decide whether to generate MSA
+        to_generate = {}
+        generate_template = {}
+        to_generate_template = {}
+        prot_id = const.chain_type_ids["PROTEIN"]
+        for chain in target.record.chains:
+            # Add to generate list, assigning entity id
+            # if (chain.mol_type == prot_id) and (chain.msa_id == 0):
+            if chain.mol_type == prot_id:
+                ### MSA And template will only be generated for protein chains without MSA/template provided in the input yaml
+                if chain.msa_id == 0 and chain.template_id == 0:
+                    entity_id = chain.entity_id
+                    msa_id = f"{target_id}_{entity_id}"
+                    to_generate[msa_id] = target.sequences[entity_id]
+                    generate_template[msa_id] = False
+                    chain.msa_id = msa_dir / f"{msa_id}.csv"
+                    if use_template:
+                        chain.template_id = msa_dir / f"{msa_id}_hmmsearch.a3m"
+                        generate_template[msa_id] = True
+                ## If MSA provided but no template provided, will generate template based on the MSA if use_template is True
+                elif chain.msa_id != 0 and chain.template_id == 0:
+                    if use_template:
+                        msa_id = chain.msa_id
                         entity_id = chain.entity_id
-                        msa_id = f"{target_id}_{entity_id}"
-                        to_generate[msa_id] = target.sequences[entity_id]
-                        generate_template[msa_id] = False
-                        chain.msa_id = msa_dir / f"{msa_id}.csv"
+                        template_id = temp_dir / f"{target_id}_{entity_id}_hmmsearch.a3m"
+                        chain.template_id = template_id
+                        to_generate_template[entity_id] = msa_id
+                ## If no MSA provided but template provided, we will only generate MSA, and use template provided in the input yaml
+                elif chain.msa_id == 0 and chain.template_id != 0:
+                    entity_id = chain.entity_id
+                    msa_id = f"{target_id}_{entity_id}"
+                    to_generate[msa_id] = target.sequences[entity_id]
+                    generate_template[msa_id] = False
+                    chain.msa_id = msa_dir / f"{msa_id}.csv"
  
-                # We do not support msa generation for non-protein chains
-                elif chain.msa_id == 0:
-                    chain.msa_id = -1
-                    chain.template_id = -1
-
-            # Generate MSA
-            if to_generate and not use_msa_server:
-                msg = "Missing MSA's in input and --use_msa_server flag not set."
-                raise RuntimeError(msg)
-
-            if to_generate:
-                msg = f"Generating MSA for {path} with {len(to_generate)} protein entities."
-                logger.info(msg)
-                compute_msa(
-                    data=to_generate,
-                    generate_template=generate_template,
-                    target_id=target_id,
-                    msa_dir=msa_dir,
-                    msa_server_url=msa_server_url,
-                    msa_pairing_strategy=msa_pairing_strategy,
-                    use_pairing=use_pairing,
-                    use_template=use_template,
-                )
+            # We do not support msa generation for non-protein chains
+            elif chain.msa_id == 0:
+                chain.msa_id = -1
+                chain.template_id = -1
+
+        # Generate MSA
+        if to_generate and not use_msa_server:
+            msg = "Missing MSA's in input and --use_msa_server flag not set."
+            raise RuntimeError(msg)
+
+        if to_generate:
+            msg = f"Generating MSA for {path} with {len(to_generate)} protein entities."
+            logger.info(msg)
+            compute_msa(
+                data=to_generate,
+                generate_template=generate_template,
+                target_id=target_id,
+                msa_dir=msa_dir,
+                msa_server_url=msa_server_url,
+                msa_pairing_strategy=msa_pairing_strategy,
+                use_pairing=use_pairing,
+                use_template=use_template,
+                msa_cache=msa_cache,
+            )
                 
-            if to_generate_template and use_template:
-                msg = f"Generating templates for {path} with {len(to_generate_template)} protein entities based on provided MSA."
-                logger.info(msg)
-                for entity_id, msa_id in to_generate_template.items():
-                    msa_a3m_path_for_template_search = msa_id
-                    temp_msa_a3m_path_for_template_search = temp_dir / f"{target_id}_{entity_id}_for_template_search.a3m"
-                    reother_msa(input_msa_path=msa_a3m_path_for_template_search, output_msa_path=temp_msa_a3m_path_for_template_search)
-                    hmmsearch_a3m_save_path = temp_dir / f"{target_id}_{entity_id}_hmmsearch.a3m"
-                    run_template_search(
-                        msa_a3m_path_for_template_search=str(temp_msa_a3m_path_for_template_search),
-                        hmmsearch_a3m_save_path=str(hmmsearch_a3m_save_path)
+        if to_generate_template and use_template:
+            msg = f"Generating templates for {path} with {len(to_generate_template)} protein entities based on provided MSA."
+            logger.info(msg)
+            for entity_id, msa_id in to_generate_template.items():
+                msa_a3m_path_for_template_search = msa_id
+                temp_msa_a3m_path_for_template_search = temp_dir / f"{target_id}_{entity_id}_for_template_search.a3m"
+                reother_msa(input_msa_path=msa_a3m_path_for_template_search, output_msa_path=temp_msa_a3m_path_for_template_search)
+                hmmsearch_a3m_save_path = temp_dir / f"{target_id}_{entity_id}_hmmsearch.a3m"
+                run_template_search(
+                    msa_a3m_path_for_template_search=str(temp_msa_a3m_path_for_template_search),
+                    hmmsearch_a3m_save_path=str(hmmsearch_a3m_save_path)
+                )
+        # Parse MSA data
+        msas = sorted({c.msa_id for c in target.record.chains if c.msa_id != -1})
+        templates = sorted({c.template_id for c in target.record.chains if c.template_id != -1})
+        msa_id_map = {}
+        for msa_idx, msa_id in enumerate(msas):
+            # Check that raw MSA exists
+            msa_path = Path(msa_id)
+            if not msa_path.exists():
+                msg = f"MSA file {msa_path} not found."
+                raise FileNotFoundError(msg)
+
+            # Dump processed MSA
+            processed = processed_msa_dir / f"{target_id}_{msa_idx}.npz"
+            msa_id_map[msa_id] = f"{target_id}_{msa_idx}"
+            if not processed.exists():
+                # Parse A3M
+                if msa_path.suffix == ".a3m":
+                    msa: MSA = parse_a3m(
+                        msa_path,
+                        taxonomy=None,
+                        max_seqs=max_msa_seqs,
                     )
-            # Parse MSA data
-            msas = sorted({c.msa_id for c in target.record.chains if c.msa_id != -1})
-            templates = sorted({c.template_id for c in target.record.chains if c.template_id != -1})
-            msa_id_map = {}
-            for msa_idx, msa_id in enumerate(msas):
-                # Check that raw MSA exists
-                msa_path = Path(msa_id)
-                if not msa_path.exists():
-                    msg = f"MSA file {msa_path} not found."
-                    raise FileNotFoundError(msg)
-
-                # Dump processed MSA
-                processed = processed_msa_dir / f"{target_id}_{msa_idx}.npz"
-                msa_id_map[msa_id] = f"{target_id}_{msa_idx}"
-                if not processed.exists():
-                    # Parse A3M
-                    if msa_path.suffix == ".a3m":
-                        msa: MSA = parse_a3m(
-                            msa_path,
-                            taxonomy=None,
-                            max_seqs=max_msa_seqs,
-                        )
-                    elif msa_path.suffix == ".csv":
-                        msa: MSA = parse_csv(msa_path, max_seqs=max_msa_seqs)
-                    else:
-                        msg = f"MSA file {msa_path} not supported, only a3m or csv."
-                        raise RuntimeError(msg)
-
-                    msa.dump(processed)
-                ## move the hmmsearch a3m to processed msa dir for template search
-                if use_template:
-                    template_id = templates[msa_idx]
-                    template_path = Path(template_id)
-                    template_idx = msa_idx
-                    processed = processed_template_dir / f"{target_id}_{template_idx}_hmmsearch.a3m"
-                    shutil.copy(template_path, processed)
-            # Modify records to point to processed MSA
-            for c in target.record.chains:
-                if (c.msa_id != -1) and (c.msa_id in msa_id_map):
-                    c.msa_id = msa_id_map[c.msa_id]
-                    if use_template and c.template_id != -1:
-                        c.template_id = c.msa_id
-            # Keep record
-            records.append(target.record)
-
-            # Dump structure
-            struct_path = structure_dir / f"{target.record.id}.npz"
-            target.structure.dump(struct_path)
-
-            # # Dump constraints
-            # constraints_path = processed_constraints_dir / f"{target.record.id}.npz"
-            # target.residue_constraints.dump(constraints_path)
+                elif msa_path.suffix == ".csv":
+                    msa: MSA = parse_csv(msa_path, max_seqs=max_msa_seqs)
+                else:
+                    msg = f"MSA file {msa_path} not supported, only a3m or csv."
+                    raise RuntimeError(msg)
+
+                msa.dump(processed)
+            ## move the hmmsearch a3m to processed msa dir for template search
+            if use_template:
+                template_id = templates[msa_idx]
+                template_path = Path(template_id)
+                template_idx = msa_idx
+                processed = processed_template_dir / f"{target_id}_{template_idx}_hmmsearch.a3m"
+                shutil.copy(template_path, processed)
+        # Modify records to point to processed MSA
+        for c in target.record.chains:
+            if (c.msa_id != -1) and (c.msa_id in msa_id_map):
+                c.msa_id = msa_id_map[c.msa_id]
+                if use_template and c.template_id != -1:
+                    c.template_id = c.msa_id
+        # Dump structure
+        struct_path = structure_dir / f"{target.record.id}.npz"
+        target.structure.dump(struct_path)
+
+        return target.record, protein_seqs, nucleotide_seqs
+
+    # Parse input data on a process pool (RDKit conformer generation is CPU
+    # bound), and overlap the MSA server queries and template searches of
+    # several targets on a thread pool (they mostly wait on I/O).
+    num_preprocessing_workers = getattr(args, "num_preprocessing_workers", 0) or 0
+    # SMILES ligand conformers are shared across targets and runs through the
+    # conformer cache, if set
+    conformer_cache_dir = getattr(args, "conformer_cache_dir", None)
+    max_concurrent_msa_requests = max(
+        1, getattr(args, "max_concurrent_msa_requests", 1) or 1
+    )
+    if num_preprocessing_workers > 0:
+        parse_pool = ProcessPoolExecutor(
+            max_workers=num_preprocessing_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_preprocessing_worker,
+            initargs=(ccd_path, conformer_cache_dir),
+        )
+        parsed = _parse_targets_in_pool(
+            data, parse_pool, prefetch=2 * num_preprocessing_workers
+        )
+    else:
+        parse_pool = None
+        ccd = load_ccd(ccd_path)
+        conformer_cache = (
+            ConformerCache(conformer_cache_dir) if conformer_cache_dir else None
+        )
+        parsed = (
+            (path, _try_parse_target(path, ccd, conformer_cache)) for path in data
+        )
 
-        except Exception as e:
-            if len(data) > 1:
-                logger.warning(
-                    f"Failed to process {path}. Skipping. Error: {e}."
+    # Records are dumped to the manifest as soon as their target is processed,
+    # so an interrupted run resumes from the targets that are missing.
+    records: list[Record] = existing_records if existing_records is not None else []
+    results = {}
+
+    def on_failure(path, e):
+        pbar.update(1)
+        if len(data) > 1:
+            logger.warning(
+                f"Failed to process {path}. Skipping. Error: {e}."
+            )
+        else:
+            raise e
+
+    def collect(futures, max_pending):
+        while len(futures) > max_pending:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, path = futures.pop(future)
+                try:
+                    results[idx] = future.result()
+                except Exception as e:
+                    on_failure(path, e)
+                    continue
+                pbar.update(1)
+                dump_manifest(
+                    records + [results[i][0] for i in sorted(results)],
+                    manifest_path,
                 )
-            else:
-                raise e
+
+    futures = {}
+    with ThreadPoolExecutor(
+        max_workers=max_concurrent_msa_requests,
+        thread_name_prefix="intellifold-msa",
+    ) as msa_pool, tqdm(total=len(data), desc=f"Data Preprocessing") as pbar:
+        try:
+            for idx, (path, target) in enumerate(parsed):
+                if isinstance(target, Exception):
+                    on_failure(path, target)
+                    continue
+                futures[msa_pool.submit(process_target, path, target)] = (idx, path)
+                # Bound the number of parsed targets held in memory
+                collect(futures, max_pending=2 * max_concurrent_msa_requests)
+            collect(futures, max_pending=0)
+        except BaseException:
+            msa_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown(cancel_futures=True)
 
     # Dump manifest
-    manifest = Manifest(records)
-    manifest.dump(out_dir / "processed" / "manifest.json")
-    
+    protein_seqs = []
+    nucleotide_seqs = []
+    for idx in sorted(results):
+        record, target_protein_seqs, target_nucleotide_seqs = results[idx]
+        records.append(record)
+        protein_seqs.extend(target_protein_seqs)
+        nucleotide_seqs.extend(target_nucleotide_seqs)
+    dump_manifest(records, manifest_path)
+
     # remove the temporary directory
     if temp_dir.exists():
         shutil.rmtree(temp_dir)
@@ -20,6 +20,7 @@
 # SOFTWARE.
 
 import os
+import threading
 import urllib.request
 from pathlib import Path
 
@@ -39,6 +40,10 @@ HF_ENDPOINT = os.environ.get("HF_ENDPOINT", "huggingface.co")
 _HF_REPO_BASE = f"https://huggingface.co/intelligenAI/intellifold/resolve/main"
 _HF_MIRROR_BASE = "https://hf-mirror.com/intelligenAI/intellifold/resolve/main"
 
+# Template searches of concurrent targets (--max_concurrent_msa_requests)
+# download the pdb_seqres database on demand; only one of them may
+_PDB_SEQRES_DOWNLOAD_LOCK = threading.Lock()
+
 
 # #### huggingface offical URL
 # CCD_URL = f"{_HF_REPO_BASE}/ccd_v2.pkl"
@@ -309,27 +314,31 @@ def download_pdb_sequence_database(cache_dir: str) -> None:
     search_database_dir = os.path.join(cache_dir, "search_database")
     os.makedirs(search_database_dir, exist_ok=True)
     pdb_seqres_fpath = os.path.join(search_database_dir, "pdb_seqres_2022_09_28.fasta")
-    if not os.path.exists(pdb_seqres_fpath):
-        try:
-            # tos_url = PROTEIN_SEQRES_DATABASE_URL
-            tos_url = f'{_HF_REPO_BASE}/pdb_seqres_2022_09_28.fasta'
-            logger.info(
-                f"Downloading pdb_seqres database \n to {pdb_seqres_fpath}"
-            )
-            urllib.request.urlretrieve(tos_url, pdb_seqres_fpath, reporthook=progress_callback)
-        except Exception as e:
-            ## use hf-mirror.com
-            # tos_url = PROTEIN_SEQRES_DATABASE_MIRROR_URL
-            tos_url = f'{_HF_MIRROR_BASE}/pdb_seqres_2022_09_28.fasta'
+    # Downloaded under a temporary name, so a partial file is never used
+    part_fpath = f"{pdb_seqres_fpath}.part"
+    with _PDB_SEQRES_DOWNLOAD_LOCK:
+        if not os.path.exists(pdb_seqres_fpath):
             try:
-                urllib.request.urlretrieve(tos_url, pdb_seqres_fpath, reporthook=progress_callback)
+                # tos_url = PROTEIN_SEQRES_DATABASE_URL
+                tos_url = f'{_HF_REPO_BASE}/pdb_seqres_2022_09_28.fasta'
+                logger.info(
+                    f"Downloading pdb_seqres database \n to {pdb_seqres_fpath}"
+                )
+                urllib.request.urlretrieve(tos_url, part_fpath, reporthook=progress_callback)
             except Exception as e:
-                raise RuntimeError(
-                    f"Download pdb_seqres database failed: {e}. Please download "
-                    f"manually with: wget {tos_url} -O {pdb_seqres_fpath}"
-                ) from e
-    else:
-        logger.info(f"pdb_seqres database already exists at {pdb_seqres_fpath}")
+                ## use hf-mirror.com
+                # tos_url = PROTEIN_SEQRES_DATABASE_MIRROR_URL
+                tos_url = f'{_HF_MIRROR_BASE}/pdb_seqres_2022_09_28.fasta'
+                try:
+                    urllib.request.urlretrieve(tos_url, part_fpath, reporthook=progress_callback)
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Download pdb_seqres database failed: {e}. Please download "
+                        f"manually with: wget {tos_url} -O {pdb_seqres_fpath}"
+                    ) from e
+            os.replace(part_fpath, pdb_seqres_fpath)
+        else:
+            logger.info(f"pdb_seqres database already exists at {pdb_seqres_fpath}")
         
 # def progress_callback(block_num: int, block_size: int, total_size: int) -> None:
 #     """Callback for tracking download progress."""
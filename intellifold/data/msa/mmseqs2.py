@@ -21,133 +21,341 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import json
 import logging
 import os
 import random
 import tarfile
+import tempfile
+import threading
 import time
-from typing import Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Union
 
 import requests
-from tqdm import tqdm
+from requests.adapters import HTTPAdapter
 
-logger = logging.getLogger(__name__)
-
-TQDM_BAR_FORMAT = (
-    "{l_bar}{bar}| {n_fmt}/{total_fmt} [elapsed: {elapsed} remaining: {remaining}]"
-)
+from intellifold.msa_cache import MsaCache, paired_key, unpaired_key
 
+logger = logging.getLogger(__name__)
 
-def run_mmseqs2(  # noqa: PLR0912, D103, C901, PLR0915
-    x: Union[str, list[str]],
-    prefix: str = "tmp",
-    use_env: bool = True,
-    use_filter: bool = True,
-    use_pairing: bool = False,
-    pairing_strategy: str = "greedy",
-    host_url: str = "https://api.colabfold.com",
-) -> tuple[list[str], list[str]]:
-    submission_endpoint = "ticket/pair" if use_pairing else "ticket/msa"
-
-    # Set header agent as intellifold
-    headers = {}
-    headers["User-Agent"] = "intellifold"
-
-    def submit(seqs, mode, N=101):
-        n, query = N, ""
-        for seq in seqs:
-            query += f">{n}\n{seq}\n"
-            n += 1
-
-        while True:
-            error_count = 0
+# Queries of a ticket are numbered from this id in the returned a3m files
+FIRST_QUERY_ID = 101
+
+
+class MMseqs2Client:
+    """Client of an MMseqs2 (ColabFold) MSA server.
+
+    All requests share one pooled `requests.Session`, transient errors
+    (timeouts, connection errors, 5xx) are retried with exponential backoff
+    and tickets are polled at growing intervals. Unpaired searches requested
+    concurrently, e.g. by the preprocessing threads of `process_inputs`, are
+    coalesced into few tickets: the server searches every query of a ticket
+    on its own, so one ticket serves many targets, and several tickets are
+    polled at once. A paired search depends on all the chains of its ticket,
+    so it is submitted as it is.
+
+    Parameters
+    ----------
+    host_url : str
+        The MSA server URL.
+    pool_size : int, optional
+        Number of pooled connections, by default 16.
+    max_retries : int, optional
+        Number of retries of a failing request, by default 8.
+    batch_window : float, optional
+        Seconds an unpaired search waits for others to share its ticket,
+        by default 1.0. Not waited when no other search is in flight.
+    max_batch_seqs : int, optional
+        Maximum number of sequences of a batched ticket, by default 64.
+    max_concurrent_tickets : int, optional
+        Maximum number of batched tickets in flight, by default 8.
+
+    """
+
+    def __init__(
+        self,
+        host_url: str,
+        pool_size: int = 16,
+        max_retries: int = 8,
+        batch_window: float = 1.0,
+        max_batch_seqs: int = 64,
+        max_concurrent_tickets: int = 8,
+    ):
+        self.host_url = host_url.rstrip("/")
+        self.max_retries = max_retries
+        self.batch_window = batch_window
+        self.max_batch_seqs = max_batch_seqs
+        self.timeout = 6.02  # slightly larger than a multiple of 3, see requests docs
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Set header agent as intellifold
+        self.session.headers["User-Agent"] = "intellifold"
+
+        self._cond = threading.Condition()
+        self._pending = []  # (seqs, mode, future) of unpaired searches
+        self._num_in_flight = 0  # unpaired searches queued or running
+        self._dispatcher = None
+        self._tickets = ThreadPoolExecutor(
+            max_workers=max_concurrent_tickets,
+            thread_name_prefix="intellifold-mmseqs2",
+        )
+
+    @staticmethod
+    def backoff(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+        """Seconds to wait before retry `attempt` (exponential, jittered)."""
+        return min(cap, base * 2**attempt) * random.uniform(0.5, 1.0)
+
+    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
             try:
-                # https://requests.readthedocs.io/en/latest/user/advanced/#advanced
-                # "good practice to set connect timeouts to slightly larger than a multiple of 3"
-                res = requests.post(
-                    f"{host_url}/{submission_endpoint}",
-                    data={"q": query, "mode": mode},
-                    timeout=6.02,
-                    headers=headers,
+                res = self.session.request(
+                    method, f"{self.host_url}/{endpoint}", timeout=self.timeout, **kwargs
                 )
-            except requests.exceptions.Timeout:
-                logger.warning("Timeout while submitting to MSA server. Retrying...")
-                continue
-            except Exception as e:
-                error_count += 1
+                if res.status_code >= 500:
+                    res.raise_for_status()
+                return res
+            except requests.exceptions.RequestException as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
                 logger.warning(
-                    f"Error while fetching result from MSA server. Retrying... ({error_count}/5)"
+                    f"Error while querying the MSA server ({e}). Retrying in "
+                    f"{delay:.1f}s... ({attempt + 1}/{self.max_retries})"
                 )
-                logger.warning(f"Error: {e}")
-                time.sleep(5)
-                if error_count > 5:
-                    raise
-                continue
-            break
+                time.sleep(delay)
 
+    @staticmethod
+    def _json(res: requests.Response) -> dict:
         try:
-            out = res.json()
+            return res.json()
         except ValueError:
             logger.error(f"Server didn't reply with json: {res.text}")
-            out = {"status": "ERROR"}
+            return {"status": "ERROR"}
+
+    def submit(self, seqs: list[str], mode: str) -> dict:
+        """Submit a ticket, waiting out rate limits."""
+        endpoint = "ticket/pair" if mode.startswith("pair") else "ticket/msa"
+        query = "".join(
+            f">{FIRST_QUERY_ID + idx}\n{seq}\n" for idx, seq in enumerate(seqs)
+        )
+        attempt = 0
+        while True:
+            out = self._json(
+                self._request("POST", endpoint, data={"q": query, "mode": mode})
+            )
+            if out["status"] not in ["UNKNOWN", "RATELIMIT"]:
+                break
+            delay = self.backoff(attempt, base=5.0)
+            logger.warning(f"Sleeping for {delay:.1f}s. Reason: {out['status']}")
+            time.sleep(delay)
+            attempt += 1
+
+        if out["status"] == "ERROR":
+            msg = (
+                "MMseqs2 API is giving errors. Please confirm your "
+                " input is a valid protein sequence. If error persists, "
+                "please try again an hour later."
+            )
+            raise Exception(msg)
+
+        if out["status"] == "MAINTENANCE":
+            msg = (
+                "MMseqs2 API is undergoing maintenance. "
+                "Please try again in a few minutes."
+            )
+            raise Exception(msg)
         return out
 
-    def status(ID):
-        while True:
-            error_count = 0
-            try:
-                res = requests.get(
-                    f"{host_url}/ticket/{ID}", timeout=6.02, headers=headers
-                )
-            except requests.exceptions.Timeout:
-                logger.warning(
-                    "Timeout while fetching status from MSA server. Retrying..."
-                )
-                continue
-            except Exception as e:
-                error_count += 1
-                logger.warning(
-                    f"Error while fetching result from MSA server. Retrying... ({error_count}/5)"
-                )
-                logger.warning(f"Error: {e}")
-                time.sleep(5)
-                if error_count > 5:
-                    raise
-                continue
-            break
-        try:
-            out = res.json()
-        except ValueError:
-            logger.error(f"Server didn't reply with json: {res.text}")
-            out = {"status": "ERROR"}
+    def wait(self, ticket: dict) -> dict:
+        """Poll a ticket until it leaves the queue, at growing intervals."""
+        out, delay = ticket, 1.0
+        while out["status"] in ["UNKNOWN", "RUNNING", "PENDING"]:
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(30.0, delay * 1.5)
+            out = self._json(self._request("GET", f"ticket/{ticket['id']}"))
         return out
 
-    def download(ID, path):
-        error_count = 0
-        while True:
-            try:
-                res = requests.get(
-                    f"{host_url}/result/download/{ID}", timeout=6.02, headers=headers
-                )
-            except requests.exceptions.Timeout:
-                logger.warning(
-                    "Timeout while fetching result from MSA server. Retrying..."
-                )
-                continue
-            except Exception as e:
-                error_count += 1
-                logger.warning(
-                    f"Error while fetching result from MSA server. Retrying... ({error_count}/5)"
-                )
-                logger.warning(f"Error: {e}")
-                time.sleep(5)
-                if error_count > 5:
-                    raise
-                continue
-            break
+    def download(self, ticket_id: str, path: str) -> None:
+        """Download the results of a finished ticket."""
+        res = self._request("GET", f"result/download/{ticket_id}")
         with open(path, "wb") as out:
             out.write(res.content)
 
+    def search(self, seqs_unique: list[str], mode: str, path: str) -> list[str]:
+        """Search unique sequences in one ticket, keeping the results in `path`.
+
+        A previously downloaded result in `path` is reused.
+
+        Returns
+        -------
+        list[str]
+            The a3m string of each sequence.
+
+        """
+        tar_gz_file = f"{path}/out.tar.gz"
+        if not os.path.isfile(tar_gz_file):
+            start = time.time()
+            while True:
+                out = self.wait(self.submit(seqs_unique, mode))
+                if out["status"] == "COMPLETE":
+                    break
+                if out["status"] == "ERROR":
+                    msg = (
+                        "MMseqs2 API is giving errors. Please confirm your "
+                        " input is a valid protein sequence. If error persists, "
+                        "please try again an hour later."
+                    )
+                    raise Exception(msg)
+                # The ticket was dropped by the server, resubmit it
+            logger.info(
+                f"MSA server searched {len(seqs_unique)} sequences ({mode}) "
+                f"in {time.time() - start:.0f}s."
+            )
+            self.download(out["id"], tar_gz_file)
+
+        # prep list of a3m files
+        if mode.startswith("pair"):
+            a3m_files = [f"{path}/pair.a3m"]
+        else:
+            a3m_files = [f"{path}/uniref.a3m"]
+            if "env" in mode:
+                a3m_files.append(f"{path}/bfd.mgnify30.metaeuk30.smag30.a3m")
+
+        # extract a3m files
+        if any(not os.path.isfile(a3m_file) for a3m_file in a3m_files):
+            with tarfile.open(tar_gz_file) as tar_gz:
+                tar_gz.extractall(path)
+
+        # gather a3m lines
+        a3m_lines = {}
+        for a3m_file in a3m_files:
+            update_M, M = True, None
+            for line in open(a3m_file, "r"):
+                if len(line) > 0:
+                    if "\x00" in line:
+                        line = line.replace("\x00", "")
+                        update_M = True
+                    if line.startswith(">") and update_M:
+                        M = int(line[1:].rstrip())
+                        update_M = False
+                        if M not in a3m_lines:
+                            a3m_lines[M] = []
+                    a3m_lines[M].append(line)
+
+        return [
+            "".join(a3m_lines[FIRST_QUERY_ID + idx]) for idx in range(len(seqs_unique))
+        ]
+
+    def search_unpaired(self, seqs: list[str], mode: str) -> list[str]:
+        """Search sequences in a ticket shared with concurrent callers.
+
+        Returns
+        -------
+        list[str]
+            The a3m string of each sequence.
+
+        """
+        future = Future()
+        with self._cond:
+            self._pending.append((seqs, mode, future))
+            self._num_in_flight += 1
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch, name="intellifold-mmseqs2-batcher", daemon=True
+                )
+                self._dispatcher.start()
+            self._cond.notify()
+        try:
+            return future.result()
+        finally:
+            with self._cond:
+                self._num_in_flight -= 1
+                self._cond.notify()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Give concurrent callers a moment to join the ticket. Only
+                # callers already in flight (whose searches are running) are
+                # expected to, so a lone caller is dispatched at once
+                deadline = time.monotonic() + self.batch_window
+                while (
+                    sum(len(seqs) for seqs, _, _ in self._pending) < self.max_batch_seqs
+                    and self._num_in_flight > len(self._pending)
+                    and time.monotonic() < deadline
+                ):
+                    self._cond.wait(deadline - time.monotonic())
+                mode = self._pending[0][1]
+                batch, rest, num_seqs = [], [], 0
+                for request in self._pending:
+                    seqs, request_mode, _ = request
+                    if request_mode == mode and (
+                        not batch or num_seqs + len(seqs) <= self.max_batch_seqs
+                    ):
+                        batch.append(request)
+                        num_seqs += len(seqs)
+                    else:
+                        rest.append(request)
+                self._pending = rest
+            self._tickets.submit(self._run_batch, batch, mode)
+
+    def _run_batch(self, batch: list, mode: str) -> None:
+        seqs_unique = list(dict.fromkeys(seq for seqs, _, _ in batch for seq in seqs))
+        try:
+            with tempfile.TemporaryDirectory(prefix="intellifold_mmseqs2_") as path:
+                a3m_lines = dict(zip(seqs_unique, self.search(seqs_unique, mode, path)))
+        except Exception as e:  # noqa: BLE001
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for seqs, _, future in batch:
+            future.set_result([a3m_lines[seq] for seq in seqs])
+
+
+_CLIENTS: dict[str, MMseqs2Client] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(host_url: str) -> MMseqs2Client:
+    """The shared client of an MSA server (one connection pool per server)."""
+    with _CLIENTS_LOCK:
+        if host_url not in _CLIENTS:
+            _CLIENTS[host_url] = MMseqs2Client(host_url)
+        return _CLIENTS[host_url]
+
+
+def run_mmseqs2(  # noqa: D103
+    x: Union[str, list[str]],
+    prefix: str = "tmp",
+    use_env: bool = True,
+    use_filter: bool = True,
+    use_pairing: bool = False,
+    pairing_strategy: str = "greedy",
+    host_url: str = "https://api.colabfold.com",
+    msa_cache: Optional[MsaCache] = None,
+    client: Optional[MMseqs2Client] = None,
+) -> list[str]:
+    if msa_cache is not None:
+        return run_mmseqs2_cached(
+            x,
+            msa_cache,
+            prefix=prefix,
+            use_env=use_env,
+            use_filter=use_filter,
+            use_pairing=use_pairing,
+            pairing_strategy=pairing_strategy,
+            host_url=host_url,
+            client=client,
+        )
+    if client is None:
+        client = get_client(host_url)
+
     # process input x
     seqs = [x] if isinstance(x, str) else x
 
@@ -167,109 +375,83 @@ def run_mmseqs2(  # noqa: PLR0912, D103, C901, PLR0915
         if use_env:
             mode = mode + "-env"
 
-    # define path
-    path = f"{prefix}_{mode}"
-    if not os.path.isdir(path):
-        os.mkdir(path)
-
-    # call mmseqs2 api
-    tar_gz_file = f"{path}/out.tar.gz"
-    N, REDO = 101, True
-
     # deduplicate and keep track of order
-    seqs_unique = []
-    # TODO this might be slow for large sets
-    [seqs_unique.append(x) for x in seqs if x not in seqs_unique]
-    Ms = [N + seqs_unique.index(seq) for seq in seqs]
-    # lets do it!
-    if not os.path.isfile(tar_gz_file):
-        TIME_ESTIMATE = 150 * len(seqs_unique)
-        with tqdm(total=TIME_ESTIMATE, bar_format=TQDM_BAR_FORMAT) as pbar:
-            while REDO:
-                pbar.set_description("SUBMIT")
-
-                # Resubmit job until it goes through
-                out = submit(seqs_unique, mode, N)
-                while out["status"] in ["UNKNOWN", "RATELIMIT"]:
-                    sleep_time = 5 + random.randint(0, 5)
-                    logger.error(f"Sleeping for {sleep_time}s. Reason: {out['status']}")
-                    # resubmit
-                    time.sleep(sleep_time)
-                    out = submit(seqs_unique, mode, N)
+    seqs_unique = list(dict.fromkeys(seqs))
 
-                if out["status"] == "ERROR":
-                    msg = (
-                        "MMseqs2 API is giving errors. Please confirm your "
-                        " input is a valid protein sequence. If error persists, "
-                        "please try again an hour later."
-                    )
-                    raise Exception(msg)
-
-                if out["status"] == "MAINTENANCE":
-                    msg = (
-                        "MMseqs2 API is undergoing maintenance. "
-                        "Please try again in a few minutes."
-                    )
-                    raise Exception(msg)
-
-                # wait for job to finish
-                ID, TIME = out["id"], 0
-                pbar.set_description(out["status"])
-                while out["status"] in ["UNKNOWN", "RUNNING", "PENDING"]:
-                    t = 5 + random.randint(0, 5)
-                    logger.error(f"Sleeping for {t}s. Reason: {out['status']}")
-                    time.sleep(t)
-                    out = status(ID)
-                    pbar.set_description(out["status"])
-                    if out["status"] == "RUNNING":
-                        TIME += t
-                        pbar.update(n=t)
+    # define path
+    path = f"{prefix}_{mode}"
+    if use_pairing or os.path.isfile(f"{path}/out.tar.gz"):
+        # Pairing depends on every chain of the ticket, and a previous run's
+        # results are reused as they are
+        os.makedirs(path, exist_ok=True)
+        a3m_lines = client.search(seqs_unique, mode, path)
+    else:
+        a3m_lines = client.search_unpaired(seqs_unique, mode)
 
-                if out["status"] == "COMPLETE":
-                    if TIME < TIME_ESTIMATE:
-                        pbar.update(n=(TIME_ESTIMATE - TIME))
-                    REDO = False
+    a3m_lines = dict(zip(seqs_unique, a3m_lines))
+    return [a3m_lines[seq] for seq in seqs]
 
-                if out["status"] == "ERROR":
-                    REDO = False
-                    msg = (
-                        "MMseqs2 API is giving errors. Please confirm your "
-                        " input is a valid protein sequence. If error persists, "
-                        "please try again an hour later."
-                    )
-                    raise Exception(msg)
 
-            # Download results
-            download(ID, tar_gz_file)
+def run_mmseqs2_cached(
+    x: Union[str, list[str]],
+    msa_cache: MsaCache,
+    use_pairing: bool = False,
+    **kwargs,
+) -> list[str]:
+    """Run `run_mmseqs2` through a content-addressed MSA cache.
+
+    Unpaired MSAs are cached per sequence, so only the sequences missing from
+    the cache are sent to the server. Paired MSAs are cached per set of
+    sequences, since the pairing depends on every chain of the query.
+
+    Parameters
+    ----------
+    x : Union[str, list[str]]
+        The query sequence(s).
+    msa_cache : MsaCache
+        The MSA cache.
+    use_pairing : bool, optional
+        Whether to compute the paired MSA, by default False.
+    kwargs
+        The other arguments of `run_mmseqs2`.
+
+    Returns
+    -------
+    list[str]
+        The a3m string of each query sequence.
+
+    """
+    seqs = [x] if isinstance(x, str) else x
+    seqs_unique = list(dict.fromkeys(seqs))
+    settings = {
+        "engine": "mmseqs2",
+        "host_url": kwargs.get("host_url", "https://api.colabfold.com"),
+        "use_env": kwargs.get("use_env", True),
+        "use_filter": kwargs.get("use_filter", True),
+    }
 
-    # prep list of a3m files
     if use_pairing:
-        a3m_files = [f"{path}/pair.a3m"]
-    else:
-        a3m_files = [f"{path}/uniref.a3m"]
-        if use_env:
-            a3m_files.append(f"{path}/bfd.mgnify30.metaeuk30.smag30.a3m")
-
-    # extract a3m files
-    if any(not os.path.isfile(a3m_file) for a3m_file in a3m_files):
-        with tarfile.open(tar_gz_file) as tar_gz:
-            tar_gz.extractall(path)
-
-    # gather a3m lines
-    a3m_lines = {}
-    for a3m_file in a3m_files:
-        update_M, M = True, None
-        for line in open(a3m_file, "r"):
-            if len(line) > 0:
-                if "\x00" in line:
-                    line = line.replace("\x00", "")
-                    update_M = True
-                if line.startswith(">") and update_M:
-                    M = int(line[1:].rstrip())
-                    update_M = False
-                    if M not in a3m_lines:
-                        a3m_lines[M] = []
-                a3m_lines[M].append(line)
-
-    a3m_lines = ["".join(a3m_lines[n]) for n in Ms]
-    return a3m_lines
+        settings["pairing_strategy"] = kwargs.get("pairing_strategy", "greedy")
+        key = paired_key(seqs_unique, **settings)
+
+        def compute(missing):
+            a3m_lines = run_mmseqs2(seqs_unique, use_pairing=True, **kwargs)
+            return [json.dumps(dict(zip(seqs_unique, a3m_lines)))]
+
+        (paired,) = msa_cache.get_or_compute([key], compute)
+        paired = json.loads(paired)
+        return [paired[seq] for seq in seqs]
+
+    keys = [unpaired_key(seq, **settings) for seq in seqs_unique]
+
+    def compute(missing):
+        if len(missing) < len(seqs_unique):
+            logger.info(
+                f"Found {len(seqs_unique) - len(missing)} of "
+                f"{len(seqs_unique)} unpaired MSAs in the MSA cache."
+            )
+        missing_seqs = [seqs_unique[idx] for idx in missing]
+        return run_mmseqs2(missing_seqs, use_pairing=False, **kwargs)
+
+    unpaired = dict(zip(seqs_unique, msa_cache.get_or_compute(keys, compute)))
+    return [unpaired[seq] for seq in seqs]
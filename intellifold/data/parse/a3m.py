@@ -21,7 +21,7 @@
 
 import gzip
 from pathlib import Path
-from typing import Optional, TextIO
+from typing import Iterable, Optional, Union
 
 import numpy as np
 
@@ -29,8 +29,104 @@ from intellifold.data import const
 from intellifold.data.types import MSA, MSADeletion, MSAResidue, MSASequence
 
 
+# Token id of every byte of an MSA row (uppercase residue letters and gaps),
+# -1 for bytes that are not valid MSA characters
+_TOKEN_LUT = np.full(256, -1, dtype=np.int16)
+for _letter, _token in const.prot_letter_to_token.items():
+    _TOKEN_LUT[ord(_letter)] = const.mapping_boltz_token_ids_to_our_token_ids[
+        const.token_ids[_token]
+    ]
+
+
+def build_msa(rows: list[bytes], taxonomy_ids: list[int]) -> MSA:
+    """Encode deduplicated A3M rows into an MSA object.
+
+    All rows are processed at once with NumPy: lowercase letters are
+    insertions, counted as a deletion before the next residue of the row,
+    and every other byte is mapped to its token through a lookup table.
+
+    Parameters
+    ----------
+    rows : list[bytes]
+        The stripped A3M rows, in order.
+    taxonomy_ids : list[int]
+        The taxonomy id of each row, -1 if unknown.
+
+    Returns
+    -------
+    MSA
+        The MSA object.
+
+    """
+    num_seqs = len(rows)
+    row_starts = np.zeros(num_seqs + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=row_starts[1:])
+    buf = np.frombuffer(b"".join(rows), dtype=np.uint8)
+
+    # Residues and their tokens
+    is_insertion = (buf >= ord("a")) & (buf <= ord("z"))
+    ins_pos = np.flatnonzero(is_insertion)
+    tokens = _TOKEN_LUT[buf]
+    if len(ins_pos):
+        tokens = tokens[~is_insertion]
+    if (tokens < 0).any():
+        raise KeyError(chr(buf[~is_insertion][np.argmax(tokens < 0)]))
+    ins_row = np.searchsorted(row_starts, ins_pos, side="right") - 1
+    num_res = np.diff(row_starts) - np.bincount(ins_row, minlength=num_seqs)
+    res_start = np.zeros(num_seqs + 1, dtype=np.int64)
+    np.cumsum(num_res, out=res_start[1:])
+
+    # Runs of insertions within a row are one deletion before the residue
+    # that follows them; trailing insertions of a row are dropped
+    run_first = np.ones(len(ins_pos), dtype=bool)
+    run_first[1:] = (np.diff(ins_pos) != 1) | (ins_row[1:] != ins_row[:-1])
+    first_idx = np.flatnonzero(run_first)
+    last_idx = np.empty_like(first_idx)
+    last_idx[:-1] = first_idx[1:] - 1
+    last_idx[-1:] = len(ins_pos) - 1
+    run_row = ins_row[first_idx]
+    next_pos = ins_pos[last_idx] + 1
+    has_residue = next_pos < row_starts[run_row + 1]
+    first_idx, last_idx = first_idx[has_residue], last_idx[has_residue]
+    run_row, next_pos = run_row[has_residue], next_pos[has_residue]
+    # Residue index of next_pos: its offset in the row minus the insertions
+    # of the row before it
+    ins_before_row = np.searchsorted(ins_pos, row_starts[:-1])
+    res_idx = (next_pos - row_starts[run_row]) - (last_idx + 1 - ins_before_row[run_row])
+    num_del = np.bincount(run_row, minlength=num_seqs)
+    del_start = np.zeros(num_seqs + 1, dtype=np.int64)
+    np.cumsum(num_del, out=del_start[1:])
+
+    residues = np.zeros(len(tokens), dtype=MSAResidue)
+    residues["res_type"] = tokens
+    deletions = np.zeros(len(res_idx), dtype=MSADeletion)
+    deletions["res_idx"] = res_idx
+    deletions["deletion"] = last_idx - first_idx + 1
+    sequences = np.array(
+        list(
+            zip(
+                range(num_seqs),
+                taxonomy_ids,
+                res_start[:-1].tolist(),
+                res_start[1:].tolist(),
+                del_start[:-1].tolist(),
+                del_start[1:].tolist(),
+            )
+        ),
+        dtype=MSASequence,
+    )
+
+    # Create MSA object
+    msa = MSA(
+        residues=residues,
+        deletions=deletions,
+        sequences=sequences,
+    )
+    return msa
+
+
 def _parse_a3m(  # noqa: C901
-    lines: TextIO,
+    lines: Iterable[Union[bytes, str]],
     taxonomy: Optional[dict[str, str]],
     max_seqs: Optional[int] = None,
 ) -> MSA:
@@ -38,7 +134,7 @@ def _parse_a3m(  # noqa: C901
 
     Parameters
     ----------
-    lines : TextIO
+    lines : Iterable[Union[bytes, str]]
         The lines of the MSA file.
     taxonomy : dict[str, str]
         The taxonomy database, if available.
@@ -52,20 +148,19 @@ def _parse_a3m(  # noqa: C901
 
     """
     visited = set()
-    sequences = []
-    deletions = []
-    residues = []
+    rows = []
+    taxonomy_ids = []
 
-    seq_idx = 0
     for line in lines:
-        line: str
+        if isinstance(line, str):
+            line = line.encode()  # noqa: PLW2901
         line = line.strip()  # noqa: PLW2901
-        if not line or line.startswith("#"):
+        if not line or line.startswith(b"#"):
             continue
 
         # Get taxonomy, if annotated
-        if line.startswith(">"):
-            header = line.split()[0]
+        if line.startswith(b">"):
+            header = line.split()[0].decode()
             if taxonomy and header.startswith(">UniRef100"):
                 uniref_id = header.split("_")[1]
                 taxonomy_id = taxonomy.get(uniref_id)
@@ -76,51 +171,18 @@ def _parse_a3m(  # noqa: C901
             continue
 
         # Skip if duplicate sequence
-        str_seq = line.replace("-", "").upper()
+        str_seq = line.replace(b"-", b"").upper()
         if str_seq not in visited:
             visited.add(str_seq)
         else:
             continue
 
-        # Process sequence
-        residue = []
-        deletion = []
-        count = 0
-        res_idx = 0
-        for c in line:
-            if c != "-" and c.islower():
-                count += 1
-                continue
-            token = const.prot_letter_to_token[c]
-            # token = const.token_ids[token]
-            token=const.mapping_boltz_token_ids_to_our_token_ids[const.token_ids[token]]
-            residue.append(token)
-            if count > 0:
-                deletion.append((res_idx, count))
-                count = 0
-            res_idx += 1
-
-        res_start = len(residues)
-        res_end = res_start + len(residue)
-
-        del_start = len(deletions)
-        del_end = del_start + len(deletion)
-
-        sequences.append((seq_idx, taxonomy_id, res_start, res_end, del_start, del_end))
-        residues.extend(residue)
-        deletions.extend(deletion)
-
-        seq_idx += 1
-        if (max_seqs is not None) and (seq_idx >= max_seqs):
+        rows.append(line)
+        taxonomy_ids.append(taxonomy_id)
+        if (max_seqs is not None) and (len(rows) >= max_seqs):
             break
 
-    # Create MSA object
-    msa = MSA(
-        residues=np.array(residues, dtype=MSAResidue),
-        deletions=np.array(deletions, dtype=MSADeletion),
-        sequences=np.array(sequences, dtype=MSASequence),
-    )
-    return msa
+    return build_msa(rows, taxonomy_ids)
 
 
 def parse_a3m(
@@ -147,9 +209,9 @@ def parse_a3m(
     """
     # Read the file
     if path.suffix == ".gz":
-        with gzip.open(str(path), "rt") as f:
+        with gzip.open(str(path), "rb") as f:
             msa = _parse_a3m(f, taxonomy, max_seqs)
     else:
-        with path.open("r") as f:
+        with path.open("rb") as f:
             msa = _parse_a3m(f, taxonomy, max_seqs)
     return msa
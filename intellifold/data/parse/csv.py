@@ -22,11 +22,10 @@
 from pathlib import Path
 from typing import Optional
 
-import numpy as np
 import pandas as pd
 
-from intellifold.data import const
-from intellifold.data.types import MSA, MSADeletion, MSAResidue, MSASequence
+from intellifold.data.parse.a3m import build_msa
+from intellifold.data.types import MSA
 
 
 def parse_csv(
@@ -58,11 +57,9 @@ def parse_csv(
 
     # Create taxonomy mapping
     visited = set()
-    sequences = []
-    deletions = []
-    residues = []
+    rows = []
+    taxonomy_ids = []
 
-    seq_idx = 0
     for line, key in zip(data["sequence"], data["key"]):
         line: str
         line = line.strip()  # noqa: PLW2901
@@ -75,47 +72,16 @@ def parse_csv(
             taxonomy_id = key
 
         # Skip if duplicate sequence
-        str_seq = line.replace("-", "").upper()
+        line = line.encode()  # noqa: PLW2901
+        str_seq = line.replace(b"-", b"").upper()
         if str_seq not in visited:
             visited.add(str_seq)
         else:
             continue
 
-        # Process sequence
-        residue = []
-        deletion = []
-        count = 0
-        res_idx = 0
-        for c in line:
-            if c != "-" and c.islower():
-                count += 1
-                continue
-            token = const.prot_letter_to_token[c]
-            # token = const.token_ids[token]
-            token=const.mapping_boltz_token_ids_to_our_token_ids[const.token_ids[token]]
-            residue.append(token)
-            if count > 0:
-                deletion.append((res_idx, count))
-                count = 0
-            res_idx += 1
-
-        res_start = len(residues)
-        res_end = res_start + len(residue)
-
-        del_start = len(deletions)
-        del_end = del_start + len(deletion)
-
-        sequences.append((seq_idx, taxonomy_id, res_start, res_end, del_start, del_end))
-        residues.extend(residue)
-        deletions.extend(deletion)
-
-        seq_idx += 1
-        if (max_seqs is not None) and (seq_idx >= max_seqs):
+        rows.append(line)
+        taxonomy_ids.append(taxonomy_id)
+        if (max_seqs is not None) and (len(rows) >= max_seqs):
             break
-    # Create MSA object
-    msa = MSA(
-        residues=np.array(residues, dtype=MSAResidue),
-        deletions=np.array(deletions, dtype=MSADeletion),
-        sequences=np.array(sequences, dtype=MSASequence),
-    )
-    return msa
+
+    return build_msa(rows, taxonomy_ids)
@@ -21,15 +21,21 @@
 
 from collections.abc import Mapping
 from pathlib import Path
+from typing import Optional
 
 from Bio import SeqIO
 from rdkit.Chem.rdchem import Mol
 
+from intellifold.conformer_cache import ConformerCache
 from intellifold.data.parse.yaml import parse_boltz_schema
 from intellifold.data.types import Target
 
 
-def parse_fasta(path: Path, ccd: Mapping[str, Mol]) -> Target:  # noqa: C901
+def parse_fasta(  # noqa: C901
+    path: Path,
+    ccd: Mapping[str, Mol],
+    conformer_cache: Optional[ConformerCache] = None,
+) -> Target:
     """Parse a fasta file.
 
     The name of the fasta file is used as the name of this job.
@@ -50,6 +56,8 @@ def parse_fasta(path: Path, ccd: Mapping[str, Mol]) -> Target:  # noqa: C901
         Path to the fasta file.
     ccd : Dict
         Dictionary of CCD components.
+    conformer_cache : ConformerCache, optional
+        The on-disk store of the SMILES ligand conformers, by default None.
 
     Returns
     -------
@@ -147,4 +155,4 @@ def parse_fasta(path: Path, ccd: Mapping[str, Mol]) -> Target:  # noqa: C901
     }
 
     name = path.stem
-    return parse_boltz_schema(name, data, ccd)
+    return parse_boltz_schema(name, data, ccd, conformer_cache)
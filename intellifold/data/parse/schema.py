@@ -35,6 +35,7 @@ from rdkit.Chem.rdMolDescriptors import CalcNumHeavyAtoms
 
 
 
+from intellifold.conformer_cache import ConformerCache, molecule_key
 from intellifold.data import const
 from intellifold.data.types import (
     Atom,
@@ -249,6 +250,48 @@ def compute_3d_conformer(mol: Mol, version: str = "v3") -> bool:
     return False
 
 
+def compute_3d_conformer_cached(
+    mol: Mol,
+    conformer_cache: Optional[ConformerCache] = None,
+    version: str = "v3",
+) -> bool:
+    """Generate 3D coordinates, reusing them from the conformer cache.
+
+    Parameters
+    ----------
+    mol: Mol
+        The RDKit molecule to process
+    conformer_cache: ConformerCache, optional
+        The on-disk conformer store, by default None (always compute).
+    version: str, optional
+        The ETKDG version, defaults ot v3
+
+    Returns
+    -------
+    bool
+        Whether computation was successful.
+
+    """
+    if conformer_cache is None:
+        return compute_3d_conformer(mol, version)
+
+    def compute():
+        if not compute_3d_conformer(mol, version):
+            return None
+        return mol.GetConformer()
+
+    key = molecule_key(mol, method=f"etkdg_{version}_uff")
+    conformer = conformer_cache.get_or_compute(key, compute)
+    if conformer is None:
+        return False
+    if mol.GetNumConformers() == 0:
+        # Cache hit, the molecule was not embedded
+        conformer.SetProp("name", "Computed")
+        conformer.SetProp("coord_generation", f"ETKDG{version}")
+        mol.AddConformer(conformer, assignId=True)
+    return True
+
+
 def get_conformer(mol: Mol) -> Conformer:
     """Retrieve an rdkit object for a deemed conformer.
 
@@ -788,6 +831,7 @@ def parse_boltz_schema(  # noqa: C901, PLR0915, PLR0912
     name: str,
     schema: dict,
     ccd: Mapping[str, Mol],
+    conformer_cache: Optional[ConformerCache] = None,
 ) -> Target:
     """Parse a Boltz input yaml / json.
 
@@ -828,6 +872,8 @@ def parse_boltz_schema(  # noqa: C901, PLR0915, PLR0912
         The input schema.
     components : dict
         Dictionary of CCD components.
+    conformer_cache : ConformerCache, optional
+        The on-disk store of the SMILES ligand conformers, by default None.
 
     Returns
     -------
@@ -1014,7 +1060,7 @@ def parse_boltz_schema(  # noqa: C901, PLR0915, PLR0912
                     )
                 atom.SetProp("name", atom_name)
 
-            success = compute_3d_conformer(mol)
+            success = compute_3d_conformer_cached(mol, conformer_cache)
             if not success:
                 msg = f"Failed to compute 3D conformer for {seq}"
                 raise ValueError(msg)
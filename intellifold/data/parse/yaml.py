@@ -20,15 +20,21 @@
 # SOFTWARE.
 
 from pathlib import Path
+from typing import Optional
 
 import yaml
 from rdkit.Chem.rdchem import Mol
 
+from intellifold.conformer_cache import ConformerCache
 from intellifold.data.parse.schema import parse_boltz_schema
 from intellifold.data.types import Target
 
 
-def parse_yaml(path: Path, ccd: dict[str, Mol]) -> Target:
+def parse_yaml(
+    path: Path,
+    ccd: dict[str, Mol],
+    conformer_cache: Optional[ConformerCache] = None,
+) -> Target:
     """Parse a Boltz input yaml / json.
 
     The input file should be a yaml file with the following format:
@@ -64,6 +70,8 @@ def parse_yaml(path: Path, ccd: dict[str, Mol]) -> Target:
         Path to the YAML input format.
     components : Dict
         Dictionary of CCD components.
+    conformer_cache : ConformerCache, optional
+        The on-disk store of the SMILES ligand conformers, by default None.
 
     Returns
     -------
@@ -75,4 +83,4 @@ def parse_yaml(path: Path, ccd: dict[str, Mol]) -> Target:
         data = yaml.safe_load(file)
 
     name = path.stem
-    return parse_boltz_schema(name, data, ccd)
+    return parse_boltz_schema(name, data, ccd, conformer_cache)
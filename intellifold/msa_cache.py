@@ -0,0 +1,242 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content-addressed on-disk MSA store, shared across targets, runs and workers.
+
+MSA search (the MMseqs2 server for the PyTorch engine, jackhmmer/nhmmer for the
+JAX data pipeline) is by far the slowest part of preprocessing, and its result
+only depends on the query sequence(s) and the search settings, not on the target
+it came from. A campaign of many designs against one receptor would otherwise
+search the receptor once per design. With a cache directory set, every search
+result is stored under a hash of what it depends on:
+
+  * an unpaired MSA under `unpaired_key(sequence, **settings)`, i.e. per chain
+    sequence, so it is shared by every complex containing that chain;
+  * a paired MSA under `paired_key(sequences, **settings)`, i.e. per *set* of
+    chain sequences (sorted and deduplicated), since pairing depends on all the
+    chains searched together.
+
+Layout:
+
+  <cache_dir>/<key[:2]>/<key>     one entry (text) per key
+  <cache_dir>/.locks/<n>.lock     lock stripes, see `MsaCache.locked`
+
+Entries are written to a temporary file and renamed into place, so readers never
+see a partial entry. Workers that miss on the same key serialise on its lock
+stripe, so only the first one searches and the others pick up its result. Reads
+refresh an entry's mtime; when the cache grows past `max_bytes`, the least
+recently used entries are deleted; the total size is tracked as entries are
+stored and the directory is only rescanned when it crosses the budget (or every
+`_EVICTION_RESCAN_INTERVAL` stores, to account for other workers). Entries can be deleted at any time; the cache
+is never required for correctness.
+
+Like `intellifold.parallel`, this module is dependency-free so both engines can
+import it.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Callable, Iterator, Sequence
+
+try:
+  import fcntl
+except ImportError:  # Not POSIX: entries are still atomic, searches may repeat.
+  fcntl = None
+
+_NUM_LOCK_STRIPES = 256
+# Eviction deletes down to this fraction of `max_bytes`, so the sizes of the
+# following stores can be added to the tracked total without rescanning.
+_EVICTION_LOW_WATERMARK = 0.9
+# Stores after which the cache is rescanned even if the tracked total is within
+# the budget, as it does not include what other processes stored.
+_EVICTION_RESCAN_INTERVAL = 256
+
+
+def _make_key(
+    kind: str, sequences: Sequence[str], settings: dict[str, Any]
+) -> str:
+  return hashlib.blake2b(
+      json.dumps(
+          {'kind': kind, 'sequences': list(sequences), 'settings': settings},
+          sort_keys=True,
+          default=str,
+      ).encode(),
+      digest_size=16,
+  ).hexdigest()
+
+
+def unpaired_key(sequence: str, **settings: Any) -> str:
+  """The key of the unpaired MSA of one chain sequence."""
+  return _make_key('unpaired', [sequence], settings)
+
+
+def paired_key(sequences: Sequence[str], **settings: Any) -> str:
+  """The key of the paired MSA of a set of chain sequences (order-free)."""
+  return _make_key('paired', sorted(set(sequences)), settings)
+
+
+class MsaCache:
+  """MSA search results stored as text files, one entry per key.
+
+  Attributes:
+    cache_dir: Root directory of the store.
+    max_bytes: Size budget of the entries; None for unbounded.
+  """
+
+  def __init__(self, cache_dir: str, max_bytes: int | None = None):
+    self.cache_dir = os.fspath(cache_dir)
+    self.max_bytes = max_bytes
+    # Total size of the entries as of the last scan plus what this instance
+    # stored since; None until the first scan.
+    self._tracked_bytes = None
+    self._puts_since_scan = 0
+    os.makedirs(os.path.join(self.cache_dir, '.locks'), exist_ok=True)
+
+  def _entry_path(self, key: str) -> str:
+    return os.path.join(self.cache_dir, key[:2], key)
+
+  def get(self, key: str) -> str | None:
+    """The entry stored under `key`; None on a miss."""
+    path = self._entry_path(key)
+    try:
+      with open(path, 'r') as f:
+        text = f.read()
+    except OSError:
+      return None
+    with contextlib.suppress(OSError):
+      os.utime(path)  # Mark as recently used.
+    return text
+
+  def put(self, key: str, text: str) -> None:
+    """Stores `text` under `key`, then evicts down to the size budget."""
+    path = self._entry_path(key)
+    tmp_path = None
+    try:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      fd, tmp_path = tempfile.mkstemp(
+          prefix=f'.{key}.', dir=os.path.dirname(path)
+      )
+      with os.fdopen(fd, 'w') as f:
+        f.write(text)
+      size = os.path.getsize(tmp_path)
+      os.replace(tmp_path, path)
+    except OSError:
+      # Disk full or similar; the cache is best-effort.
+      if tmp_path is not None:
+        with contextlib.suppress(OSError):
+          os.unlink(tmp_path)
+      return
+    if self.max_bytes is None:
+      return
+    self._puts_since_scan += 1
+    if (
+        self._tracked_bytes is None
+        or self._tracked_bytes + size > self.max_bytes
+        or self._puts_since_scan >= _EVICTION_RESCAN_INTERVAL
+    ):
+      self.evict()
+    else:
+      self._tracked_bytes += size
+
+  @contextlib.contextmanager
+  def locked(self, keys: Sequence[str]) -> Iterator[None]:
+    """Holds the lock stripes of `keys`, across threads and processes.
+
+    Stripes are always taken in ascending order, so callers locking
+    overlapping key sets cannot deadlock.
+    """
+    if fcntl is None:
+      yield
+      return
+    stripes = sorted({int(key[:8], 16) % _NUM_LOCK_STRIPES for key in keys})
+    files = []
+    try:
+      for stripe in stripes:
+        f = open(os.path.join(self.cache_dir, '.locks', f'{stripe}.lock'), 'a')
+        files.append(f)
+        fcntl.flock(f, fcntl.LOCK_EX)
+      yield
+    finally:
+      for f in reversed(files):
+        f.close()  # Closing releases the flock.
+
+  def get_or_compute(
+      self,
+      keys: Sequence[str],
+      compute: Callable[[list[int]], Sequence[str]],
+  ) -> list[str]:
+    """The entries of `keys`, computing and storing the missing ones.
+
+    Args:
+      keys: Cache keys.
+      compute: `compute(missing)` returns the entries of `keys[i]` for every
+        index `i` in `missing`, in that order. Only called on a miss, with the
+        keys' locks held, so concurrent callers compute each entry once.
+
+    Returns:
+      One entry per key.
+    """
+    values = [self.get(key) for key in keys]
+    if all(v is not None for v in values):
+      return values
+    with self.locked(keys):
+      # Another worker may have stored them while we waited for the lock.
+      values = [self.get(key) for key in keys]
+      missing = [i for i, v in enumerate(values) if v is None]
+      if missing:
+        for i, text in zip(missing, compute(missing), strict=True):
+          self.put(keys[i], text)
+          values[i] = text
+    return values
+
+  def evict(self) -> None:
+    """Deletes least recently used entries until within the size budget.
+
+    Scans the whole cache; `put` only calls it when the tracked total crosses
+    the budget or every `_EVICTION_RESCAN_INTERVAL` stores.
+    """
+    if self.max_bytes is None or fcntl is None:
+      return
+    with open(os.path.join(self.cache_dir, '.locks', 'evict.lock'), 'a') as f:
+      try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except OSError:
+        return  # Another worker is already evicting.
+      entries = []
+      total = 0
+      for shard in os.scandir(self.cache_dir):
+        if not shard.is_dir() or shard.name.startswith('.'):
+          continue
+        for entry in os.scandir(shard.path):
+          if entry.name.startswith('.'):
+            continue  # In-flight temporary file.
+          with contextlib.suppress(OSError):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+      if total > self.max_bytes:
+        target = self.max_bytes * _EVICTION_LOW_WATERMARK
+        for _, size, path in sorted(entries):
+          if total <= target:
+            break
+          with contextlib.suppress(OSError):
+            os.unlink(path)
+          total -= size
+      self._tracked_bytes = total
+      self._puts_since_scan = 0
@@ -60,6 +60,12 @@ config = mlc.ConfigDict(
             "eps": eps,
             "inf": inf,
             "advanced_conversion": False,
+            # Reuse activation buffers in place at inference (lower peak memory)
+            "inplace_inference": False,
+            # Attention implementation, "eager" or "sdpa" (see primitives.py)
+            "attention_backend": "eager",
+            # Diffusion step implementation, "eager", "compile" or "cuda_graph" (see model.py)
+            "diffusion_step_backend": "eager",
         },
         
         "backbone": {
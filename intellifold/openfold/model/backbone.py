@@ -92,7 +92,9 @@ class BackboneTrunk(nn.Module):
         batch_dims = feats["aatype"].shape[:-2]
         no_token = feats["aatype"].shape[-2]
 
-        inplace_safe = False
+        inplace_safe = self.globals.inplace_inference and not (
+            self.training or torch.is_grad_enabled()
+        )
 
         # Prep some features
         single_mask = feats["seq_mask"]
@@ -228,8 +230,9 @@ class BackboneTrunk(nn.Module):
         Returns:
             Output of the forward pass.
         """
-        inplace_safe = not (self.training or torch.is_grad_enabled())
-        inplace_safe = False
+        inplace_safe = self.globals.inplace_inference and not (
+            self.training or torch.is_grad_enabled()
+        )
         # Initialize recycling embeddings
         s_prev, z_prev = None, None
         prevs = [s_prev, z_prev]
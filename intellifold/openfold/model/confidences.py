@@ -15,7 +15,7 @@
 import json
 import numpy as np
 import torch
-from intellifold.openfold.model.heads import compute_tm
+from intellifold.openfold.model.heads import _calculate_bin_centers
 from scipy import spatial
 
 
@@ -24,58 +24,92 @@ _FRACTION_DISORDERED_WEIGHT = 0.5
 _CLASH_PENALIZATION_WEIGHT = 100.0
 
 
+def _chain_index(asym_id):
+    """Dense chain index (asym_id - 1) per token and the number of chains."""
+    chain_ids = torch.unique(asym_id)
+    n_chain = int((chain_ids != 0).sum())   ## asym_id 0 is padding
+    return (asym_id - 1).long(), n_chain
+
+
+def _chain_tm_kernels(n_res, max_bin=31, no_bins=64):
+    """Per-bin TM weights for every entry of an [..] tensor of residue counts.
+
+    Same d0 / bin-centre definition as ``heads.compute_tm``.
+    """
+    boundaries = torch.linspace(0, max_bin, steps=(no_bins - 1), device=n_res.device)
+    bin_centers = _calculate_bin_centers(boundaries)
+    clipped_n = torch.clamp(n_res, min=19)
+    d0 = 1.24 * (clipped_n - 15) ** (1.0 / 3) - 1.8
+    return 1.0 / (1 + (bin_centers ** 2) / (d0[..., None] ** 2))
+
+
 def calculate_chain_based_ptm(
     p_pae,
-    input_features
+    input_features,
+    chunk_size=256,
     ):
     '''
     Calculate chain-based ptm and iptm
     
+    Equivalent to calling ``compute_tm`` once per chain and once per chain pair
+    (with ``interface=True``), but done with segment reductions: for every
+    aligned residue i and chain c, the PAE bin probabilities are summed over the
+    residues of c once, and every chain / chain-pair TM term is read off those
+    sums. The cost is one pass over the PAE logits instead of one per chain pair.
+
     Args:
         p_pae: [bs, num_token, num_token, 64] the logit of pae
-        diffusion_batch_size: int
         input_features: dict
+        chunk_size: number of aligned residues processed at once (bounds memory)
     '''
+    eps = 1e-8
     diffusion_batch_size = p_pae.shape[0]
-    single_mask = input_features["seq_mask"]
-    frame_mask = input_features["frame_mask"]
-    asym_id = input_features["asym_id"]
-    asym_id_to_asym_mask = {aid.item(): asym_id == aid for aid in torch.unique(asym_id)}
-    if 0 in asym_id_to_asym_mask:
-        asym_id_to_asym_mask.pop(0)   ## pad asym_id
-    N_chain = len(asym_id_to_asym_mask)
-    chain_ptm = torch.zeros(size=(diffusion_batch_size, N_chain,)).to(p_pae.device)
-    chain_pair_iptm = torch.zeros(size=(diffusion_batch_size, N_chain, N_chain)).to(p_pae.device)
-    chain_iptm = torch.zeros(size=(diffusion_batch_size, N_chain,)).to(p_pae.device)
-    
+    device = p_pae.device
+    single_mask = input_features["seq_mask"].to(device)
+    frame_mask = input_features["frame_mask"].to(device)
+    asym_id = input_features["asym_id"].to(device)
+    chain, N_chain = _chain_index(asym_id[0])
+    weights = (frame_mask * single_mask)[0].float() * (chain >= 0)   ## [N]
+    one_hot = torch.nn.functional.one_hot(chain.clamp(min=0), N_chain).float() * weights[:, None]   ## [N, C]
+    n_res = one_hot.sum(0)   ## [C]
+
+    # TM kernel per (chain of the aligned residue, scored chain): the chain's own
+    # size on the diagonal (chain ptm), the pair's combined size off it (ipTM).
+    pair_n = n_res[:, None] + n_res[None, :]
+    pair_n = torch.where(torch.eye(N_chain, dtype=torch.bool, device=device), n_res[:, None].expand_as(pair_n), pair_n)
+    kernels = _chain_tm_kernels(pair_n)   ## [C, C, 64]
+    denom = eps + n_res   ## [C]
+
+    # best[b, c, e] = max over aligned residues i in chain c of the TM term of
+    # i against the residues of chain e.
+    best = torch.zeros(size=(diffusion_batch_size, N_chain, N_chain), device=device)
     for index in range(diffusion_batch_size):
-        ### chain-based ptm
-        for aid, asym_mask in asym_id_to_asym_mask.items():
-            chain_ptm[index, aid-1] = compute_tm(p_pae[index:index+1], residue_weights=frame_mask * single_mask * asym_mask)
-        ### chain-pair based iptm
-        for aid_i in range(N_chain):
-            for aid_j in range(N_chain):
-                ### same chain iptm equivalent to ptm
-                if aid_i == aid_j:
-                    chain_pair_iptm[index, aid_i, aid_j] = chain_ptm[index, aid_i]
-                    continue
-                if aid_i > aid_j:
-                    chain_pair_iptm[index, aid_i, aid_j] = chain_pair_iptm[index, aid_j, aid_i]
-                pair_asym_mask = asym_id_to_asym_mask[aid_i+1] + asym_id_to_asym_mask[aid_j+1]
-                chain_pair_iptm[index, aid_i, aid_j] = compute_tm(p_pae[index:index+1], residue_weights=frame_mask * single_mask * pair_asym_mask, interface=True, asym_id=asym_id)
-                
-        ### chain-based iptm
-        for aid, asym_mask in asym_id_to_asym_mask.items():
-            ## asym_id i with all other asym_id j(i!=j)
-            pairs = [
-                (i, j)
-                for i in range(N_chain)
-                for j in range(N_chain)
-                if (i == aid-1 or j == aid-1) and (i != j)
-            ]
-            vals = [chain_pair_iptm[index, i, j] for (i, j) in pairs]
-            if len(vals) > 0:
-                chain_iptm[index, aid-1] = torch.stack(vals, dim=-1).mean(dim=-1)
+        for start in range(0, p_pae.shape[1], chunk_size):
+            rows = slice(start, start + chunk_size)
+            probs = torch.nn.functional.softmax(p_pae[index, rows].float(), dim=-1)   ## [r, N, 64]
+            per_chain = torch.einsum("rjb,jc->rcb", probs, one_hot)   ## [r, C, 64]
+            row_chain = chain[rows].clamp(min=0)
+            per_alignment = (per_chain * kernels[row_chain]).sum(-1) / denom   ## [r, C]
+            per_alignment = per_alignment * weights[rows, None]
+            best[index].scatter_reduce_(
+                0, row_chain[:, None].expand_as(per_alignment), per_alignment,
+                reduce="amax", include_self=True)
+
+    ### chain-based ptm / chain-pair based iptm (same chain iptm equivalent to ptm)
+    chain_ptm = torch.diagonal(best, dim1=-2, dim2=-1)
+    chain_pair_iptm = torch.maximum(best, best.transpose(-1, -2))
+    diag = torch.arange(N_chain, device=device)
+    chain_pair_iptm[:, diag, diag] = chain_ptm
+
+    ### chain-based iptm: mean over the pairs (i, j), i != j, that involve the chain
+    chain_iptm = torch.zeros(size=(diffusion_batch_size, N_chain,), device=device)
+    if N_chain > 1:
+        pairs = [
+            [(i, j) for i in range(N_chain) for j in range(N_chain) if (i == c or j == c) and (i != j)]
+            for c in range(N_chain)
+        ]
+        pairs = torch.as_tensor(pairs, device=device)   ## [C, 2(C-1), 2]
+        chain_iptm = chain_pair_iptm[:, pairs[..., 0], pairs[..., 1]].mean(dim=-1)
     return chain_iptm.cpu().numpy(), chain_pair_iptm.cpu().numpy(), chain_ptm.cpu().numpy()
 
 
@@ -86,39 +120,26 @@ def calculate_chain_based_plddt(
     """
     Calculate chain-based pLDDT
 
+    Per-chain atom pLDDT sums and counts are segment-summed in one pass.
+
     Args:
         plddt: [bs, num_token, max_atoms] the logit of pLDDT
         input_features: dict
     """
-    diffusion_batch_size = plddt.shape[0]
-    pred_dense_atom_mask = input_features['pred_dense_atom_mask'].cpu()   
-    single_mask = input_features["seq_mask"]
-    asym_id = input_features["asym_id"].cpu()
-    asym_id_to_asym_mask = {aid.item(): asym_id == aid for aid in torch.unique(asym_id)}
-    if 0 in asym_id_to_asym_mask:
-        asym_id_to_asym_mask.pop(0)   ## pad asym_id
-    N_chain = len(asym_id_to_asym_mask)
-    chain_plddt = torch.zeros(size=(diffusion_batch_size, N_chain,)).to(plddt.device)
-    chain_pair_plddt = torch.zeros(size=(diffusion_batch_size, N_chain, N_chain)).to(plddt.device)
-    
-    for index in range(diffusion_batch_size):
-        ### chain-based pLDDT
-        for aid, asym_mask in asym_id_to_asym_mask.items():
-            asym_pred_dense_atom_mask = (pred_dense_atom_mask * asym_mask.unsqueeze(-1)).squeeze(0)
-            chain_plddt[index, aid-1] = plddt[index, asym_pred_dense_atom_mask].mean()
-            
-        #### chain-pair based pLDDT
-        for aid_i in range(N_chain):
-            for aid_j in range(N_chain):
-                if aid_i == aid_j:
-                    chain_pair_plddt[index, aid_i, aid_j] = chain_plddt[index, aid_i]
-                    continue
-                if aid_i > aid_j:
-                    chain_pair_plddt[index, aid_i, aid_j] = chain_pair_plddt[index, aid_j, aid_i]
-                pair_asym_mask = asym_id_to_asym_mask[aid_i+1] + asym_id_to_asym_mask[aid_j+1]
-                pair_asym_pred_dense_atom_mask = (pred_dense_atom_mask * pair_asym_mask.unsqueeze(-1)).squeeze(0)
-                chain_pair_plddt[index, aid_i, aid_j] = plddt[index, pair_asym_pred_dense_atom_mask].mean()
+    device = plddt.device
+    pred_dense_atom_mask = input_features['pred_dense_atom_mask'].to(device)[0]   ## [N, A]
+    chain, N_chain = _chain_index(input_features["asym_id"].to(device)[0])
+    atom_mask = pred_dense_atom_mask & (chain >= 0)[:, None]
+    atom_chain = chain.clamp(min=0)[:, None].expand_as(atom_mask)[atom_mask]   ## [num_atoms]
+    atom_plddt = plddt[:, atom_mask].double()   ## [bs, num_atoms]
+
+    sums = torch.zeros(size=(plddt.shape[0], N_chain), dtype=torch.float64, device=device)
+    sums.index_add_(1, atom_chain, atom_plddt)
+    counts = torch.bincount(atom_chain, minlength=N_chain)
+    chain_plddt = (sums / counts).float()
 
+    # The summary JSON has always reported chain_plddt under "chain_pair_plddt";
+    # keep that format.
     return chain_plddt.cpu().numpy(), chain_plddt.cpu().numpy()
 
 
@@ -156,33 +177,36 @@ def calculate_clash(
     coords = coords[:, pred_dense_atom_mask[0]]
     ## repeat the chain index and residue index for each atom
     max_atoms = 24
-    atom_leval_resid = input_features['residue_index'].cpu().unsqueeze(-1).repeat(1, 1, max_atoms)[pred_dense_atom_mask]
-    atom_level_chainid = input_features['asym_id'].cpu().unsqueeze(-1).repeat(1, 1, max_atoms)[pred_dense_atom_mask]
-    chain_ids = np.unique(atom_level_chainid)
-    
-    
-    for index in range(len(coords)):
-        coord_kdtree = spatial.cKDTree(coords[index])
-        clashes_per_atom = coord_kdtree.query_ball_point(coords[index], p=2.0, r=cutoff_radius)
-        per_atom_has_clash = np.zeros(len(coords[index]), dtype=np.int32)
-                
-        for atom_idx, clashing_indices in enumerate(clashes_per_atom):
-            for clashing_idx in clashing_indices:
-                if np.abs(atom_leval_resid[atom_idx] - atom_leval_resid[clashing_idx]) > 1 or (atom_level_chainid[atom_idx] != atom_level_chainid[clashing_idx]):
-                    per_atom_has_clash[atom_idx] = 1.0
-                    break
-                
-        ### calculate the atom_clash ratio(frac_clashes) of each chain
-        for chain_id in chain_ids:
-            mask = (atom_level_chainid == chain_id).numpy()
-            num_atoms = mask.sum()
-            if num_atoms == 0:
-                continue
-            num_clashes = per_atom_has_clash[mask].sum()
-            frac_clashes = num_clashes / num_atoms
-            if (num_clashes > min_clashes_for_overlap or frac_clashes > min_fraction_for_overlap):
-                has_clashes[index] = 1.0
-                break
+    atom_leval_resid = input_features['residue_index'].cpu().unsqueeze(-1).repeat(1, 1, max_atoms)[pred_dense_atom_mask].numpy()
+    atom_level_chainid = input_features['asym_id'].cpu().unsqueeze(-1).repeat(1, 1, max_atoms)[pred_dense_atom_mask].numpy()
+    _, atom_chain = np.unique(atom_level_chainid, return_inverse=True)
+    num_samples, num_atoms = coords.shape[:2]
+
+    ## one KD-tree over all samples: shift each sample along x by more than the
+    ## structure's extent, so no pair crosses samples
+    extent = np.ptp(coords[..., 0]) + 2 * cutoff_radius + 1.0
+    shifted = coords.reshape(-1, 3).astype(np.float64)
+    shifted[:, 0] += np.repeat(np.arange(num_samples) * extent, num_atoms)
+    pairs = spatial.cKDTree(shifted).query_pairs(r=cutoff_radius, p=2.0, output_type='ndarray')
+
+    ## a pair clashes unless both atoms are in the same or adjacent residues of one chain
+    sample = pairs[:, 0] // num_atoms
+    i, j = pairs[:, 0] % num_atoms, pairs[:, 1] % num_atoms
+    clash = (np.abs(atom_leval_resid[i] - atom_leval_resid[j]) > 1) | (atom_level_chainid[i] != atom_level_chainid[j])
+    per_atom_has_clash = np.zeros((num_samples, num_atoms), dtype=bool)
+    per_atom_has_clash[sample[clash], i[clash]] = True
+    per_atom_has_clash[sample[clash], j[clash]] = True
+
+    ### calculate the atom_clash ratio(frac_clashes) of each chain
+    num_chains = atom_chain.max() + 1
+    chain_atoms = np.bincount(atom_chain, minlength=num_chains)
+    num_clashes = np.stack([
+        np.bincount(atom_chain, weights=per_atom_has_clash[index], minlength=num_chains)
+        for index in range(num_samples)
+    ])
+    frac_clashes = num_clashes / chain_atoms
+    overlap = (num_clashes > min_clashes_for_overlap) | (frac_clashes > min_fraction_for_overlap)
+    has_clashes[overlap.any(axis=-1)] = 1.0
     return has_clashes
 
 
@@ -617,6 +617,35 @@ class DiffusionConditioning(nn.Module):
             inplace_safe:
                 whether to do in place operations
         """
+        z = self.pair_conditioning(
+            asym_id, residue_index, entity_id, token_index, sym_id,
+            z_trunk=z_trunk,
+            inplace_safe=inplace_safe,
+        )
+        s = self.single_conditioning(s_trunk=s_trunk, s_inputs=s_inputs)
+
+        s = self.noise_conditioning(s, t, inplace_safe=inplace_safe)
+            
+        return s, z
+
+    def pair_conditioning(
+        self,
+        asym_id,
+        residue_index,
+        entity_id,
+        token_index,
+        sym_id,
+        z_trunk,
+        inplace_safe=False,
+    ):
+        """
+        The pair branch of Algorithm 21 (lines 1-5). It does not depend on the
+        noise level, so it can be computed once per trunk output and reused for
+        every diffusion step.
+        
+        Returns:
+            [*, N_token, N_token, C_z] pair conditioning
+        """
         relative_position_encodings = self.relative_positions_encoding(asym_id, residue_index, entity_id, token_index, sym_id, dtype = z_trunk.dtype)
         if self.advanced_conditioning:
             z = self.layer_norm_z(z_trunk)
@@ -633,7 +662,15 @@ class DiffusionConditioning(nn.Module):
                 transition(z),
                 inplace=inplace_safe,
             )
+        return z
+
+    def single_conditioning(self, s_trunk, s_inputs):
+        """
+        The noise-independent part of the single branch of Algorithm 21 (lines 6-7).
         
+        Returns:
+            [*, N_token, C_s] single conditioning before the noise embedding
+        """
         if self.advanced_conditioning:
             s = self.layer_norm_s(s_trunk)
             s = torch.cat((s, self.layer_norm_s_inputs(self.linear_s_inputs(s_inputs))), dim = -1)
@@ -642,7 +679,21 @@ class DiffusionConditioning(nn.Module):
             s = torch.cat((s_trunk, s_inputs), dim = -1)
             s = self.layer_norm_s(s)
             s = self.linear_s(s)
+        return s
 
+    def noise_conditioning(self, s, t, inplace_safe=False):
+        """
+        Adds the Fourier embedding of the noise level t to the single conditioning
+        and applies the single transitions (Algorithm 21 lines 8-13).
+        
+        Args:
+            s:
+                [*, N_token, C_s] output of single_conditioning
+            t:
+                noisy level at the current diffusion step
+        Returns:
+            [*, N_token, C_s] single conditioning at noise level t
+        """
         n = self.fourier_embedding(0.25 * torch.log((t / self.sigma_data).clamp(min = self.eps)))
         n = self.layer_norm_f(n)
         # Broadcast manually if batch size is not 1
@@ -660,8 +711,7 @@ class DiffusionConditioning(nn.Module):
                 transition(s),
                 inplace=inplace_safe,
             )
-            
-        return s, z
+        return s
     
 class AtomAttentionEncoder(nn.Module):
     """
@@ -769,7 +819,8 @@ class AtomAttentionEncoder(nn.Module):
         )
         
         self.relu = nn.ReLU()
-    def forward(
+
+    def atom_conditioning(
         self,
         ref_pos,
         ref_charge,
@@ -777,54 +828,22 @@ class AtomAttentionEncoder(nn.Module):
         ref_element,
         ref_atom_name_chars,
         ref_space_uid,
-        atom_mask,
         s_trunk,
         z,
-        r,
         molecule_atom_lens,
-        chunk_size=None,
-        use_deepspeed_evo_attention=False,
         inplace_safe=False,
     ):
         """
+        The noise-independent part of Algorithm 5 (lines 1-14): the atom single
+        conditioning c and the windowed atom pair representation p.
+        
         Args:
-            ref_pos:
-                [*, N_atom, 3] ref atom positions
-            ref_charge:
-                [*, N_atom] ref atom charges
-            ref_mask:
-                [*, N_atom] ref atom mask
-            ref_element:
-                [*, N_atom, 128] ref atom element
-            ref_atom_name_chars:
-                [*, N_atom, 4, 64] atom name characters
-            ref_space_uid:
-                [*, N_atom] ref space uid
-            atom_mask:
-                [*, N_atom] atom mask
-            s_trunk:
-                [*, N_token, C_s] single representation from pairformer trunk
-            z:
-                [*, N_token, N_token, C_z] pair representation from pairformer trunk after conditioning
-            r:
-                [*, N_atom, 3] noisy atom positions
-            molecule_atom_lens:
-                [*,] molecule atom lengths
-            chunk_size:
-                chunk size for attention
-            use_deepspeed_evo_attention:
-                whether to use deepspeed evo attention
-            inplace_safe:
-                whether to do in place
+            See forward.
         Returns:
-            a:
-                [*, N_token, C_token] token features
-            q_skip:
-                [*, N_atom, C_atom] atom features
-            c_skip:
-                [*, N_atom, C_atom] conditioned atom features
-            p_skip:
-                [*, N_atom, N_atom, C_atompair] atom pair features
+            c:
+                [*, N_atom, C_atom] atom single conditioning
+            p:
+                [*, N_window, W_row, W_col, C_atompair] atom pair conditioning
         """
         window_size_row = self.window_size_row
         window_size_col = self.window_size_col
@@ -937,12 +956,91 @@ class AtomAttentionEncoder(nn.Module):
         p2 = self.linear_mlp_p_2(self.relu(p2))
         p = add(p, self.linear_mlp_p_3(self.relu(p2)), inplace=inplace_safe)
         
+        return c, p
+
+    def forward(
+        self,
+        ref_pos,
+        ref_charge,
+        ref_mask,
+        ref_element,
+        ref_atom_name_chars,
+        ref_space_uid,
+        atom_mask,
+        s_trunk,
+        z,
+        r,
+        molecule_atom_lens,
+        chunk_size=None,
+        use_deepspeed_evo_attention=False,
+        inplace_safe=False,
+        conditioning=None,
+    ):
+        """
+        Args:
+            ref_pos:
+                [*, N_atom, 3] ref atom positions
+            ref_charge:
+                [*, N_atom] ref atom charges
+            ref_mask:
+                [*, N_atom] ref atom mask
+            ref_element:
+                [*, N_atom, 128] ref atom element
+            ref_atom_name_chars:
+                [*, N_atom, 4, 64] atom name characters
+            ref_space_uid:
+                [*, N_atom] ref space uid
+            atom_mask:
+                [*, N_atom] atom mask
+            s_trunk:
+                [*, N_token, C_s] single representation from pairformer trunk
+            z:
+                [*, N_token, N_token, C_z] pair representation from pairformer trunk after conditioning
+            r:
+                [*, N_atom, 3] noisy atom positions
+            molecule_atom_lens:
+                [*,] molecule atom lengths
+            chunk_size:
+                chunk size for attention
+            use_deepspeed_evo_attention:
+                whether to use deepspeed evo attention
+            inplace_safe:
+                whether to do in place
+            conditioning:
+                optional (c, p) tuple from atom_conditioning. Both only depend on
+                the reference features and the trunk outputs, so the diffusion
+                module computes them once and reuses them for every step.
+        Returns:
+            a:
+                [*, N_token, C_token] token features
+            q_skip:
+                [*, N_atom, C_atom] atom features
+            c_skip:
+                [*, N_atom, C_atom] conditioned atom features
+            p_skip:
+                [*, N_atom, N_atom, C_atompair] atom pair features
+        """
+        if conditioning is None:
+            c, p = self.atom_conditioning(
+                ref_pos = ref_pos,
+                ref_charge = ref_charge,
+                ref_mask = ref_mask,
+                ref_element = ref_element,
+                ref_atom_name_chars = ref_atom_name_chars,
+                ref_space_uid = ref_space_uid,
+                s_trunk = s_trunk,
+                z = z,
+                molecule_atom_lens = molecule_atom_lens,
+                inplace_safe = inplace_safe,
+            )
+        else:
+            c, p = conditioning
+        
         if self.initial == False:
             p = einops.repeat(p, "b ... -> (b n) ...", n = r.shape[0] // p.shape[0]) if (p.shape[0] != 1 and r.shape[0] != p.shape[0]) else p
             c = einops.repeat(c, "b ... -> (b n) ...", n = r.shape[0] // c.shape[0]) if (c.shape[0] != 1 and r.shape[0] != c.shape[0]) else c
             
         if self.initial == False:
-            seq_len = s_trunk.shape[-2]
             q =  self.linear_r(r)
             q = add(q, c, inplace=False)
         else:
@@ -1075,7 +1173,7 @@ class AtomAttentionDecoder(nn.Module):
         if not self.advanced_conversion:
             a = repeat_consecutive_with_lens(a, molecule_atom_lens)
         else:
-            a = repeat_consecutive_with_lens_advanced(a, molecule_atom_lens)
+            a = repeat_consecutive_with_lens_advanced(a, molecule_atom_lens, total_len=q_skip.shape[-2])
         q = a + q_skip
         q = q * atom_mask.unsqueeze(-1)
         # A6 Line 2
@@ -1092,6 +1190,22 @@ class AtomAttentionDecoder(nn.Module):
         r_update = self.linear_q(self.layer_norm_q(q))
         return r_update
     
+class DiffusionConditioningCache(NamedTuple):
+    """
+    Noise-independent conditioning of the diffusion module, computed once per
+    trunk output by DiffusionModule.prepare_conditioning and reused for every
+    diffusion step and sample.
+    """
+    # [*, N_token, C_s] single conditioning before the noise embedding
+    s: torch.Tensor
+    # [*, N_token, N_token, C_z] pair conditioning
+    z: torch.Tensor
+    # [*, N_atom, C_atom] atom single conditioning
+    c: torch.Tensor
+    # [*, N_window, W_row, W_col, C_atompair] atom pair conditioning
+    p: torch.Tensor
+
+
 class DiffusionModule(nn.Module):
     """
     The Diffusion Module
@@ -1150,6 +1264,61 @@ class DiffusionModule(nn.Module):
         )
 
 
+    def prepare_conditioning(
+        self,
+        batch,
+        s_inputs,
+        s_trunk,
+        z_trunk,
+    ):
+        """
+        Computes the parts of the conditioning that do not depend on the noise
+        level: the pair and single branches of Algorithm 21 and the atom single
+        and pair conditioning of Algorithm 5.
+        
+        Args:
+            batch:
+                batch dictionary
+            s_inputs:
+                [*, N_token, C_s_inputs] single representation from input features
+            s_trunk:
+                [*, N_token, C_s] single representation from pairformer trunk
+            z_trunk:
+                [*, N_token, N_token, C_z] pair representation from pairformer trunk
+        Returns:
+            DiffusionConditioningCache to pass to forward
+        """
+        inplace_safe = self.globals.inplace_inference and not (
+            self.training or torch.is_grad_enabled()
+        )
+        
+        z = self.diffusion_conditioning.pair_conditioning(
+            asym_id = batch["asym_id"],
+            residue_index = batch["residue_index"],
+            entity_id = batch["entity_id"],
+            token_index = batch["token_index"],
+            sym_id = batch["sym_id"],
+            z_trunk = z_trunk,
+            inplace_safe = inplace_safe,
+        )
+        s = self.diffusion_conditioning.single_conditioning(
+            s_trunk = s_trunk,
+            s_inputs = s_inputs,
+        )
+        c, p = self.atom_attention_encoder.atom_conditioning(
+            ref_pos = batch["ref_pos"],
+            ref_charge = batch["ref_charge"],
+            ref_mask = batch["ref_mask"].to(batch["ref_pos"].dtype),
+            ref_element = batch["ref_element"],
+            ref_atom_name_chars = batch["ref_atom_name_chars"],
+            ref_space_uid = batch["ref_space_uid"],
+            s_trunk = s_trunk,
+            z = z,
+            molecule_atom_lens = batch["molecule_atom_lens"],
+            inplace_safe = inplace_safe,
+        )
+        return DiffusionConditioningCache(s=s, z=z, c=c, p=p)
+
     def forward(
         self,
         r_noisy,
@@ -1158,6 +1327,7 @@ class DiffusionModule(nn.Module):
         s_inputs,
         s_trunk,
         z_trunk,
+        cache=None,
     ):
         """
         Args:
@@ -1173,13 +1343,17 @@ class DiffusionModule(nn.Module):
                 [*, N_token, C_s] single representation from pairformer trunk
             z_trunk:
                 [*, N_token, N_token, C_z] pair representation from pairformer trunk
+            cache:
+                optional DiffusionConditioningCache from prepare_conditioning. If
+                given, only the noise-dependent conditioning is recomputed.
         Returns:
             [*, N_atom, 3] denoised atom positions
         """
         
         
-        inplace_safe = not (self.training or torch.is_grad_enabled())
-        inplace_safe = False
+        inplace_safe = self.globals.inplace_inference and not (
+            self.training or torch.is_grad_enabled()
+        )
         
         ref_mask = batch["ref_mask"]
         atom_mask = batch["aggregated_pred_dense_atom_mask"]
@@ -1192,18 +1366,24 @@ class DiffusionModule(nn.Module):
         
         # DIFFUSION CONDITIONING, A20 Line 1
         # A21 
-        s, z= self.diffusion_conditioning(
-            asym_id = batch["asym_id"],
-            residue_index = batch["residue_index"],
-            entity_id = batch["entity_id"],
-            token_index = batch["token_index"],
-            sym_id = batch["sym_id"],
-            t = t,
-            s_trunk = s_trunk,
-            s_inputs = s_inputs,
-            z_trunk = z_trunk,
-            inplace_safe=inplace_safe,
-        )
+        if cache is None:
+            s, z= self.diffusion_conditioning(
+                asym_id = batch["asym_id"],
+                residue_index = batch["residue_index"],
+                entity_id = batch["entity_id"],
+                token_index = batch["token_index"],
+                sym_id = batch["sym_id"],
+                t = t,
+                s_trunk = s_trunk,
+                s_inputs = s_inputs,
+                z_trunk = z_trunk,
+                inplace_safe=inplace_safe,
+            )
+            atom_conditioning = None
+        else:
+            s = self.diffusion_conditioning.noise_conditioning(cache.s, t, inplace_safe=inplace_safe)
+            z = cache.z
+            atom_conditioning = (cache.c, cache.p)
         
         # ATOM ATTENTION ENCODER, A20 Line 3
         # A5
@@ -1222,6 +1402,7 @@ class DiffusionModule(nn.Module):
             chunk_size = self.globals.chunk_size,
             use_deepspeed_evo_attention = self.globals.use_deepspeed_evo_attention,
             inplace_safe=inplace_safe,
+            conditioning=atom_conditioning,
         )
         
         # Broadcast manually if batch size is larger than 1
@@ -12,12 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import logging
+
 import torch
 import torch.nn as nn
 import einops
 from intellifold.openfold.model.backbone import BackboneTrunk
-from intellifold.openfold.model.diffusion import DiffusionModule
+from intellifold.openfold.model.diffusion import DiffusionModule, DiffusionConditioningCache
 from intellifold.openfold.model.heads import ConfidenceHead
+from intellifold.openfold.model.primitives import set_attention_backend
 from intellifold.openfold.utils.atom_token_conversion import aggregate_fn, aggregate_fn_advanced
 
 from torch.amp import autocast
@@ -25,6 +29,104 @@ from torch.amp import autocast
 def exists(v):
     return v is not None
 
+DIFFUSION_STEP_BACKENDS = ("eager", "compile", "cuda_graph")
+
+# batch entries read by a diffusion step once the conditioning is cached
+DIFFUSION_STEP_FEATURES = (
+    "ref_pos",
+    "ref_charge",
+    "ref_mask",
+    "ref_element",
+    "ref_atom_name_chars",
+    "ref_space_uid",
+    "aggregated_pred_dense_atom_mask",
+    "seq_mask",
+    "molecule_atom_lens",
+    "asym_id",
+    "residue_index",
+    "entity_id",
+    "token_index",
+    "sym_id",
+)
+
+
+class DiffusionStepGraphs:
+    """
+    CUDA graphs of one diffusion step (diffusion_edm_forward with a cached
+    conditioning), keyed by the shapes of the step inputs.
+
+    Tokens are padded to the buckets of the data pipeline, so every step and seed of
+    a target, and every target with the same token bucket and atom count, replays
+    the same graph: the inputs of a new target are copied into the static buffers
+    of the graph before its first step. The noise and the random augmentation are
+    drawn outside of the graph, with the per-seed generators.
+    """
+
+    def __init__(self, max_graphs=4):
+        self.max_graphs = max_graphs
+        self.graphs = collections.OrderedDict()
+        self.failed = set()
+
+    def bind(self, step_fn, inputs):
+        """
+        Args:
+            step_fn:
+                step_fn(inputs) -> x_denoised, reads only the tensors in inputs
+            inputs:
+                dict of the step inputs, x_noisy and t included
+        Returns:
+            step(x_noisy, t) -> x_denoised, replaying the graph of the inputs. The
+            output buffer is overwritten by the next step.
+        """
+        key = tuple((name, tuple(value.shape), value.dtype, value.device) for name, value in inputs.items())
+        if key in self.failed:
+            return lambda x_noisy, t: step_fn(dict(inputs, x_noisy=x_noisy, t=t))
+
+        if key in self.graphs:
+            self.graphs.move_to_end(key)
+            graph, static_inputs, static_output = self.graphs[key]
+            for name, value in inputs.items():
+                static_inputs[name].copy_(value)
+        else:
+            graph, static_inputs, static_output = None, {name: value.clone() for name, value in inputs.items()}, None
+
+        def step(x_noisy, t):
+            nonlocal graph, static_output
+            static_inputs["x_noisy"].copy_(x_noisy)
+            static_inputs["t"].copy_(t)
+            if graph is None:
+                try:
+                    graph, static_output = self._capture(step_fn, static_inputs)
+                except torch.cuda.OutOfMemoryError:
+                    raise
+                except RuntimeError as e:
+                    logging.warning(f"Capturing the diffusion step failed ({e}), running it eagerly instead")
+                    self.failed.add(key)
+                    return step_fn(static_inputs)
+                self.graphs[key] = (graph, static_inputs, static_output)
+                while len(self.graphs) > self.max_graphs:
+                    self.graphs.popitem(last=False)
+            graph.replay()
+            return static_output
+
+        return step
+
+    @staticmethod
+    def _capture(step_fn, static_inputs):
+        # warm up on a side stream, as required before capturing
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(2):
+                step_fn(static_inputs)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_output = step_fn(static_inputs)
+        return graph, static_output
+
+
 class IntelliFold(nn.Module):
     """
     Implements Algorithm 1
@@ -48,18 +150,80 @@ class IntelliFold(nn.Module):
         self.centre_random_augmentation = CentreRandomAugmentation()
         self.generator = generator
         self.advanced_conversion = self.globals.advanced_conversion
+        set_attention_backend(self, self.globals.attention_backend)
+        
+        self.diffusion_step_backend = self.globals.diffusion_step_backend
+        if self.diffusion_step_backend not in DIFFUSION_STEP_BACKENDS:
+            raise ValueError(
+                f"Unknown diffusion step backend {self.diffusion_step_backend}, choose one of {DIFFUSION_STEP_BACKENDS}"
+            )
+        self.diffusion_step_graphs = DiffusionStepGraphs()
+        self._compiled_diffusion_step = None
 
     @autocast("cuda",enabled=True, dtype=torch.float32)
-    def diffusion_edm_forward(self,x_noisy,t,input_features,s_inputs,s_trunk,z_trunk):
+    def diffusion_edm_forward(self,x_noisy,t,input_features,s_inputs,s_trunk,z_trunk,conditioning_cache=None):
         
         scale_skip = self.diffusion_module.sigma_data ** 2 / (t ** 2 + self.diffusion_module.sigma_data ** 2)
         scale_out = t * self.diffusion_module.sigma_data / ((t ** 2 + self.diffusion_module.sigma_data ** 2).sqrt())
         scale_in = 1 / ((self.diffusion_module.sigma_data ** 2 + t ** 2).sqrt())
         r_noisy = x_noisy * scale_in
-        r_update = self.diffusion_module(r_noisy,t,input_features,s_inputs,s_trunk,z_trunk)
+        r_update = self.diffusion_module(r_noisy,t,input_features,s_inputs,s_trunk,z_trunk,cache=conditioning_cache)
         x_out = scale_skip * x_noisy + scale_out * r_update
         return x_out
     
+    def _diffusion_step_inputs(self, step_inputs):
+        features = {key: step_inputs[key] for key in DIFFUSION_STEP_FEATURES}
+        cache = DiffusionConditioningCache(**{key: step_inputs[f"cache_{key}"] for key in DiffusionConditioningCache._fields})
+        return features, cache
+
+    def _diffusion_step(self, step_inputs):
+        features, cache = self._diffusion_step_inputs(step_inputs)
+        return self.diffusion_edm_forward(
+            x_noisy = step_inputs["x_noisy"],
+            t = step_inputs["t"],
+            input_features = features,
+            s_inputs = None,
+            s_trunk = step_inputs["s_trunk"],
+            z_trunk = None,
+            conditioning_cache = cache,
+        )
+
+    def diffusion_step(self, input_features, s_inputs, s_trunk, z_trunk, conditioning_cache, x, t):
+        """
+        Returns step(x_noisy, t) -> x_denoised for the diffusion_step_backend:
+            eager: diffusion_edm_forward
+            compile: torch.compile of diffusion_edm_forward
+            cuda_graph: replay of a CUDA graph of diffusion_edm_forward, see
+                DiffusionStepGraphs (eager on other devices)
+        x and t are only used for their shapes.
+        """
+        backend = self.diffusion_step_backend
+        if backend == "cuda_graph" and x.device.type != "cuda":
+            backend = "eager"
+        
+        if backend == "compile":
+            if self._compiled_diffusion_step is None:
+                self._compiled_diffusion_step = torch.compile(self.diffusion_edm_forward)
+            edm_forward = self._compiled_diffusion_step
+        else:
+            edm_forward = self.diffusion_edm_forward
+        
+        if backend != "cuda_graph":
+            return lambda x_noisy, t: edm_forward(
+                x_noisy = x_noisy,
+                t = t,
+                input_features = input_features,
+                s_inputs = s_inputs,
+                s_trunk = s_trunk,
+                z_trunk = z_trunk,
+                conditioning_cache = conditioning_cache,
+            )
+        
+        step_inputs = {key: input_features[key] for key in DIFFUSION_STEP_FEATURES}
+        step_inputs.update({f"cache_{key}": value for key, value in conditioning_cache._asdict().items()})
+        step_inputs.update(s_trunk = s_trunk, x_noisy = x, t = t)
+        return self.diffusion_step_graphs.bind(self._diffusion_step, step_inputs)
+
     def noise_schedule(self,device):
 
         T = self.sample_config.no_sample_steps_T
@@ -77,7 +241,7 @@ class IntelliFold(nn.Module):
 
     @torch.no_grad()
     @autocast("cuda",enabled=True, dtype=torch.float32)
-    def sample_diffusion(self,input_features, s_inputs,s_trunk,z_trunk,diffusion_batch_size):
+    def sample_diffusion(self,input_features, s_inputs,s_trunk,z_trunk,diffusion_batch_size,generators=None):
         """
         Args:
             input_features (dict): Dictionary of features, as outlined in Algorithm 5.
@@ -89,10 +253,18 @@ class IntelliFold(nn.Module):
                 [*, N_token, N_token, C_z]: Output of the backbone trunk.
 
             diffusion_batch_size: The augmentation batch size for the diffusion module.
+            generators: 
+                Optional list of torch.Generator, one per seed. Each generator draws the
+                noise of its own block of diffusion_batch_size samples, so the samples of
+                several seeds can be denoised in one batch and still match the samples of
+                separate runs. Defaults to [self.generator].
             
         Returns:
-            Sampled output of the diffusion module.
+            Sampled output of the diffusion module, 
+                [len(generators) * diffusion_batch_size, N_atom, 3]
         """
+        if generators is None:
+            generators = [self.generator]
         noise_schedule_c = self.noise_schedule(device = input_features['ref_pos'].device)
         
         gamma_0 =  self.sample_config.gamma_0
@@ -101,19 +273,33 @@ class IntelliFold(nn.Module):
         step_scale_eta = self.sample_config.step_scale_eta
         
         T = len(noise_schedule_c) - 1
-        x = noise_schedule_c[0] * torch.empty_like(input_features['ref_pos'],device = input_features['ref_pos'].device).normal_(generator = self.generator)
-        
-        x = einops.repeat(x, 'b ... -> (b n) ...', n = diffusion_batch_size)
+        x = torch.cat([
+            einops.repeat(
+                noise_schedule_c[0] * torch.empty_like(input_features['ref_pos'],device = input_features['ref_pos'].device).normal_(generator = generator),
+                'b ... -> (b n) ...', n = diffusion_batch_size)
+            for generator in generators
+        ], dim = 0)
         pred_dense_atom_mask = input_features['pred_dense_atom_mask']
         if self.advanced_conversion:
             [aggregated_pred_dense_atom_mask], _ = aggregate_fn_advanced([pred_dense_atom_mask], pred_dense_atom_mask)
         else:
             [aggregated_pred_dense_atom_mask], _ = aggregate_fn([pred_dense_atom_mask], pred_dense_atom_mask)
         aggregated_pred_dense_atom_mask = einops.repeat(aggregated_pred_dense_atom_mask, 'b ... -> (b n) ...', n = diffusion_batch_size)
+        sample_slices = [slice(i * diffusion_batch_size, (i + 1) * diffusion_batch_size) for i in range(len(generators))]
+
+        # the pair / atom-pair conditioning does not depend on the noise level, compute it once for all steps
+        conditioning_cache = self.diffusion_module.prepare_conditioning(input_features, s_inputs, s_trunk, z_trunk)
+        step = self.diffusion_step(
+            input_features, s_inputs, s_trunk, z_trunk, conditioning_cache,
+            x = x, t = noise_schedule_c[:1].expand(x.shape[0], 1, 1),
+        )
 
         for tau in range(1, T + 1):
             
-            x = self.centre_random_augmentation(x, aggregated_pred_dense_atom_mask, generator = self.generator)
+            x = torch.cat([
+                self.centre_random_augmentation(x[sl], aggregated_pred_dense_atom_mask, generator = generator)
+                for sl, generator in zip(sample_slices, generators)
+            ], dim = 0)
             
             c_tau = noise_schedule_c[tau]
             c_tau_minus_1 = noise_schedule_c[tau - 1]
@@ -125,18 +311,14 @@ class IntelliFold(nn.Module):
             
             t = c_tau_minus_1 * (gamma + 1)
             
-            xi = noise_scale_lambda * ((t ** 2 - c_tau_minus_1 ** 2).sqrt()) * torch.empty_like(x,device = x.device).normal_(generator = self.generator)
+            xi = noise_scale_lambda * ((t ** 2 - c_tau_minus_1 ** 2).sqrt()) * torch.cat([
+                torch.empty_like(x[sl],device = x.device).normal_(generator = generator)
+                for sl, generator in zip(sample_slices, generators)
+            ], dim = 0)
             
             x_noisy = x + xi
             
-            x_denoised = self.diffusion_edm_forward(
-                x_noisy = x_noisy,
-                t = t,
-                input_features = input_features,
-                s_inputs = s_inputs,
-                s_trunk = s_trunk,
-                z_trunk = z_trunk
-            )
+            x_denoised = step(x_noisy, t)
             
             delta = (x_noisy - x_denoised) / t
             
@@ -146,18 +328,17 @@ class IntelliFold(nn.Module):
         
         return x
         
-    def forward(self, input_features, diffusion_batch_size=1):
+    def prepare_features(self, input_features):
         """
+        Aggregates the reference features in place and adds the derived atom features
+        the trunk and the diffusion module use.
+
         Args:
             input_features (dict): Dictionary of features, as outlined in Algorithm 5.
-                        
-            diffusion_batch_size: The augmentation batch size for the diffusion module.
-            
+
         Returns:
-            Output of the forward pass.
+            The function mapping aggregated atom outputs back to the dense layout.
         """
-        outputs = dict()
-        
         # aggregate the ref_features
         aggregated_ref_keys = [key for key in input_features.keys() if 'ref_' in key]
         if self.advanced_conversion:
@@ -176,11 +357,53 @@ class IntelliFold(nn.Module):
             aggregated_output, _ = aggregate_fn([input_features['pred_dense_atom_mask']], input_features['pred_dense_atom_mask'])
         input_features['aggregated_pred_dense_atom_mask'] = aggregated_output[0].float() # use in the model
         
+        return reverse_fn
+
+    def trunk_is_seed_independent(self, input_features):
+        """
+        The only random operation of the trunk is the MSA row sampling of the MSAEmbedder.
+        When no MSA is deeper than msa_depth every row is kept and the trunk output does
+        not depend on the seed (up to the summation order of the kept rows), so one trunk
+        pass can be shared by all the seeds of a target.
+        """
+        msa_depth = self.backbone_trunk.msa_embedder.msa_depth
+        return bool((input_features['num_alignments'] <= msa_depth).all())
+
+    def forward_trunk(self, input_features):
+        """
+        Prepares the features and runs the backbone trunk.
+
+        Args:
+            input_features (dict): Dictionary of features, as outlined in Algorithm 5.
+
+        Returns:
+            (reverse_fn, backbone_outputs), to be passed to forward_sampling.
+        """
+        reverse_fn = self.prepare_features(input_features)
+        
         # forward the backbone trunk
         backbone_outputs = self.backbone_trunk(input_features)
+        
+        return reverse_fn, backbone_outputs
+
+    def forward_sampling(self, input_features, backbone_outputs, reverse_fn, diffusion_batch_size=1, generators=None):
+        """
+        Runs the diffusion sampling and the confidence head on a trunk output.
+
+        Args:
+            input_features (dict): Features already passed through prepare_features.
+            backbone_outputs (dict): Output of the backbone trunk.
+            reverse_fn: The function returned by prepare_features.
+            diffusion_batch_size: The augmentation batch size for the diffusion module.
+            generators: Optional list of torch.Generator, one per seed (see sample_diffusion).
+
+        Returns:
+            Output of the forward pass, with the samples of the seeds stacked in order along the batch dimension.
+        """
+        outputs = dict()
         outputs['distogram_logits'] = backbone_outputs['distogram_logits']        
         
-        x_predicted = self.sample_diffusion(input_features,backbone_outputs['s_inputs'],backbone_outputs['s'],backbone_outputs['z'],diffusion_batch_size)
+        x_predicted = self.sample_diffusion(input_features,backbone_outputs['s_inputs'],backbone_outputs['s'],backbone_outputs['z'],diffusion_batch_size,generators=generators)
         x_predicted = reverse_fn([x_predicted])[0]
         outputs['x_predicted'] = x_predicted
                         
@@ -189,6 +412,20 @@ class IntelliFold(nn.Module):
     
         return outputs
 
+    def forward(self, input_features, diffusion_batch_size=1):
+        """
+        Args:
+            input_features (dict): Dictionary of features, as outlined in Algorithm 5.
+                        
+            diffusion_batch_size: The augmentation batch size for the diffusion module.
+            
+        Returns:
+            Output of the forward pass.
+        """
+        reverse_fn, backbone_outputs = self.forward_trunk(input_features)
+        
+        return self.forward_sampling(input_features, backbone_outputs, reverse_fn, diffusion_batch_size)
+
 
 class CentreRandomAugmentation(nn.Module):
     """
@@ -137,7 +137,6 @@ class OuterProductMean(nn.Module):
             outer = self._chunk(a, b, chunk_size)
         else:
             outer = self._opm(a, b)
-        outer = self._opm(a, b)
         # [*, N_res, N_res, 1]
         norm = torch.einsum("...abc,...adc->...bdc", mask, mask)
         norm = norm + self.eps
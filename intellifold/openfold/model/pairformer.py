@@ -781,7 +781,7 @@ class PairStack(nn.Module):
             _add_with_inplace=True,
         )
 
-        z = z + self.ps_dropout_row_layer(tmu_update)
+        z = add(z, self.ps_dropout_row_layer(tmu_update), inplace=inplace_safe)
 
 
         del tmu_update
@@ -793,7 +793,7 @@ class PairStack(nn.Module):
             _add_with_inplace=True,
         )
 
-        z = z + self.ps_dropout_row_layer(tmu_update)
+        z = add(z, self.ps_dropout_row_layer(tmu_update), inplace=inplace_safe)
 
 
         del tmu_update
@@ -990,6 +990,16 @@ class PairformerBlock(nn.Module):
         
         return s, z
 
+def _tuning_cache_name(stack: nn.Module) -> str:
+    """
+    Name of a stack in the chunk size cache. The block size is part of it, so
+    that stacks with different widths (e.g. trunk vs. confidence head) or model
+    versions never share an entry.
+    """
+    n_params = sum(p.numel() for p in stack.blocks[0].parameters())
+    return f"{type(stack).__name__}-{n_params}"
+
+
 class PairformerStack(nn.Module):
     """
     Main Pairformer trunk.
@@ -1097,6 +1107,28 @@ class PairformerStack(nn.Module):
                 [*, N_token, C_s] single embedding
         """ 
         
+        attn_chunk_size = chunk_size
+        if(chunk_size is not None and self.chunk_size_tuner is not None
+           and not torch.is_grad_enabled()):
+            tuned_chunk_size = self.chunk_size_tuner.tune_chunk_size(
+                representative_fn=partial(
+                    self.blocks[0],
+                    single_mask=single_mask,
+                    pair_mask=pair_mask,
+                    use_deepspeed_evo_attention=use_deepspeed_evo_attention,
+                    inplace_safe=inplace_safe,
+                    _mask_trans=_mask_trans,
+                ),
+                args=(s, z),
+                min_chunk_size=chunk_size,
+                cache_name=_tuning_cache_name(self),
+                num_tokens=z.shape[-2],
+                clone_args=inplace_safe,
+            )
+            # Attention is the most memory-hungry op per chunk
+            chunk_size = tuned_chunk_size
+            attn_chunk_size = max(attn_chunk_size, tuned_chunk_size // 4)
+
         for block in self.blocks:
             s, z = block(s=s,
                         z=z,
@@ -1105,7 +1137,8 @@ class PairformerStack(nn.Module):
                         chunk_size=chunk_size,
                         use_deepspeed_evo_attention=use_deepspeed_evo_attention,
                         inplace_safe=inplace_safe,
-                        _mask_trans=_mask_trans)
+                        _mask_trans=_mask_trans,
+                        _attn_chunk_size=attn_chunk_size)
     
         return s, z
 
@@ -1540,6 +1573,29 @@ class MSAModuleStack(nn.Module):
         Returns:
             [*, N_token, N_token, C_z] pair update
         """
+        attn_chunk_size = chunk_size
+        if(chunk_size is not None and self.chunk_size_tuner is not None
+           and not torch.is_grad_enabled()):
+            tuned_chunk_size = self.chunk_size_tuner.tune_chunk_size(
+                representative_fn=partial(
+                    self.blocks[0],
+                    msa_mask=msa_mask,
+                    pair_mask=pair_mask,
+                    use_deepspeed_evo_attention=use_deepspeed_evo_attention,
+                    inplace_safe=inplace_safe,
+                    _mask_trans=_mask_trans,
+                ),
+                args=(m, z),
+                min_chunk_size=chunk_size,
+                # MSA activations grow with the depth, so it is part of the key
+                cache_name=f"{_tuning_cache_name(self)}-msa{m.shape[-3]}",
+                num_tokens=z.shape[-2],
+                clone_args=inplace_safe,
+            )
+            # Attention is the most memory-hungry op per chunk
+            chunk_size = tuned_chunk_size
+            attn_chunk_size = max(attn_chunk_size, tuned_chunk_size // 4)
+
         for block in self.blocks:
             m, z = block(
                 m=m,
@@ -1550,6 +1606,7 @@ class MSAModuleStack(nn.Module):
                 use_deepspeed_evo_attention=use_deepspeed_evo_attention,
                 inplace_safe=inplace_safe,
                 _mask_trans=_mask_trans,
+                _attn_chunk_size=attn_chunk_size,
             )
 
         return m, z
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import importlib
+import logging
 import math
 from typing import Optional, Callable, List, Tuple
 import numpy as np
@@ -131,6 +132,94 @@ def _attention(query: torch.Tensor, key: torch.Tensor, value: torch.Tensor, bias
     return a
 
 
+# "eager" materialises the logits (_attention), "sdpa" dispatches to
+# torch.nn.functional.scaled_dot_product_attention, which picks a fused or
+# memory-efficient kernel for the device (including CPU)
+ATTENTION_BACKENDS = ("eager", "sdpa")
+sdpa_is_available = hasattr(torch.nn.functional, "scaled_dot_product_attention")
+_sdpa_fallback_warned = False
+
+
+# Largest number of elements of the summed SDPA mask materialised at once,
+# unless one of the biases is already larger
+SDPA_MASK_CHUNK_NUMEL = 2**24
+
+
+def _sdpa_attention(query: torch.Tensor, key: torch.Tensor, value: torch.Tensor, biases: List[torch.Tensor]) -> torch.Tensor:
+    """
+    Same contract as _attention: query is already scaled, biases broadcast to
+    [*, H, Q, K]. Returns [*, H, Q, C_hidden].
+
+    SDPA takes a single additive mask, so the biases have to be summed. When
+    they broadcast against each other (e.g. the [*, I, 1, 1, K] mask and the
+    [*, 1, H, Q, K] pair bias of triangle attention) the sum is as large as
+    the logits, so it is then built and consumed in chunks of the largest
+    leading dimension.
+    """
+    if len(biases) == 0:
+        return torch.nn.functional.scaled_dot_product_attention(
+            query, key, value, scale=1.0,
+        )
+
+    no_dims = len(query.shape)
+    biases = [
+        b.reshape((1,) * (no_dims - len(b.shape)) + b.shape) for b in biases
+    ]
+    mask_shape = torch.broadcast_shapes(*[b.shape for b in biases])
+    mask_numel = math.prod(mask_shape)
+    budget = max(SDPA_MASK_CHUNK_NUMEL, *[b.numel() for b in biases])
+
+    def attend(q, k, v, bs):
+        mask = bs[0]
+        for b in bs[1:]:
+            mask = mask + b
+        # SDPA wants the additive mask in the dtype of the query
+        mask = mask.to(dtype=query.dtype)
+        return torch.nn.functional.scaled_dot_product_attention(
+            q, k, v, attn_mask=mask, scale=1.0,
+        )
+
+    batch_dims = [d for d in range(no_dims - 3) if mask_shape[d] > 1]
+    if mask_numel <= budget or len(batch_dims) == 0:
+        return attend(query, key, value, biases)
+
+    dim = max(batch_dims, key=lambda d: mask_shape[d])
+    chunk = max(1, budget // (mask_numel // mask_shape[dim]))
+
+    def take(t, start):
+        if t.shape[dim] == 1:
+            return t
+        return t.narrow(dim, start, min(chunk, t.shape[dim] - start))
+
+    return torch.cat([
+        attend(
+            take(query, i), take(key, i), take(value, i),
+            [take(b, i) for b in biases],
+        )
+        for i in range(0, mask_shape[dim], chunk)
+    ], dim=dim)
+
+
+def set_attention_backend(model: nn.Module, backend: str):
+    """
+    Selects the attention implementation of every Attention module in model.
+    Falls back to "eager" if the running PyTorch has no SDPA.
+    """
+    if backend not in ATTENTION_BACKENDS:
+        raise ValueError(
+            f"Unknown attention backend {backend}, choose one of {ATTENTION_BACKENDS}"
+        )
+    if backend == "sdpa" and not sdpa_is_available:
+        logging.warning(
+            "torch.nn.functional.scaled_dot_product_attention is not available "
+            "in this PyTorch version, using the eager attention instead"
+        )
+        backend = "eager"
+    for module in model.modules():
+        if isinstance(module, Attention):
+            module.attention_backend = backend
+
+
 class Attention(nn.Module):
     """
     Standard multi-head attention using AlphaFold's default layer
@@ -190,6 +279,9 @@ class Attention(nn.Module):
 
         self.sigmoid = nn.Sigmoid()
 
+        # See set_attention_backend
+        self.attention_backend = "eager"
+
     def _prep_qkv(self,
         q_x: torch.Tensor, 
         kv_x: torch.Tensor,
@@ -284,6 +376,9 @@ class Attention(nn.Module):
                     "provide up to two bias terms"
                 )
             o = _deepspeed_evo_attn(q, k, v, biases)
+        elif self.attention_backend == "sdpa":
+            o = self._sdpa_or_eager(q, k, v, biases)
+            o = o.transpose(-2, -3)
         else:
             o = _attention(q, k, v, biases)
             o = o.transpose(-2, -3)
@@ -292,6 +387,27 @@ class Attention(nn.Module):
 
         return o
 
+    def _sdpa_or_eager(self,
+        q: torch.Tensor,
+        k: torch.Tensor,
+        v: torch.Tensor,
+        biases: List[torch.Tensor],
+    ) -> torch.Tensor:
+        global _sdpa_fallback_warned
+        try:
+            return _sdpa_attention(q, k, v, biases)
+        except torch.cuda.OutOfMemoryError:
+            # The eager path needs more memory, let the caller (e.g. the chunk
+            # size tuner) see the OOM
+            raise
+        except (RuntimeError, TypeError) as e:
+            # No kernel for this dtype/shape/device combination (or a PyTorch
+            # without the scale argument)
+            if not _sdpa_fallback_warned:
+                logging.warning(f"SDPA attention failed ({e}), using the eager attention instead")
+                _sdpa_fallback_warned = True
+            return _attention(q, k, v, biases)
+
 
 
 @torch.jit.ignore
@@ -157,11 +157,16 @@ class FusedTriangleMultiplicativeUpdate(BaseTriangleMultiplicativeUpdate):
             a = a / a.std()
             b = b / b.std()
 
+        # a is a view of ab, which is not needed anymore, so the product can be
+        # written over it channel by channel instead of into a new buffer
+        if(not inplace_safe):
+            _inplace_chunk_size = None
+
         if(is_fp16_enabled()):
             with torch.cuda.amp.autocast(enabled=False):
-                x = self._combine_projections(a.float(), b.float())
+                x = self._combine_projections(a.float(), b.float(), _inplace_chunk_size)
         else:
-            x = self._combine_projections(a, b)
+            x = self._combine_projections(a, b, _inplace_chunk_size)
         
         del a, b
         x = self.layer_norm_out(x)
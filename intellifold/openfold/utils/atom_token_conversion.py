@@ -17,6 +17,10 @@ import einops
 from typing import Tuple
 import torch.nn.functional as F
 
+# Width of the dense atom layout: atoms of a token are stored in a window of
+# this size (see pred_dense_atom_mask)
+MAX_ATOMS_PER_TOKEN = 24
+
 
 def aggregate_fn(original_seqs, attention_mask):
     """
@@ -218,7 +222,13 @@ def repeat_consecutive_with_lens(
 def repeat_consecutive_with_lens_advanced(
     feats,
     lens,
+    total_len=None,
 ):
+    """
+    Repeats every token feature lens times. If total_len (the atom length of the output,
+    i.e. the largest lens.sum(-1)) is given, no output shape depends on the values of lens, 
+    so the function runs without a host synchronisation (e.g. inside a CUDA graph).
+    """
     
     device, dtype = feats.device, feats.dtype
 
@@ -226,7 +236,15 @@ def repeat_consecutive_with_lens_advanced(
 
     # get mask from lens
 
-    mask = lens_to_mask(lens, max_len=None)
+    if total_len is None:
+        mask = lens_to_mask(lens, max_len=None)
+    else:
+        # A fixed window keeps the shapes static; lens.max() would sync, so it
+        # is only checked outside CUDA graph capture
+        if not (lens.is_cuda and torch.cuda.is_current_stream_capturing()):
+            assert lens.max() <= MAX_ATOMS_PER_TOKEN, \
+                f"more than {MAX_ATOMS_PER_TOKEN} atoms in a token"
+        mask = lens_to_mask(lens, max_len=MAX_ATOMS_PER_TOKEN)
     
     # derive arange
 
@@ -238,9 +256,9 @@ def repeat_consecutive_with_lens_advanced(
     indices = einops.rearrange(arange, 'n -> 1 1 n') + offsets.unsqueeze(-1)
     
     total_lens = lens.sum(dim = -1)
-    output_mask = lens_to_mask(total_lens, max_len=None)
+    output_mask = lens_to_mask(total_lens, max_len=total_len)
 
-    max_len = total_lens.amax()
+    max_len = total_lens.amax() if total_len is None else total_len
 
     output_indices = torch.zeros((batch, int(max_len + 1)), device = device, dtype = torch.long)
 
@@ -303,7 +321,8 @@ def mean_pool_with_lens_advanced(feats, feats_mask, lens, eps = 1e-6):
 
     seq_len = feats.shape[1]
     
-    assert (lens.sum(dim = -1) <= seq_len).all(), 'one of the lengths given exceeds the total sequence length of the features passed in'
+    if not (feats.is_cuda and torch.cuda.is_current_stream_capturing()):
+        assert (lens.sum(dim = -1) <= seq_len).all(), 'one of the lengths given exceeds the total sequence length of the features passed in'
 
     cumsum_feats = feats.cumsum(dim = 1)
     cumsum_feats = F.pad(cumsum_feats, (0, 0, 1, 0), value = 0.)
@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from functools import partial
+import json
 import logging
 import math
+import os
+import tempfile
 from typing import Tuple, List, Callable, Any, Dict, Sequence, Optional
 
 import torch
@@ -339,6 +342,52 @@ def chunk_layer(
     return out
 
 
+# Tuned chunk sizes are persisted here, under $INTELLIFOLD_CACHE
+CHUNK_SIZE_CACHE_FILE = "chunk_size_cache.json"
+# Targets are grouped into buckets of this many tokens for the on-disk cache
+CHUNK_SIZE_TOKEN_BUCKET = 256
+
+
+def _chunk_size_cache_path() -> Optional[str]:
+    cache_dir = os.environ.get("INTELLIFOLD_CACHE")
+    if not cache_dir:
+        return None
+    return os.path.join(os.path.expanduser(cache_dir), CHUNK_SIZE_CACHE_FILE)
+
+
+def _load_chunk_size_cache(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_chunk_size(path: str, key: str, entry: Dict[str, int]):
+    """
+    Adds one entry to the on-disk cache. The file is re-read and replaced
+    atomically, so concurrent processes only ever lose each other's latest
+    entry, never corrupt the file.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cache = _load_chunk_size_cache(path)
+        cache[key] = entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning(f"Could not save the tuned chunk size to {path}: {e}")
+
+
+def _device_memory_tag(device: torch.device) -> str:
+    if device.type == "cuda":
+        total = torch.cuda.get_device_properties(device).total_memory
+        return f"cuda{total // 2**30}GiB"
+    return device.type
+
+
 class ChunkSizeTuner:
     def __init__(self, 
         # Heuristically, runtimes for most of the modules in the network 
@@ -349,7 +398,7 @@ class ChunkSizeTuner:
         self.cached_chunk_size = None
         self.cached_arg_data = None
 
-    def _determine_favorable_chunk_size(self, fn, args, min_chunk_size):
+    def _determine_favorable_chunk_size(self, fn, args, min_chunk_size, clone_args):
         logging.info("Tuning chunk size...")
         
         if(min_chunk_size >= self.max_chunk_size):
@@ -361,12 +410,26 @@ class ChunkSizeTuner:
         candidates[-1] += 4
     
         def test_chunk_size(chunk_size):
+            probe_args = args
             try:
+                # In-place probes would update the real inputs, so they run on
+                # copies. Copying inside the try lets an OOM on the copy itself
+                # count as a failed probe.
+                if(clone_args):
+                    probe_args = tree_map(
+                        lambda a: a.clone() if type(a) is torch.Tensor else a,
+                        args,
+                        object,
+                    )
                 with torch.no_grad():
-                    fn(*args, chunk_size=chunk_size)
+                    fn(*probe_args, chunk_size=chunk_size)
                 return True
             except RuntimeError:
                 return False
+            finally:
+                del probe_args
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
     
         min_viable_chunk_size_index = 0
         i = len(candidates) - 1
@@ -380,6 +443,48 @@ class ChunkSizeTuner:
    
         return candidates[min_viable_chunk_size_index]
 
+    def _persistent_chunk_size(
+        self, fn, args, min_chunk_size, clone_args, cache_name, num_tokens
+    ):
+        """
+        Looks the chunk size up in the on-disk cache, keyed by (module, token
+        bucket, dtype, device memory), and only runs the search on a miss.
+
+        The pair modules' activations grow with N_token^2 per chunk, so a size
+        tuned on a smaller target of the same bucket is scaled down for a
+        larger one.
+        """
+        path = _chunk_size_cache_path()
+        tensor = next(
+            (a for a in args if type(a) is torch.Tensor), None
+        )
+        if(path is None or tensor is None):
+            return self._determine_favorable_chunk_size(
+                fn, args, min_chunk_size, clone_args
+            )
+
+        bucket = -(-num_tokens // CHUNK_SIZE_TOKEN_BUCKET) * CHUNK_SIZE_TOKEN_BUCKET
+        key = "|".join([
+            cache_name,
+            str(bucket),
+            str(tensor.dtype).replace("torch.", ""),
+            _device_memory_tag(tensor.device),
+        ])
+        entry = _load_chunk_size_cache(path).get(key)
+        if(entry is not None):
+            chunk_size = entry["chunk_size"]
+            if(num_tokens > entry["num_tokens"]):
+                chunk_size = int(chunk_size * (entry["num_tokens"] / num_tokens) ** 2)
+            return max(min_chunk_size, chunk_size)
+
+        chunk_size = self._determine_favorable_chunk_size(
+            fn, args, min_chunk_size, clone_args
+        )
+        _store_chunk_size(
+            path, key, {"chunk_size": chunk_size, "num_tokens": num_tokens}
+        )
+        return chunk_size
+
     def _compare_arg_caches(self, ac1, ac2):
         consistent = True
         for a1, a2 in zip(ac1, ac2):
@@ -403,7 +508,30 @@ class ChunkSizeTuner:
         representative_fn: Callable,
         args: Tuple[Any],
         min_chunk_size: int,
+        cache_name: Optional[str] = None,
+        num_tokens: Optional[int] = None,
+        clone_args: bool = False,
     ) -> int: 
+        """
+        Args:
+            representative_fn:
+                Called as representative_fn(*args, chunk_size=...) to probe
+                whether a chunk size fits in memory
+            args:
+                Arguments to representative_fn
+            min_chunk_size:
+                Smallest chunk size to consider
+            cache_name:
+                If given along with num_tokens, the result is also persisted
+                in $INTELLIFOLD_CACHE under this module name
+            num_tokens:
+                Number of tokens of the current target
+            clone_args:
+                Whether representative_fn updates its tensor arguments in
+                place, in which case every probe runs on copies of them
+        Returns:
+            The largest viable chunk size
+        """
         consistent = True
         remove_tensors = lambda a: a.shape if type(a) is torch.Tensor else a
         arg_data = tree_map(remove_tensors, args, object) 
@@ -418,11 +546,22 @@ class ChunkSizeTuner:
             consistent = False
 
         if(not consistent):
-            self.cached_chunk_size = self._determine_favorable_chunk_size(
-                representative_fn,
-                args,
-                min_chunk_size,
-            )
+            if(cache_name is not None and num_tokens is not None):
+                self.cached_chunk_size = self._persistent_chunk_size(
+                    representative_fn,
+                    args,
+                    min_chunk_size,
+                    clone_args,
+                    cache_name,
+                    num_tokens,
+                )
+            else:
+                self.cached_chunk_size = self._determine_favorable_chunk_size(
+                    representative_fn,
+                    args,
+                    min_chunk_size,
+                    clone_args,
+                )
             self.cached_arg_data = arg_data
 
         return self.cached_chunk_size
@@ -35,6 +35,9 @@ def get_model_config(args):
     )
     config.sample.no_sample_steps_T = args.sampling_steps
     config.backbone.recycling_iters = args.recycling_iters
+    config.globals.inplace_inference = getattr(args, "low_memory", False)
+    config.globals.attention_backend = getattr(args, "attention_backend", "eager")
+    config.globals.diffusion_step_backend = getattr(args, "diffusion_step_backend", "eager")
     
     # Update hyper-parameters for v2 flash model
     config.backbone.pairformer_stack.no_blocks = 12
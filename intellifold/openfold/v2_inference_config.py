@@ -49,6 +49,9 @@ def get_model_config(args):
     )
     config.sample.no_sample_steps_T = args.sampling_steps
     config.backbone.recycling_iters = args.recycling_iters
+    config.globals.inplace_inference = getattr(args, "low_memory", False)
+    config.globals.attention_backend = getattr(args, "attention_backend", "eager")
+    config.globals.diffusion_step_backend = getattr(args, "diffusion_step_backend", "eager")
 
     # Enable v2 inference features
     config.globals.advanced_conversion = True
@@ -112,6 +115,12 @@ config = mlc.ConfigDict(
             "eps": eps,
             "inf": inf,
             "advanced_conversion": False,
+            # Reuse activation buffers in place at inference (lower peak memory)
+            "inplace_inference": False,
+            # Attention implementation, "eager" or "sdpa" (see primitives.py)
+            "attention_backend": "eager",
+            # Diffusion step implementation, "eager", "compile" or "cuda_graph" (see model.py)
+            "diffusion_step_backend": "eager",
         },
         
         "backbone": {
@@ -21,7 +21,11 @@ directory (under the output dir) by an atomic `mkdir`, so
 
   * no two GPU workers ever take the same target (the mkdir is the lock),
   * load balances itself — a worker that finishes a target grabs the next one,
-    so big targets don't stall the others, and
+    and targets are handed out largest-first (longest-processing-time order,
+    from a cost estimate read off each fold-input JSON), so one huge complex
+    claimed last cannot leave every other GPU idle,
+  * each worker is pinned to a few padded buckets, so it compiles only those
+    shapes (it steals other buckets once its own are drained), and
   * a re-run skips finished targets (`.done`) and already-tried ones (`.failed`),
     i.e. it resumes after a crash.
 
@@ -34,14 +38,24 @@ CLI can import it cheaply; the heavy `load_fn` is injected by the worker.
 
 from __future__ import annotations
 
+import bisect
 import glob
+import heapq
+import json
 import os
 import pathlib
+import re
 import signal
 import socket
 import subprocess
 import sys
-from typing import Callable, Iterator, Sequence
+from typing import Any, Callable, Iterator, Sequence
+
+
+# Mirrors the `--buckets` default of `run_jax_inference` (kept in sync by hand so
+# this module stays free of the heavy imports).
+DEFAULT_BUCKETS = (256, 512, 768, 1024, 1280, 1536, 2048, 2560, 3072,
+                   3584, 4096, 4608, 5120)
 
 
 # --------------------------------------------------------------------------- #
@@ -58,6 +72,106 @@ def _stem(json_path: str) -> str:
   return pathlib.Path(json_path).stem
 
 
+# --------------------------------------------------------------------------- #
+#  Cost model (for longest-processing-time-first scheduling)
+# --------------------------------------------------------------------------- #
+# Ligands given by CCD code are tokenised per atom; without loading the CCD we
+# assume a typical drug-sized ligand. Ions are a single token.
+_CCD_LIGAND_TOKENS = 30
+# Rows of the MSA that reach the model; deeper MSAs only cost CPU time.
+_MSA_ROWS_CAP = 16384
+_SMILES_ATOM = re.compile(r'Cl|Br|\[[^\]]*\]|[BCNOPSFI]|[cnops]')
+
+
+def _count_ids(entity: dict[str, Any]) -> int:
+  ids = entity.get('id', 'A')
+  return len(ids) if isinstance(ids, list) else int(entity.get('count', 1))
+
+
+def _msa_depth(msa: str | None, msa_path: str | None, json_dir: str) -> int:
+  """Number of sequences in an inline A3M or an `unpairedMsaPath` file."""
+  if msa:
+    return msa.count('\n>') + msa.startswith('>')
+  if not msa_path:
+    return 0
+  path = os.path.join(json_dir, msa_path)
+  depth, prev = 0, b'\n'
+  try:
+    with open(path, 'rb') as fh:
+      for chunk in iter(lambda: fh.read(1 << 20), b''):
+        depth += chunk.count(b'\n>') + (prev == b'\n' and chunk[:1] == b'>')
+        prev = chunk[-1:]
+  except OSError:
+    return 0
+  return depth
+
+
+def _job_size(job: dict[str, Any], json_dir: str) -> tuple[int, int, int]:
+  """(tokens, deepest MSA, seeds) of one fold job, in either JSON dialect."""
+  tokens, depth = 0, 0
+  for entry in job.get('sequences', []):
+    for kind, entity in entry.items():
+      n = _count_ids(entity)
+      if kind in ('protein', 'rna', 'dna'):
+        tokens += n * len(entity.get('sequence', ''))
+        depth = max(depth, _msa_depth(entity.get('unpairedMsa'),
+                                      entity.get('unpairedMsaPath'), json_dir))
+      elif kind in ('proteinChain', 'rnaSequence', 'dnaSequence'):
+        tokens += n * len(entity.get('sequence', ''))
+      elif kind == 'ion':
+        tokens += n
+      elif kind == 'ligand':
+        if entity.get('smiles'):
+          tokens += n * len(_SMILES_ATOM.findall(entity['smiles']))
+        else:
+          codes = entity.get('ccdCodes') or [entity.get('ligand')]
+          tokens += n * _CCD_LIGAND_TOKENS * len(codes)
+  return tokens, depth, max(1, len(job.get('modelSeeds') or [None]))
+
+
+def padded_tokens(num_tokens: int, buckets: Sequence[int]) -> int:
+  """The bucket `featurisation.featurise_input` pads `num_tokens` up to."""
+  i = bisect.bisect_left(buckets, num_tokens)
+  return buckets[i] if i < len(buckets) else num_tokens
+
+
+def estimate_cost(
+    json_path: str, buckets: Sequence[int] = DEFAULT_BUCKETS
+) -> dict[str, Any]:
+  """Estimates the GPU cost of one fold-input JSON without loading AF3.
+
+  Returns a dict with `tokens`, `msa_depth`, `bucket` (padded token count of the
+  largest job in the file) and `cost` (relative units; only the ordering
+  matters). The trunk is cubic in the padded token count and re-runs for every
+  seed; the MSA module adds a term linear in the number of MSA rows.
+  """
+  try:
+    with open(json_path) as fh:
+      raw = json.load(fh)
+  except (OSError, ValueError):
+    # Unreadable inputs fail fast at load time; schedule them last.
+    return {'tokens': 0, 'msa_depth': 0, 'bucket': 0, 'cost': 0.0}
+  jobs = raw if isinstance(raw, list) else [raw]
+  json_dir = os.path.dirname(json_path)
+  tokens = depth = bucket = 0
+  cost = 0.0
+  for job in jobs:
+    n, d, seeds = _job_size(job, json_dir)
+    pad = padded_tokens(n, buckets)
+    cost += seeds * pad * pad * (pad + min(d, _MSA_ROWS_CAP) / 8)
+    tokens, depth, bucket = max(tokens, n), max(depth, d), max(bucket, pad)
+  return {'tokens': tokens, 'msa_depth': depth, 'bucket': bucket,
+          'cost': cost / 1e9}
+
+
+def estimated_makespan(costs: Sequence[float], num_workers: int) -> float:
+  """Makespan of greedy list scheduling of `costs` (in order) on N workers."""
+  loads = [0.0] * max(1, num_workers)
+  for c in costs:
+    heapq.heapreplace(loads, loads[0] + c)
+  return max(loads)
+
+
 # --------------------------------------------------------------------------- #
 #  The shared work queue
 # --------------------------------------------------------------------------- #
@@ -70,12 +184,25 @@ class WorkQueue:
     <stem>.claim  -- a directory (atomic mkdir) held while a worker runs it
     <stem>.done   -- written after the target finished successfully
     <stem>.failed -- written if the target raised (so we don't retry forever)
+    schedule.json -- the claim order, written once by `schedule()`
+
+  Targets are claimed in longest-processing-time-first order: by padded bucket,
+  then by estimated cost, both descending. Sorting by bucket first also keeps a
+  bucket's targets contiguous, so a worker tends to claim several targets of the
+  shape it has just compiled before moving on to the next (smaller) bucket.
   """
 
-  def __init__(self, input_dir: str, queue_dir: str, retry_failed: bool = False):
+  def __init__(
+      self,
+      input_dir: str,
+      queue_dir: str,
+      retry_failed: bool = False,
+      buckets: Sequence[int] | None = None,
+  ):
     self.input_dir = input_dir
     self.queue_dir = queue_dir
     self.retry_failed = retry_failed
+    self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS))
     os.makedirs(queue_dir, exist_ok=True)
 
   def _p(self, stem: str, ext: str) -> str:
@@ -108,19 +235,58 @@ class WorkQueue:
       fh.write(f'{type(err).__name__}: {err}\n')
     self._release(stem)
 
+  def schedule(self) -> list[dict[str, Any]]:
+    """The claim order: one entry (`stem`, `path`, cost fields) per target.
+
+    Computed once per queue and saved to `schedule.json` (atomically, so racing
+    workers agree on it); recomputed if the inputs or buckets change.
+    """
+    targets = list_targets(self.input_dir)
+    path = os.path.join(self.queue_dir, 'schedule.json')
+    try:
+      with open(path) as fh:
+        saved = json.load(fh)
+      if (saved['buckets'] == list(self.buckets)
+          and sorted(e['path'] for e in saved['targets']) == targets):
+        return saved['targets']
+    except (OSError, ValueError, KeyError, TypeError):
+      pass
+    entries = [
+        {'stem': _stem(jp), 'path': jp, **estimate_cost(jp, self.buckets)}
+        for jp in targets
+    ]
+    entries.sort(key=lambda e: (-e['bucket'], -e['cost'], e['stem']))
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as fh:
+      json.dump({'buckets': list(self.buckets), 'targets': entries}, fh)
+    os.replace(tmp, path)
+    return entries
+
   def claim_iter(
-      self, load_fn: Callable[[pathlib.Path], Iterator]
+      self,
+      load_fn: Callable[[pathlib.Path], Iterator],
+      preferred_buckets: Sequence[int] | None = None,
   ) -> Iterator[tuple[str, object]]:
     """Yield `(stem, fold_input)` for every target this worker claims.
 
     `load_fn` is `folding_input.load_fold_inputs_from_path`. The consumer must
     call `mark_done(stem)` on success or `mark_failed(stem, err)` on error before
     requesting the next item, so the claim is released exactly once.
+
+    Targets in `preferred_buckets` (this worker's partition, see
+    `partition_buckets`) and in buckets this worker has already run are claimed
+    first, so it compiles as few shapes as possible; once none are left it
+    steals the largest remaining target of any bucket.
     """
-    for jp in list_targets(self.input_dir):
-      stem = _stem(jp)
+    warm = set(preferred_buckets or ())
+    pending = self.schedule()
+    while pending:
+      i = next((i for i, e in enumerate(pending) if e['bucket'] in warm), 0)
+      entry = pending.pop(i)
+      jp, stem = entry['path'], entry['stem']
       if not self._try_claim(stem):
         continue
+      warm.add(entry['bucket'])
       print(f'[queue] claimed {stem}', flush=True)
       try:
         loaded = list(load_fn(pathlib.Path(jp)))
@@ -161,6 +327,30 @@ class WorkQueue:
 # --------------------------------------------------------------------------- #
 #  Local (single-node) multi-GPU orchestration
 # --------------------------------------------------------------------------- #
+def partition_buckets(
+    schedule: Sequence[dict[str, Any]], num_workers: int
+) -> list[list[int]]:
+  """Pins padded buckets to workers so each compiles as few shapes as possible.
+
+  Buckets are dealt out largest-total-cost first, each to the least loaded
+  worker. A bucket holding more than one worker's fair share of the work is
+  pinned to several workers, so it cannot serialise the run. Returns, per
+  worker, the buckets it should claim first.
+  """
+  totals: dict[int, float] = {}
+  for e in schedule:
+    totals[e['bucket']] = totals.get(e['bucket'], 0.0) + e['cost']
+  share = sum(totals.values()) / max(1, num_workers) or 1.0
+  loads = [0.0] * num_workers
+  parts: list[list[int]] = [[] for _ in range(num_workers)]
+  for bucket, cost in sorted(totals.items(), key=lambda kv: (-kv[1], -kv[0])):
+    k = max(1, min(num_workers, round(cost / share)))
+    for w in sorted(range(num_workers), key=lambda w: loads[w])[:k]:
+      parts[w].append(bucket)
+      loads[w] += cost / k
+  return [sorted(p, reverse=True) for p in parts]
+
+
 def resolve_gpus(spec: str | None) -> list[int]:
   """'all' / '0,1,2' / None -> a list of GPU indices on this node."""
   if spec is None:
@@ -185,11 +375,15 @@ def spawn_workers(
     queue_dir: str,
     log: Callable[[str], None] = print,
     log_dir: str | None = None,
+    per_worker_argv: Sequence[Sequence[str]] | None = None,
 ) -> int:
   """Launch one worker process per GPU; each pins to its GPU via
   CUDA_VISIBLE_DEVICES and pulls from the shared queue. Returns the worst
   child return code. Ctrl-C terminates the whole pool.
 
+  `per_worker_argv[i]`, if given, is appended to the command line of the i-th
+  worker (e.g. its bucket partition).
+
   If `log_dir` is set, each worker's stdout/stderr is redirected to its own file
   `<log_dir>/<hostname>_gpu<g>.log` (one sequential log per GPU — keeps each
   target's AF3 output, incl. token count and per-seed timing, un-interleaved).
@@ -199,13 +393,16 @@ def spawn_workers(
   if log_dir:
     os.makedirs(log_dir, exist_ok=True)
   procs: list[tuple[int, subprocess.Popen]] = []
-  for g in gpus:
+  for i, g in enumerate(gpus):
     env = dict(os.environ, CUDA_VISIBLE_DEVICES=str(g))
     out = None
     if log_dir:
       out = open(os.path.join(log_dir, f'{host}_gpu{g}.log'), 'a')
       logfiles.append(out)
-    p = subprocess.Popen(list(worker_argv), env=env,
+    argv = list(worker_argv)
+    if per_worker_argv is not None:
+      argv += list(per_worker_argv[i])
+    p = subprocess.Popen(argv, env=env,
                          stdout=out, stderr=subprocess.STDOUT if out else None)
     procs.append((g, p))
     log(f'[orchestrator] GPU {g} -> worker pid {p.pid}'
@@ -27,8 +27,23 @@
 #     so the stock AF3 JAX network loads IntelliFold-v2 weights;
 #   * add a `--work_queue_dir` flag: an optional local work queue so one worker
 #     per GPU can divide an --input_dir across this machine's GPUs with no overlap
-#     and resume (see `intellifold.parallel`). Off unless the flag is set;
-#   * change the default --flash_attention_implementation from 'triton' to 'cudnn'.
+#     and resume (see `intellifold.parallel`), plus `--work_queue_buckets` to pin
+#     padded buckets to a worker. Off unless the flag is set;
+#   * change the default --flash_attention_implementation from 'triton' to 'cudnn';
+#   * add a `--seed_batch_size` flag: run several seeds per vmapped forward pass
+#     (memory-capped) and extract a seed's results while the next one runs;
+#   * add `warmup_main` (`intellifold warmup`): precompile every bucket into the
+#     persistent compilation cache from synthetic inputs;
+#   * add `serve_main` (`intellifold serve`): a persistent local server that
+#     keeps the model resident between requests (see `intellifold.server`);
+#   * add a `--featurise_workers` flag: overlap featurisation, inference and
+#     output writing across targets (see `intellifold.streaming`);
+#   * add a `--trunk_cache_dir` flag: reuse the trunk output of a target/seed
+#     across runs and run only the heads (see `intellifold.trunk_cache`);
+#   * add `--msa_cache_dir` / `--msa_cache_max_gb` flags: share the data
+#     pipeline's MSAs across targets and runs (see `intellifold.msa_cache`);
+#   * add a `--conformer_cache_dir` flag: share the RDKit reference conformers
+#     across targets, seeds and runs (see `intellifold.conformer_cache`).
 # The patches are no-ops unless INTFOLD_FOURIER / INTFOLD_FULLFAT are set, so the
 # unpatched AlphaFold 3 behaviour is preserved. Upstream: google-deepmind/alphafold3.
 # ----------------------------------------------------------------------------
@@ -73,6 +88,7 @@ from alphafold3.model import params
 from alphafold3.model import post_processing
 from alphafold3.model.components import utils
 from intellifold import patches as intellifold_patches
+from intellifold import trunk_cache as trunk_cache_lib
 import haiku as hk
 import jax
 from jax import numpy as jnp
@@ -340,6 +356,42 @@ _WORK_QUEUE_RETRY_FAILED = flags.DEFINE_bool(
     'When using --work_queue_dir, also re-attempt targets previously marked'
     ' .failed (default: skip them).',
 )
+_WORK_QUEUE_BUCKETS = flags.DEFINE_list(
+    'work_queue_buckets',
+    None,
+    'When using --work_queue_dir, the padded token buckets this worker claims'
+    ' first (it steals other buckets once these are drained), so it compiles'
+    ' as few shapes as possible. Set automatically by `intellifold predict'
+    ' --gpus`.',
+)
+_WARMUP_BUCKETS = flags.DEFINE_list(
+    'warmup_buckets',
+    None,
+    'IntelliFold `warmup` subcommand: the bucket sizes this process compiles'
+    ' (default: every --buckets size). Set per GPU by `intellifold warmup'
+    ' --gpus`.',
+)
+_SERVE_HOST = flags.DEFINE_string(
+    'serve_host',
+    '127.0.0.1',
+    'IntelliFold `serve` subcommand: address to listen on for HTTP requests.',
+)
+_SERVE_PORT = flags.DEFINE_integer(
+    'serve_port', 8765, 'IntelliFold `serve` subcommand: HTTP port.'
+)
+_SERVE_SOCKET = flags.DEFINE_string(
+    'serve_socket',
+    None,
+    'IntelliFold `serve` subcommand: listen on this Unix socket instead of'
+    ' HTTP over TCP.',
+)
+_SERVE_MAX_PENDING = flags.DEFINE_integer(
+    'serve_max_pending',
+    32,
+    'IntelliFold `serve` subcommand: maximum number of requests being'
+    ' featurised, queued or run at once; further requests get HTTP 503.',
+    lower_bound=1,
+)
 _GPU_DEVICE = flags.DEFINE_integer(
     'gpu_device',
     0,
@@ -401,6 +453,65 @@ _STEERING_WEIGHT_SCALE = flags.DEFINE_float(
     1.0,
     'Global multiplier on every steering potential weight (1.0 = default).',
 )
+_SEED_BATCH_SIZE = flags.DEFINE_integer(
+    'seed_batch_size',
+    1,
+    'IntelliFold extension: maximum number of seeds to run in one jitted'
+    ' forward pass (the model is vmapped over the seeds\' features and rng'
+    ' keys). The effective batch is further capped by an estimate of the free'
+    ' device memory for the target\'s token bucket. 0 means as many seeds as'
+    ' fit in memory. Defaults to 1 (one seed per forward pass).',
+    lower_bound=0,
+)
+_FEATURISE_WORKERS = flags.DEFINE_integer(
+    'featurise_workers',
+    0,
+    'IntelliFold extension: number of worker processes that run the data'
+    ' pipeline and featurise upcoming targets while the current one is on the'
+    ' GPU; outputs are written on a background thread. Only used with'
+    ' --input_dir (incl. --work_queue_dir) and --run_inference. 0 (default)'
+    ' processes targets strictly one after another.',
+    lower_bound=0,
+)
+_TRUNK_CACHE_DIR = flags.DEFINE_string(
+    'trunk_cache_dir',
+    None,
+    'IntelliFold extension: directory of a trunk-output cache. The trunk'
+    ' output of every target and seed is stored there, keyed by a hash of the'
+    ' featurised input, the model weights, the number of recycles and the'
+    ' seed; a later run on the same input (e.g. with more diffusion samples,'
+    ' other sampling or steering settings) loads it and runs only the'
+    ' diffusion and confidence heads. Entries hold the full float32 pair'
+    ' representation (padded_tokens^2 * 128 * 4 bytes) and can be deleted at'
+    ' any time. Off unless set.',
+)
+_MSA_CACHE_DIR = flags.DEFINE_string(
+    'msa_cache_dir',
+    None,
+    'IntelliFold extension: directory of a content-addressed MSA cache shared'
+    ' across targets, runs and workers. The data pipeline stores the unpaired'
+    ' and paired MSA of every protein chain (and the MSA of every RNA chain)'
+    ' there, keyed by a hash of the sequence and the search settings, and'
+    ' only runs the MSA tools for chains it has not seen; template search'
+    ' still runs. Off unless set.',
+)
+_MSA_CACHE_MAX_GB = flags.DEFINE_float(
+    'msa_cache_max_gb',
+    None,
+    'IntelliFold extension: size budget of --msa_cache_dir in GB; the least'
+    ' recently used MSAs are deleted when it is exceeded. Unbounded if unset.',
+    lower_bound=0,
+)
+_CONFORMER_CACHE_DIR = flags.DEFINE_string(
+    'conformer_cache_dir',
+    None,
+    'IntelliFold extension: directory of an on-disk store of the RDKit'
+    ' reference conformers of ligands, shared across targets, seeds, runs and'
+    ' workers. Featurisation stores every conformer there, keyed by the'
+    ' molecule, the conformer seed and --conformer_max_iterations, and reuses'
+    ' it instead of re-running RDKit, so the features are unchanged. Off'
+    ' unless set.',
+)
 _NUM_SEEDS = flags.DEFINE_integer(
     'num_seeds',
     None,
@@ -450,6 +561,7 @@ def make_model_config(
     num_recycles: int = 10,
     return_embeddings: bool = False,
     return_distogram: bool = False,
+    return_trunk: bool = False,
     steering: bool = False,
     steering_num_gd_steps: int = 20,
     steering_weight_scale: float = 1.0,
@@ -471,9 +583,27 @@ def make_model_config(
   config.num_recycles = num_recycles
   config.return_embeddings = return_embeddings
   config.return_distogram = return_distogram
+  config.return_trunk = return_trunk
   return config
 
 
+# Rough peak device memory of one seed's forward pass per (padded) token pair,
+# dominated by the trunk's pair activations. Used to cap --seed_batch_size.
+_SEED_BYTES_PER_TOKEN_PAIR = 3 * 1024
+
+
+def _can_stack(examples: Sequence[features.BatchDict]) -> bool:
+  """Whether the featurised examples have identical keys, shapes and dtypes."""
+  first = examples[0]
+  for example in examples[1:]:
+    if example.keys() != first.keys():
+      return False
+    for k, v in example.items():
+      if v.shape != first[k].shape or v.dtype != first[k].dtype:
+        return False
+  return True
+
+
 class ModelRunner:
   """Helper class to run structure prediction stages."""
 
@@ -482,10 +612,12 @@ class ModelRunner:
       config: model.Model.Config,
       device: jax.Device,
       model_dir: pathlib.Path,
+      trunk_cache: trunk_cache_lib.TrunkCache | None = None,
   ):
     self._model_config = config
     self._device = device
     self._model_dir = model_dir
+    self.trunk_cache = trunk_cache
 
   @functools.cached_property
   def model_params(self) -> hk.Params:
@@ -493,40 +625,197 @@ class ModelRunner:
     return params.get_model_haiku_params(model_dir=self._model_dir)
 
   @functools.cached_property
-  def _model(
-      self,
-  ) -> Callable[[jnp.ndarray, features.BatchDict], model.ModelResult]:
-    """Loads model parameters and returns a jitted model forward pass."""
+  def _forward_fn(self) -> hk.Transformed:
+    """The haiku-transformed model forward pass."""
 
     @hk.transform
     def forward_fn(batch):
       return model.Model(self._model_config)(batch)
 
+    return forward_fn
+
+  @functools.cached_property
+  def _model(
+      self,
+  ) -> Callable[[jnp.ndarray, features.BatchDict], model.ModelResult]:
+    """Loads model parameters and returns a jitted model forward pass."""
     return functools.partial(
-        jax.jit(forward_fn.apply, device=self._device), self.model_params
+        jax.jit(self._forward_fn.apply, device=self._device), self.model_params
     )
 
-  def run_inference(
-      self, featurised_example: features.BatchDict, rng_key: jnp.ndarray
-  ) -> model.ModelResult:
-    """Computes a forward pass of the model on a featurised example."""
-    featurised_example = jax.device_put(
-        jax.tree_util.tree_map(
-            jnp.asarray, utils.remove_invalidly_typed_feats(featurised_example)
+  @functools.cached_property
+  def _batched_model(
+      self,
+  ) -> Callable[[jnp.ndarray, features.BatchDict], model.ModelResult]:
+    """Returns a jitted forward pass vmapped over rng keys and examples."""
+    return functools.partial(
+        jax.jit(
+            jax.vmap(self._forward_fn.apply, in_axes=(None, 0, 0)),
+            device=self._device,
         ),
+        self.model_params,
+    )
+
+  def trunk_cache_key(
+      self, featurised_example: features.BatchDict, seed: int
+  ) -> str:
+    """The trunk cache key of a seed's example.
+
+    Steering features and cached trunk outputs only feed the heads, so they are
+    left out of the hash.
+    """
+    example = {
+        k: v
+        for k, v in utils.remove_invalidly_typed_feats(
+            featurised_example
+        ).items()
+        if not k.startswith(('steering__', trunk_cache_lib.TRUNK_KEY_PREFIX))
+    }
+    return trunk_cache_lib.make_key(
+        features=trunk_cache_lib.fingerprint_arrays(example),
+        weights=self.model_params['__meta__']['__identifier__'].tobytes().hex(),
+        num_recycles=self._model_config.num_recycles,
+        seed=seed,
+    )
+
+  def attach_cached_trunks(
+      self,
+      featurised_examples: Sequence[features.BatchDict],
+      seeds: Sequence[int],
+  ) -> tuple[list[features.BatchDict], list[str | None]]:
+    """Attaches the cached trunk output of every seed that has one.
+
+    Returns:
+      The examples (with `trunk__*` arrays on a hit) and, per seed, the key to
+      store its trunk output under after the forward pass (None on a hit).
+    """
+    examples, keys_to_store = [], []
+    for seed, example in zip(seeds, featurised_examples):
+      key = self.trunk_cache_key(example, seed)
+      cached = self.trunk_cache.load(key)
+      if cached is None:
+        examples.append(example)
+        keys_to_store.append(key)
+      else:
+        examples.append(
+            dict(example, **{
+                trunk_cache_lib.TRUNK_KEY_PREFIX + k: v
+                for k, v in cached.items()
+            })
+        )
+        keys_to_store.append(None)
+    num_hits = keys_to_store.count(None)
+    print(
+        f'Trunk cache: {num_hits}/{len(seeds)} seed(s) reuse a cached trunk'
+        ' output.'
+    )
+    return examples, keys_to_store
+
+  def max_seeds_per_batch(self, num_tokens: int, requested: int) -> int:
+    """Caps the requested seed batch size by the free device memory.
+
+    Args:
+      num_tokens: Padded number of tokens (the bucket size) of the example.
+      requested: Requested number of seeds per forward pass, 0 for no limit.
+
+    Returns:
+      The number of seeds to run per forward pass, at least 1.
+    """
+    try:
+      stats = self._device.memory_stats()
+    except Exception:  # pylint: disable=broad-exception-caught
+      stats = None
+    if not stats or 'bytes_limit' not in stats:
+      # Unknown device memory: trust the requested size.
+      return max(requested, 1)
+    free = stats['bytes_limit'] - stats.get('bytes_in_use', 0)
+    per_seed = _SEED_BYTES_PER_TOKEN_PAIR * num_tokens**2
+    fit = max(int(free // per_seed), 1)
+    return fit if requested == 0 else min(requested, fit)
+
+  def _prepare_call(
+      self,
+      featurised_examples: Sequence[features.BatchDict],
+      rng_keys: Sequence[jnp.ndarray],
+  ) -> tuple[Callable[..., model.ModelResult], tuple[typing.Any, ...]]:
+    """The jitted forward pass for these examples and its device arguments."""
+    examples = [
+        utils.remove_invalidly_typed_feats(example)
+        for example in featurised_examples
+    ]
+    if len(examples) == 1:
+      featurised_example = jax.device_put(
+          jax.tree_util.tree_map(jnp.asarray, examples[0]), self._device
+      )
+      return self._model, (rng_keys[0], featurised_example)
+    stacked = jax.device_put(
+        jax.tree_util.tree_map(lambda *xs: jnp.asarray(np.stack(xs)), *examples),
         self._device,
     )
+    return self._batched_model, (jnp.stack(rng_keys), stacked)
 
-    result = self._model(rng_key, featurised_example)
+  def dispatch_inference(
+      self,
+      featurised_examples: Sequence[features.BatchDict],
+      rng_keys: Sequence[jnp.ndarray],
+  ) -> model.ModelResult:
+    """Starts a forward pass on one or more featurised examples.
+
+    The examples must have identical shapes (see `_can_stack`); more than one
+    runs as a single vmapped call. JAX dispatches asynchronously, so the host
+    can keep working until `fetch_inference` is called on the result.
+    """
+    fn, args = self._prepare_call(featurised_examples, rng_keys)
+    return fn(*args)
+
+  def compile_inference(
+      self, featurised_examples: Sequence[features.BatchDict]
+  ) -> None:
+    """Lowers and compiles the forward pass for these examples without running it.
+
+    With a persistent compilation cache configured, later processes running
+    examples of the same shapes load the executable instead of compiling it.
+    """
+    rng_keys = [jax.random.PRNGKey(0)] * len(featurised_examples)
+    fn, args = self._prepare_call(featurised_examples, rng_keys)
+    fn.func.lower(*fn.args, *args).compile()
+
+  def fetch_inference(
+      self, result: model.ModelResult, num_examples: int
+  ) -> list[model.ModelResult]:
+    """Blocks on a dispatched forward pass; returns one result per example."""
     result = jax.tree.map(np.asarray, result)
     result = jax.tree.map(
         lambda x: x.astype(jnp.float32) if x.dtype == jnp.bfloat16 else x,
         result,
     )
-    result = dict(result)
+    if num_examples == 1:
+      results = [dict(result)]
+    else:
+      results = [
+          dict(jax.tree.map(lambda x, i=i: x[i], result))
+          for i in range(num_examples)
+      ]
     identifier = self.model_params['__meta__']['__identifier__'].tobytes()
-    result['__identifier__'] = identifier
-    return result
+    for r in results:
+      r['__identifier__'] = identifier
+    return results
+
+  def run_inference(
+      self, featurised_example: features.BatchDict, rng_key: jnp.ndarray
+  ) -> model.ModelResult:
+    """Computes a forward pass of the model on a featurised example."""
+    result = self.dispatch_inference([featurised_example], [rng_key])
+    return self.fetch_inference(result, 1)[0]
+
+  def run_inference_batch(
+      self,
+      featurised_examples: Sequence[features.BatchDict],
+      rng_keys: Sequence[jnp.ndarray],
+  ) -> list[model.ModelResult]:
+    """Computes one vmapped forward pass over several featurised examples."""
+    result = self.dispatch_inference(featurised_examples, rng_keys)
+    return self.fetch_inference(result, len(featurised_examples))
 
   def extract_inference_results(
       self,
@@ -586,18 +875,22 @@ class ResultsForSeed:
   distogram: np.ndarray | None = None
 
 
-def predict_structure(
+def featurise_fold_input(
     fold_input: folding_input.Input,
-    model_runner: ModelRunner,
     *,
     buckets: Sequence[int] | None = None,
     ref_max_modified_date: datetime.date | None = None,
     conformer_max_iterations: int | None = None,
     resolve_msa_overlaps: bool = True,
     fix_standalone_glycans: bool = False,
-) -> Sequence[ResultsForSeed]:
-  """Runs the full inference pipeline to predict structures for each seed."""
+    conformer_cache_dir: str | None = None,
+    steering: bool = False,
+) -> Sequence[features.BatchDict]:
+  """Featurises a fold input for each seed (CPU only, no model needed).
 
+  If `steering` is set, the host-built steering constraint arrays are attached
+  to every featurised example.
+  """
   print(f'Featurising data with {len(fold_input.rng_seeds)} seed(s)...')
   featurisation_start_time = time.time()
   ccd = chemical_components.Ccd(user_ccd=fold_input.user_ccd)
@@ -613,6 +906,7 @@ def predict_structure(
       conformer_max_iterations=conformer_max_iterations,
       resolve_msa_overlaps=resolve_msa_overlaps,
       fix_standalone_glycans=fix_standalone_glycans,
+      conformer_cache_dir=conformer_cache_dir,
   )
   import inspect as _inspect
   _accepted = _inspect.signature(featurisation.featurise_input).parameters
@@ -623,22 +917,13 @@ def predict_structure(
       f'Featurising data with {len(fold_input.rng_seeds)} seed(s) took'
       f' {time.time() - featurisation_start_time:.2f} seconds.'
   )
-  print(
-      'Running model inference and extracting output structure samples with'
-      f' {len(fold_input.rng_seeds)} seed(s)...'
-  )
-  all_inference_start_time = time.time()
-  all_inference_results = []
-  steering_on = (
-      model_runner._model_config.heads.diffusion.eval.steering_enabled
-  )
-  for seed, example in zip(fold_input.rng_seeds, featurised_examples):
-    if steering_on:
-      from intellifold.steering import (
-          build_steering_features,
-          STEERING_KEY_PREFIX,
-      )
+  if steering:
+    from intellifold.steering import (
+        build_steering_features,
+        STEERING_KEY_PREFIX,
+    )
 
+    for example in featurised_examples:
       steering_feats = build_steering_features(example, ccd)
       if steering_feats:
         for _k, _v in steering_feats.items():
@@ -656,40 +941,159 @@ def predict_structure(
             f'[steering] {fold_input.name}: no constrainable ligand residues;'
             ' running unsteered.'
         )
-    print(f'Running model inference with seed {seed}...')
-    inference_start_time = time.time()
-    rng_key = jax.random.PRNGKey(seed)
-    result = model_runner.run_inference(example, rng_key)
-    print(
-        f'Running model inference with seed {seed} took'
-        f' {time.time() - inference_start_time:.2f} seconds.'
-    )
-    print(f'Extracting inference results with seed {seed}...')
-    extract_structures = time.time()
-    inference_results = model_runner.extract_inference_results(
-        batch=example, result=result, target_name=fold_input.name
+  return featurised_examples
+
+
+def predict_structure(
+    fold_input: folding_input.Input,
+    model_runner: ModelRunner,
+    *,
+    buckets: Sequence[int] | None = None,
+    ref_max_modified_date: datetime.date | None = None,
+    conformer_max_iterations: int | None = None,
+    resolve_msa_overlaps: bool = True,
+    fix_standalone_glycans: bool = False,
+    conformer_cache_dir: str | None = None,
+    seed_batch_size: int = 1,
+) -> Sequence[ResultsForSeed]:
+  """Runs the full inference pipeline to predict structures for each seed."""
+  featurised_examples = featurise_fold_input(
+      fold_input,
+      buckets=buckets,
+      ref_max_modified_date=ref_max_modified_date,
+      conformer_max_iterations=conformer_max_iterations,
+      resolve_msa_overlaps=resolve_msa_overlaps,
+      fix_standalone_glycans=fix_standalone_glycans,
+      conformer_cache_dir=conformer_cache_dir,
+      steering=(
+          model_runner._model_config.heads.diffusion.eval.steering_enabled
+      ),
+  )
+  return predict_featurised_structure(
+      fold_input,
+      featurised_examples,
+      model_runner,
+      seed_batch_size=seed_batch_size,
+  )
+
+
+def predict_featurised_structure(
+    fold_input: folding_input.Input,
+    featurised_examples: Sequence[features.BatchDict],
+    model_runner: ModelRunner,
+    *,
+    seed_batch_size: int = 1,
+) -> Sequence[ResultsForSeed]:
+  """Runs model inference on featurised examples, one per seed."""
+  print(
+      'Running model inference and extracting output structure samples with'
+      f' {len(fold_input.rng_seeds)} seed(s)...'
+  )
+  all_inference_start_time = time.time()
+  all_inference_results = []
+  seeds = list(fold_input.rng_seeds)
+
+  # IntelliFold: with a trunk cache, seeds whose trunk output is cached run
+  # only the heads; the others store their trunk output after the pass.
+  trunk_keys = [None] * len(seeds)
+  if model_runner.trunk_cache is not None:
+    featurised_examples, trunk_keys = model_runner.attach_cached_trunks(
+        featurised_examples, seeds
     )
-    num_tokens = len(inference_results[0].metadata['token_chain_ids'])
-    embeddings = model_runner.extract_embeddings(
-        result=result, num_tokens=num_tokens
+
+  # IntelliFold: pack seeds into vmapped forward passes when requested and the
+  # per-seed examples share shapes; the batch is capped by free device memory
+  # and by the number of seeds.
+  batch_size = 1
+  if seed_batch_size != 1 and len(seeds) > 1 and _can_stack(
+      [utils.remove_invalidly_typed_feats(e) for e in featurised_examples]
+  ):
+    num_padded_tokens = featurised_examples[0]['aatype'].shape[0]
+    batch_size = model_runner.max_seeds_per_batch(
+        num_padded_tokens, seed_batch_size
     )
-    distogram = model_runner.extract_distogram(
-        result=result, num_tokens=num_tokens
+    batch_size = min(batch_size, len(seeds))
+    print(
+        f'Running up to {batch_size} seed(s) per forward pass'
+        f' ({num_padded_tokens} padded tokens).'
     )
+  seed_batches = [
+      (
+          seeds[i : i + batch_size],
+          featurised_examples[i : i + batch_size],
+          trunk_keys[i : i + batch_size],
+      )
+      for i in range(0, len(seeds), batch_size)
+  ]
+
+  def _extract(
+      batch_seeds, batch_examples, batch_trunk_keys, handle,
+      inference_start_time,
+  ):
+    results = model_runner.fetch_inference(handle, batch_size)
+    results = results[: len(batch_seeds)]
     print(
-        f'Extracting {len(inference_results)} inference samples with'
-        f' seed {seed} took {time.time() - extract_structures:.2f} seconds.'
+        f'Running model inference with seed(s) {batch_seeds} took'
+        f' {time.time() - inference_start_time:.2f} seconds.'
     )
+    for seed, example, trunk_key, result in zip(
+        batch_seeds, batch_examples, batch_trunk_keys, results
+    ):
+      trunk = {
+          'single': result.pop('trunk_single', None),
+          'pair': result.pop('trunk_pair', None),
+      }
+      if trunk_key is not None and trunk['pair'] is not None:
+        model_runner.trunk_cache.store(trunk_key, trunk)
+      print(f'Extracting inference results with seed {seed}...')
+      extract_structures = time.time()
+      inference_results = model_runner.extract_inference_results(
+          batch=example, result=result, target_name=fold_input.name
+      )
+      num_tokens = len(inference_results[0].metadata['token_chain_ids'])
+      embeddings = model_runner.extract_embeddings(
+          result=result, num_tokens=num_tokens
+      )
+      distogram = model_runner.extract_distogram(
+          result=result, num_tokens=num_tokens
+      )
+      print(
+          f'Extracting {len(inference_results)} inference samples with'
+          f' seed {seed} took {time.time() - extract_structures:.2f} seconds.'
+      )
 
-    all_inference_results.append(
-        ResultsForSeed(
-            seed=seed,
-            inference_results=inference_results,
-            full_fold_input=fold_input,
-            embeddings=embeddings,
-            distogram=distogram,
-        )
+      all_inference_results.append(
+          ResultsForSeed(
+              seed=seed,
+              inference_results=inference_results,
+              full_fold_input=fold_input,
+              embeddings=embeddings,
+              distogram=distogram,
+          )
+      )
+
+  # The next forward pass is dispatched before the previous one's results are
+  # extracted, so host-side extraction overlaps with device compute.
+  # The batch size never exceeds the seed count, so only the last of several
+  # batches can be short; it is padded with repeats of its final seed (results
+  # dropped) to reuse the executable the full batches already compiled.
+  pending = None
+  for batch_seeds, batch_examples, batch_trunk_keys in seed_batches:
+    print(f'Running model inference with seed(s) {batch_seeds}...')
+    inference_start_time = time.time()
+    num_pad = batch_size - len(batch_seeds)
+    handle = model_runner.dispatch_inference(
+        list(batch_examples) + [batch_examples[-1]] * num_pad,
+        [jax.random.PRNGKey(seed) for seed in batch_seeds + [batch_seeds[-1]] * num_pad],
+    )
+    if pending is not None:
+      _extract(*pending)
+    pending = (
+        batch_seeds, batch_examples, batch_trunk_keys, handle,
+        inference_start_time,
     )
+  if pending is not None:
+    _extract(*pending)
   print(
       'Running model inference and extracting output structures with'
       f' {len(fold_input.rng_seeds)} seed(s) took'
@@ -800,6 +1204,59 @@ def replace_db_dir(path_with_db_dir: str, db_dirs: Sequence[str]) -> str:
   return path_with_db_dir
 
 
+def _resolve_output_dir(
+    output_dir: os.PathLike[str] | str, force_output_dir: bool
+) -> os.PathLike[str] | str:
+  """Returns a fresh timestamped output dir if `output_dir` is non-empty."""
+  if (
+      not force_output_dir
+      and os.path.exists(output_dir)
+      and os.listdir(output_dir)
+  ):
+    new_output_dir = (
+        f'{output_dir}_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    )
+    print(
+        f'Output will be written in {new_output_dir} since {output_dir} is'
+        ' non-empty.'
+    )
+    return new_output_dir
+  print(f'Output will be written in {output_dir}')
+  return output_dir
+
+
+def _run_data_pipeline(
+    fold_input: folding_input.Input,
+    data_pipeline_config: pipeline.DataPipelineConfig | None,
+    output_dir: os.PathLike[str] | str,
+    force_output_dir: bool,
+) -> tuple[folding_input.Input, os.PathLike[str] | str]:
+  """The start of every fold job: data pipeline and input JSON.
+
+  Returns:
+    The fold input with the data pipeline results and the resolved output
+    directory, to which the input JSON was written.
+
+  Raises:
+    ValueError: If the fold input has no chains.
+  """
+  print(f'\nRunning fold job {fold_input.name}...')
+
+  if not fold_input.chains:
+    raise ValueError('Fold input has no chains.')
+
+  output_dir = _resolve_output_dir(output_dir, force_output_dir)
+
+  if data_pipeline_config is None:
+    print('Skipping data pipeline...')
+  else:
+    print('Running data pipeline...')
+    fold_input = pipeline.DataPipeline(data_pipeline_config).process(fold_input)
+
+  write_fold_input_json(fold_input, output_dir)
+  return fold_input, output_dir
+
+
 @overload
 def process_fold_input(
     fold_input: folding_input.Input,
@@ -812,8 +1269,10 @@ def process_fold_input(
     conformer_max_iterations: int | None = None,
     resolve_msa_overlaps: bool = True,
     fix_standalone_glycans: bool = False,
+    conformer_cache_dir: str | None = None,
     force_output_dir: bool = False,
     compress_large_output_files: bool = False,
+    seed_batch_size: int = 1,
 ) -> folding_input.Input:
   ...
 
@@ -830,8 +1289,10 @@ def process_fold_input(
     conformer_max_iterations: int | None = None,
     resolve_msa_overlaps: bool = True,
     fix_standalone_glycans: bool = False,
+    conformer_cache_dir: str | None = None,
     force_output_dir: bool = False,
     compress_large_output_files: bool = False,
+    seed_batch_size: int = 1,
 ) -> Sequence[ResultsForSeed]:
   ...
 
@@ -847,8 +1308,10 @@ def process_fold_input(
     conformer_max_iterations: int | None = None,
     resolve_msa_overlaps: bool = True,
     fix_standalone_glycans: bool = False,
+    conformer_cache_dir: str | None = None,
     force_output_dir: bool = False,
     compress_large_output_files: bool = False,
+    seed_batch_size: int = 1,
 ) -> folding_input.Input | Sequence[ResultsForSeed]:
   """Runs data pipeline and/or inference on a single fold input.
 
@@ -880,12 +1343,17 @@ def process_fold_input(
       AlphaFold 3 paper. Note that the model has been trained with the default
       setting, so setting this to True may cause non-standard behaviour of the
       model.
+    conformer_cache_dir: Optional directory of an on-disk store of the RDKit
+      reference conformers, shared across targets, seeds and runs (see
+      `intellifold.conformer_cache`).
     force_output_dir: If True, do not create a new output directory even if the
       existing one is non-empty. Instead use the existing output directory and
       potentially overwrite existing files. If False, create a new timestamped
       output directory instead if the existing one is non-empty.
     compress_large_output_files: If True, compress large output files (mmCIF and
       confidences JSON) using zstandard.
+    seed_batch_size: Maximum number of seeds per forward pass, 0 for as many as
+      fit in device memory.
 
   Returns:
     The processed fold input, or the inference results for each seed.
@@ -893,34 +1361,9 @@ def process_fold_input(
   Raises:
     ValueError: If the fold input has no chains.
   """
-  print(f'\nRunning fold job {fold_input.name}...')
-
-  if not fold_input.chains:
-    raise ValueError('Fold input has no chains.')
-
-  if (
-      not force_output_dir
-      and os.path.exists(output_dir)
-      and os.listdir(output_dir)
-  ):
-    new_output_dir = (
-        f'{output_dir}_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}'
-    )
-    print(
-        f'Output will be written in {new_output_dir} since {output_dir} is'
-        ' non-empty.'
-    )
-    output_dir = new_output_dir
-  else:
-    print(f'Output will be written in {output_dir}')
-
-  if data_pipeline_config is None:
-    print('Skipping data pipeline...')
-  else:
-    print('Running data pipeline...')
-    fold_input = pipeline.DataPipeline(data_pipeline_config).process(fold_input)
-
-  write_fold_input_json(fold_input, output_dir)
+  fold_input, output_dir = _run_data_pipeline(
+      fold_input, data_pipeline_config, output_dir, force_output_dir
+  )
   if model_runner is None:
     print('Skipping model inference...')
     output = fold_input
@@ -937,6 +1380,8 @@ def process_fold_input(
         conformer_max_iterations=conformer_max_iterations,
         resolve_msa_overlaps=resolve_msa_overlaps,
         fix_standalone_glycans=fix_standalone_glycans,
+        conformer_cache_dir=conformer_cache_dir,
+        seed_batch_size=seed_batch_size,
     )
     print(f'Writing outputs with {len(fold_input.rng_seeds)} seed(s)...')
     write_outputs(
@@ -951,6 +1396,308 @@ def process_fold_input(
   return output
 
 
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class PreparedFoldInput:
+  """A fold input after the CPU stages of `process_fold_input`.
+
+  Attributes:
+    fold_input: The fold input, including the data pipeline results.
+    output_dir: The resolved output directory for this fold job.
+    featurised_examples: The featurised examples, one per seed.
+  """
+
+  fold_input: folding_input.Input
+  output_dir: os.PathLike[str] | str
+  featurised_examples: Sequence[features.BatchDict]
+
+
+def prepare_fold_input(
+    fold_input: folding_input.Input,
+    *,
+    data_pipeline_config: pipeline.DataPipelineConfig | None,
+    output_dir: os.PathLike[str] | str,
+    force_output_dir: bool = False,
+    buckets: Sequence[int] | None = None,
+    ref_max_modified_date: datetime.date | None = None,
+    conformer_max_iterations: int | None = None,
+    resolve_msa_overlaps: bool = True,
+    fix_standalone_glycans: bool = False,
+    conformer_cache_dir: str | None = None,
+    steering: bool = False,
+) -> PreparedFoldInput:
+  """Featurisation stage of the streaming pipeline (see `intellifold.streaming`).
+
+  Runs everything `process_fold_input` does before model inference: the data
+  pipeline, writing the input JSON and featurisation. Runs in a worker process,
+  so it must not touch the model or the device.
+  """
+  fold_input, output_dir = _run_data_pipeline(
+      fold_input, data_pipeline_config, output_dir, force_output_dir
+  )
+  featurised_examples = featurise_fold_input(
+      fold_input,
+      buckets=buckets,
+      ref_max_modified_date=ref_max_modified_date,
+      conformer_max_iterations=conformer_max_iterations,
+      resolve_msa_overlaps=resolve_msa_overlaps,
+      fix_standalone_glycans=fix_standalone_glycans,
+      conformer_cache_dir=conformer_cache_dir,
+      steering=steering,
+  )
+  return PreparedFoldInput(
+      fold_input=fold_input,
+      output_dir=output_dir,
+      featurised_examples=featurised_examples,
+  )
+
+
+def write_prepared_outputs(
+    prepared: PreparedFoldInput,
+    all_inference_results: Sequence[ResultsForSeed],
+    compress_large_output_files: bool = False,
+) -> None:
+  """Output stage of the streaming pipeline (see `intellifold.streaming`)."""
+  fold_input = prepared.fold_input
+  print(f'Writing outputs with {len(fold_input.rng_seeds)} seed(s)...')
+  write_outputs(
+      all_inference_results=all_inference_results,
+      output_dir=prepared.output_dir,
+      job_name=fold_input.sanitised_name(),
+      compress_large_output_files=compress_large_output_files,
+  )
+  print(
+      f'Fold job {fold_input.name} done, output written to'
+      f' {prepared.output_dir}\n'
+  )
+
+
+def _data_pipeline_config_from_flags(
+    max_template_date: datetime.date,
+) -> pipeline.DataPipelineConfig | None:
+  """The data pipeline configured by this script's flags, if it is enabled."""
+  if _RUN_DATA_PIPELINE.value:
+    expand_path = lambda x: replace_db_dir(x, DB_DIR.value)
+    return pipeline.DataPipelineConfig(
+        jackhmmer_binary_path=_JACKHMMER_BINARY_PATH.value,
+        nhmmer_binary_path=_NHMMER_BINARY_PATH.value,
+        hmmalign_binary_path=_HMMALIGN_BINARY_PATH.value,
+        hmmsearch_binary_path=_HMMSEARCH_BINARY_PATH.value,
+        hmmbuild_binary_path=_HMMBUILD_BINARY_PATH.value,
+        small_bfd_database_path=expand_path(_SMALL_BFD_DATABASE_PATH.value),
+        small_bfd_z_value=_SMALL_BFD_Z_VALUE.value,
+        mgnify_database_path=expand_path(_MGNIFY_DATABASE_PATH.value),
+        mgnify_z_value=_MGNIFY_Z_VALUE.value,
+        uniprot_cluster_annot_database_path=expand_path(
+            _UNIPROT_CLUSTER_ANNOT_DATABASE_PATH.value
+        ),
+        uniprot_cluster_annot_z_value=_UNIPROT_CLUSTER_ANNOT_Z_VALUE.value,
+        uniref90_database_path=expand_path(_UNIREF90_DATABASE_PATH.value),
+        uniref90_z_value=_UNIREF90_Z_VALUE.value,
+        ntrna_database_path=expand_path(_NTRNA_DATABASE_PATH.value),
+        ntrna_z_value=_NTRNA_Z_VALUE.value,
+        rfam_database_path=expand_path(_RFAM_DATABASE_PATH.value),
+        rfam_z_value=_RFAM_Z_VALUE.value,
+        rna_central_database_path=expand_path(_RNA_CENTRAL_DATABASE_PATH.value),
+        rna_central_z_value=_RNA_CENTRAL_Z_VALUE.value,
+        pdb_database_path=expand_path(_PDB_DATABASE_PATH.value),
+        seqres_database_path=expand_path(_SEQRES_DATABASE_PATH.value),
+        jackhmmer_n_cpu=_JACKHMMER_N_CPU.value,
+        jackhmmer_max_parallel_shards=_JACKHMMER_MAX_PARALLEL_SHARDS.value,
+        nhmmer_n_cpu=_NHMMER_N_CPU.value,
+        nhmmer_max_parallel_shards=_NHMMER_MAX_PARALLEL_SHARDS.value,
+        max_template_date=max_template_date,
+        msa_cache_dir=_MSA_CACHE_DIR.value,
+        msa_cache_max_bytes=(
+            int(_MSA_CACHE_MAX_GB.value * 1024**3)
+            if _MSA_CACHE_MAX_GB.value
+            else None
+        ),
+    )
+  return None
+
+
+def _model_runner_from_flags(device: jax.Device) -> ModelRunner:
+  """The `ModelRunner` configured by this script's flags."""
+  return ModelRunner(
+      config=make_model_config(
+          flash_attention_implementation=typing.cast(
+              tokamax.DotProductAttentionImplementation,
+              _FLASH_ATTENTION_IMPLEMENTATION.value,
+          ),
+          num_diffusion_samples=_NUM_DIFFUSION_SAMPLES.value,
+          num_recycles=_NUM_RECYCLES.value,
+          return_embeddings=_SAVE_EMBEDDINGS.value,
+          return_distogram=_SAVE_DISTOGRAM.value,
+          return_trunk=_TRUNK_CACHE_DIR.value is not None,
+          steering=_STEERING.value,
+          steering_num_gd_steps=_STEERING_NUM_GD_STEPS.value,
+          steering_weight_scale=_STEERING_WEIGHT_SCALE.value,
+      ),
+      device=device,
+      model_dir=pathlib.Path(MODEL_DIR.value),
+      trunk_cache=(
+          trunk_cache_lib.TrunkCache(_TRUNK_CACHE_DIR.value)
+          if _TRUNK_CACHE_DIR.value is not None
+          else None
+      ),
+  )
+
+
+def _dir_size(path: str) -> tuple[int, int]:
+  """(number of files, total bytes) under `path`."""
+  num_files = num_bytes = 0
+  for root, _, files in os.walk(path):
+    for name in files:
+      try:
+        num_bytes += os.path.getsize(os.path.join(root, name))
+      except OSError:
+        continue
+      num_files += 1
+  return num_files, num_bytes
+
+
+def warmup_bucket(
+    model_runner: ModelRunner,
+    bucket: int,
+    *,
+    buckets: Sequence[int],
+    seed_batch_size: int = 1,
+) -> float:
+  """Compiles the forward pass for one bucket from a synthetic input.
+
+  The synthetic input is a single protein chain of exactly `bucket` residues
+  with no MSA or templates: every feature is padded to shapes that depend only
+  on the bucket, so the compiled program is the one real inputs of that bucket
+  use.
+
+  Returns:
+    The lowering + compilation time in seconds.
+  """
+  fold_input = folding_input.Input(
+      name=f'warmup_{bucket}',
+      chains=[
+          folding_input.ProteinChain(
+              id='A',
+              sequence='G' * bucket,
+              ptms=[],
+              paired_msa='',
+              unpaired_msa='',
+              templates=[],
+          )
+      ],
+      rng_seeds=[0],
+  )
+  featurised_examples = featurise_fold_input(fold_input, buckets=buckets)
+  start = time.time()
+  model_runner.compile_inference(featurised_examples)
+  if seed_batch_size > 1:
+    model_runner.compile_inference(featurised_examples * seed_batch_size)
+  return time.time() - start
+
+
+def warmup_main(_):
+  """Entry point of `intellifold warmup`: precompiles buckets into the cache."""
+  cache_dir = _JAX_COMPILATION_CACHE_DIR.value
+  if cache_dir is None:
+    raise ValueError('warmup requires --jax_compilation_cache_dir.')
+  jax.config.update('jax_compilation_cache_dir', cache_dir)
+  # Cache every compilation, however quick, so nothing is left to compile later.
+  jax.config.update('jax_persistent_cache_min_compile_time_secs', 0)
+
+  all_buckets = sorted(int(bucket) for bucket in _BUCKETS.value)
+  to_warm = sorted(
+      (int(bucket) for bucket in (_WARMUP_BUCKETS.value or all_buckets)),
+      reverse=True,
+  )
+  if _STEERING.value:
+    print(
+        '[warmup] --steering shapes depend on each ligand and cannot be'
+        ' precompiled; warming up the steering-enabled model without'
+        ' constraints.'
+    )
+  device = jax.local_devices(backend='gpu')[_GPU_DEVICE.value]
+  model_runner = _model_runner_from_flags(device)
+  _ = model_runner.model_params
+  print(f'[warmup] compiling buckets {to_warm} on {device} into {cache_dir}')
+
+  report = []
+  for bucket in to_warm:
+    _, size_before = _dir_size(cache_dir)
+    seconds = warmup_bucket(
+        model_runner,
+        bucket,
+        buckets=all_buckets,
+        seed_batch_size=_SEED_BATCH_SIZE.value,
+    )
+    _, size_after = _dir_size(cache_dir)
+    report.append((bucket, seconds, size_after - size_before))
+    print(
+        f'[warmup] bucket {bucket}: compiled in {seconds:.1f} s,'
+        f' cache +{(size_after - size_before) / 2**20:.1f} MiB'
+    )
+  num_files, num_bytes = _dir_size(cache_dir)
+  print('[warmup] bucket  compile_s  cache_MiB')
+  for bucket, seconds, added in report:
+    print(f'[warmup] {bucket:>6}  {seconds:>9.1f}  {added / 2**20:>9.1f}')
+  print(
+      f'[warmup] cache {cache_dir}: {num_files} entries,'
+      f' {num_bytes / 2**20:.1f} MiB'
+  )
+
+
+def serve_main(_):
+  """Entry point of `intellifold serve`: keeps the model resident for requests."""
+  from intellifold import server
+
+  if _JAX_COMPILATION_CACHE_DIR.value is not None:
+    jax.config.update(
+        'jax_compilation_cache_dir', _JAX_COMPILATION_CACHE_DIR.value
+    )
+  if _OUTPUT_DIR.value is None:
+    raise ValueError('Output directory must be specified with --output_dir.')
+  os.makedirs(_OUTPUT_DIR.value, exist_ok=True)
+
+  max_template_date = datetime.date.fromisoformat(_MAX_TEMPLATE_DATE.value)
+  device = jax.local_devices(backend='gpu')[_GPU_DEVICE.value]
+  model_runner = _model_runner_from_flags(device)
+  print(f'Loading model parameters onto {device}...')
+  _ = model_runner.model_params
+  inference = server.InferenceServer(
+      model_runner,
+      output_dir=_OUTPUT_DIR.value,
+      prepare_kwargs=dict(
+          data_pipeline_config=_data_pipeline_config_from_flags(
+              max_template_date
+          ),
+          buckets=tuple(int(bucket) for bucket in _BUCKETS.value),
+          ref_max_modified_date=max_template_date,
+          conformer_max_iterations=_CONFORMER_MAX_ITERATIONS.value,
+          resolve_msa_overlaps=_RESOLVE_MSA_OVERLAPS.value,
+          fix_standalone_glycans=_FIX_STANDALONE_GLYCANS.value,
+          conformer_cache_dir=_CONFORMER_CACHE_DIR.value,
+          steering=_STEERING.value,
+      ),
+      seed_batch_size=_SEED_BATCH_SIZE.value,
+      num_seeds=_NUM_SEEDS.value,
+      compress_large_output_files=_COMPRESS_LARGE_OUTPUT_FILES.value,
+      max_pending=_SERVE_MAX_PENDING.value,
+  )
+  server.serve(
+      inference,
+      host=_SERVE_HOST.value,
+      port=_SERVE_PORT.value,
+      socket_path=_SERVE_SOCKET.value,
+  )
+
+
+def _prepare_stage(
+    payload: tuple[folding_input.Input, str], **kwargs
+) -> PreparedFoldInput:
+  """`prepare_fold_input` on a `(fold_input, output_dir)` pipeline payload."""
+  fold_input, output_dir = payload
+  return prepare_fold_input(fold_input, output_dir=output_dir, **kwargs)
+
+
 def main(_):
   if _JAX_COMPILATION_CACHE_DIR.value is not None:
     jax.config.update(
@@ -978,7 +1725,9 @@ def main(_):
     work_queue = parallel.WorkQueue(
         _INPUT_DIR.value, _WORK_QUEUE_DIR.value,
         retry_failed=_WORK_QUEUE_RETRY_FAILED.value,
+        buckets=[int(bucket) for bucket in _BUCKETS.value],
     )
+    preferred_buckets = [int(b) for b in _WORK_QUEUE_BUCKETS.value or ()]
     fold_inputs = None
   elif _INPUT_DIR.value is not None:
     fold_inputs = folding_input.load_fold_inputs_from_dir(
@@ -1045,40 +1794,7 @@ def main(_):
   print('\n' + '\n'.join(notice) + '\n')
 
   max_template_date = datetime.date.fromisoformat(_MAX_TEMPLATE_DATE.value)
-  if _RUN_DATA_PIPELINE.value:
-    expand_path = lambda x: replace_db_dir(x, DB_DIR.value)
-    data_pipeline_config = pipeline.DataPipelineConfig(
-        jackhmmer_binary_path=_JACKHMMER_BINARY_PATH.value,
-        nhmmer_binary_path=_NHMMER_BINARY_PATH.value,
-        hmmalign_binary_path=_HMMALIGN_BINARY_PATH.value,
-        hmmsearch_binary_path=_HMMSEARCH_BINARY_PATH.value,
-        hmmbuild_binary_path=_HMMBUILD_BINARY_PATH.value,
-        small_bfd_database_path=expand_path(_SMALL_BFD_DATABASE_PATH.value),
-        small_bfd_z_value=_SMALL_BFD_Z_VALUE.value,
-        mgnify_database_path=expand_path(_MGNIFY_DATABASE_PATH.value),
-        mgnify_z_value=_MGNIFY_Z_VALUE.value,
-        uniprot_cluster_annot_database_path=expand_path(
-            _UNIPROT_CLUSTER_ANNOT_DATABASE_PATH.value
-        ),
-        uniprot_cluster_annot_z_value=_UNIPROT_CLUSTER_ANNOT_Z_VALUE.value,
-        uniref90_database_path=expand_path(_UNIREF90_DATABASE_PATH.value),
-        uniref90_z_value=_UNIREF90_Z_VALUE.value,
-        ntrna_database_path=expand_path(_NTRNA_DATABASE_PATH.value),
-        ntrna_z_value=_NTRNA_Z_VALUE.value,
-        rfam_database_path=expand_path(_RFAM_DATABASE_PATH.value),
-        rfam_z_value=_RFAM_Z_VALUE.value,
-        rna_central_database_path=expand_path(_RNA_CENTRAL_DATABASE_PATH.value),
-        rna_central_z_value=_RNA_CENTRAL_Z_VALUE.value,
-        pdb_database_path=expand_path(_PDB_DATABASE_PATH.value),
-        seqres_database_path=expand_path(_SEQRES_DATABASE_PATH.value),
-        jackhmmer_n_cpu=_JACKHMMER_N_CPU.value,
-        jackhmmer_max_parallel_shards=_JACKHMMER_MAX_PARALLEL_SHARDS.value,
-        nhmmer_n_cpu=_NHMMER_N_CPU.value,
-        nhmmer_max_parallel_shards=_NHMMER_MAX_PARALLEL_SHARDS.value,
-        max_template_date=max_template_date,
-    )
-  else:
-    data_pipeline_config = None
+  data_pipeline_config = _data_pipeline_config_from_flags(max_template_date)
 
   if _RUN_INFERENCE.value:
     devices = jax.local_devices(backend='gpu')
@@ -1088,23 +1804,7 @@ def main(_):
     )
 
     print('Building model from scratch...')
-    model_runner = ModelRunner(
-        config=make_model_config(
-            flash_attention_implementation=typing.cast(
-                tokamax.DotProductAttentionImplementation,
-                _FLASH_ATTENTION_IMPLEMENTATION.value,
-            ),
-            num_diffusion_samples=_NUM_DIFFUSION_SAMPLES.value,
-            num_recycles=_NUM_RECYCLES.value,
-            return_embeddings=_SAVE_EMBEDDINGS.value,
-            return_distogram=_SAVE_DISTOGRAM.value,
-            steering=_STEERING.value,
-            steering_num_gd_steps=_STEERING_NUM_GD_STEPS.value,
-            steering_weight_scale=_STEERING_WEIGHT_SCALE.value,
-        ),
-        device=devices[_GPU_DEVICE.value],
-        model_dir=pathlib.Path(MODEL_DIR.value),
-    )
+    model_runner = _model_runner_from_flags(devices[_GPU_DEVICE.value])
     # Check we can load the model parameters before launching anything.
     print('Checking that model parameters can be loaded...')
     _ = model_runner.model_params
@@ -1125,12 +1825,92 @@ def main(_):
         conformer_max_iterations=_CONFORMER_MAX_ITERATIONS.value,
         resolve_msa_overlaps=_RESOLVE_MSA_OVERLAPS.value,
         fix_standalone_glycans=_FIX_STANDALONE_GLYCANS.value,
+        conformer_cache_dir=_CONFORMER_CACHE_DIR.value,
         force_output_dir=_FORCE_OUTPUT_DIR.value,
         compress_large_output_files=_COMPRESS_LARGE_OUTPUT_FILES.value,
+        seed_batch_size=_SEED_BATCH_SIZE.value,
     )
 
   num_fold_inputs = 0
-  if work_queue is not None:
+  if (
+      _FEATURISE_WORKERS.value > 0
+      and model_runner is not None
+      and _INPUT_DIR.value is not None
+  ):
+    # IntelliFold streaming mode: featurise ahead in a process pool, infer here,
+    # write on a background thread (see intellifold.streaming).
+    import concurrent.futures
+    import multiprocessing
+    from intellifold import streaming
+
+    def _payload(fold_input):
+      if _NUM_SEEDS.value is not None:
+        print(f'Expanding fold job {fold_input.name} to {_NUM_SEEDS.value} seeds')
+        fold_input = fold_input.with_multiple_seeds(_NUM_SEEDS.value)
+      output_dir = os.path.join(_OUTPUT_DIR.value, fold_input.sanitised_name())
+      return fold_input, output_dir
+
+    prepare = functools.partial(
+        _prepare_stage,
+        data_pipeline_config=data_pipeline_config,
+        force_output_dir=_FORCE_OUTPUT_DIR.value,
+        buckets=tuple(int(bucket) for bucket in _BUCKETS.value),
+        ref_max_modified_date=max_template_date,
+        conformer_max_iterations=_CONFORMER_MAX_ITERATIONS.value,
+        resolve_msa_overlaps=_RESOLVE_MSA_OVERLAPS.value,
+        fix_standalone_glycans=_FIX_STANDALONE_GLYCANS.value,
+        conformer_cache_dir=_CONFORMER_CACHE_DIR.value,
+        steering=_STEERING.value,
+    )
+    infer = lambda prepared: predict_featurised_structure(
+        prepared.fold_input,
+        prepared.featurised_examples,
+        model_runner,
+        seed_batch_size=_SEED_BATCH_SIZE.value,
+    )
+    write = functools.partial(
+        write_prepared_outputs,
+        compress_large_output_files=_COMPRESS_LARGE_OUTPUT_FILES.value,
+    )
+    if work_queue is not None:
+      s = work_queue.stats()
+      print(f'[queue] start: {s["remaining"]} remaining of {s["total"]} '
+            f'({s["done"]} done, {s["failed"]} failed, {s["in_progress"]} in progress)')
+      items = (
+          (stem, _payload(fold_input))
+          for stem, fold_input in work_queue.claim_iter(
+              folding_input.load_fold_inputs_from_path,
+              preferred_buckets=preferred_buckets)
+      )
+
+      def _on_error(stem, e):
+        print(f'[queue] FAILED {stem}: {type(e).__name__}: {e}')
+        work_queue.mark_failed(stem, e)
+
+      callbacks = dict(
+          on_done=work_queue.mark_done,
+          on_error=_on_error,
+          on_abort=work_queue._release,
+      )
+    else:
+      items = (
+          (fold_input.name, _payload(fold_input)) for fold_input in fold_inputs
+      )
+      callbacks = {}
+    # Spawn, not fork: this process has already initialised JAX and the GPU.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=_FEATURISE_WORKERS.value,
+        mp_context=multiprocessing.get_context('spawn'),
+    ) as executor:
+      num_fold_inputs = streaming.run_pipeline(
+          items, prepare, infer, write,
+          executor=executor,
+          prefetch=_FEATURISE_WORKERS.value,
+          **callbacks,
+      )
+    if work_queue is not None:
+      print(f'[queue] worker drained the queue; this worker did {num_fold_inputs} jobs.')
+  elif work_queue is not None:
     # Pool worker: keep claiming targets from the shared queue until it drains.
     # One target's failure (e.g. OOM) is recorded and skipped, never killing the
     # worker — so the rest of this GPU's share still gets processed.
@@ -1138,7 +1918,8 @@ def main(_):
     print(f'[queue] start: {s["remaining"]} remaining of {s["total"]} '
           f'({s["done"]} done, {s["failed"]} failed, {s["in_progress"]} in progress)')
     for stem, fold_input in work_queue.claim_iter(
-        folding_input.load_fold_inputs_from_path):
+        folding_input.load_fold_inputs_from_path,
+        preferred_buckets=preferred_buckets):
       try:
         _process(fold_input)
         work_queue.mark_done(stem)
@@ -0,0 +1,362 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent local inference server for `intellifold serve`.
+
+Every `intellifold predict` process re-reads the weights, re-applies the
+IntelliFold patches and reloads the compiled executables before it can run a
+single target, which dominates the latency of small interactive jobs. The server
+does that once and keeps the `ModelRunner` (parameters and jitted forward pass)
+resident on one GPU:
+
+  * clients POST an AF3 fold-input JSON to `/predict` (localhost HTTP or a Unix
+    socket) and get back a stream of newline-delimited JSON events
+    (`accepted`, `queued`, `running`, `done` or `error`);
+  * each request is featurised on its own handler thread (bounded), then queued
+    by padded bucket; a single device thread drains the queues, staying on one
+    bucket for a few jobs in a row so it keeps reusing the same executable;
+  * at most `max_pending` requests are admitted at a time; beyond that the
+    server answers 503 with `Retry-After`, so clients back off instead of piling
+    up memory.
+
+Outputs are written to `<output_dir>/<job name>` exactly as `predict` would.
+
+  curl --data-binary @fold_input.json http://127.0.0.1:8765/predict
+  curl --unix-socket /tmp/intellifold.sock --data-binary @fold_input.json \\
+      http://localhost/predict
+"""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import http.server
+import itertools
+import json
+import os
+import socketserver
+import threading
+import time
+from typing import Any, Callable, Mapping
+
+from alphafold3.common import folding_input
+
+from intellifold import run_jax_inference
+
+
+class _Job:
+  """One admitted request once it has been featurised."""
+
+  def __init__(self, prepared: run_jax_inference.PreparedFoldInput, bucket: int):
+    self.prepared = prepared
+    self.bucket = bucket
+    self.enqueued = time.time()
+    self.started = threading.Event()
+    self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+def parse_fold_input(body: bytes) -> folding_input.Input:
+  """A single fold input from a request body, in either JSON dialect.
+
+  Raises:
+    ValueError: If the body is not exactly one valid fold job.
+  """
+  text = body.decode('utf-8')
+  raw = json.loads(text)
+  if isinstance(raw, list):
+    if len(raw) != 1:
+      raise ValueError(f'Expected one fold job per request, got {len(raw)}.')
+    return folding_input.Input.from_alphafoldserver_fold_job(raw[0])
+  if 'dialect' not in raw:
+    return folding_input.Input.from_alphafoldserver_fold_job(raw)
+  return folding_input.Input.from_json(text)
+
+
+class InferenceServer:
+  """Holds a `ModelRunner` and schedules requests on its device.
+
+  Attributes:
+    model_runner: The resident model.
+    output_dir: Root directory for the outputs of every request.
+    max_pending: Maximum number of requests admitted at once (featurising,
+      queued or running).
+  """
+
+  def __init__(
+      self,
+      model_runner: run_jax_inference.ModelRunner,
+      *,
+      output_dir: str,
+      prepare_kwargs: Mapping[str, Any],
+      seed_batch_size: int = 1,
+      num_seeds: int | None = None,
+      compress_large_output_files: bool = False,
+      max_pending: int = 32,
+      featurise_threads: int = 4,
+      max_bucket_streak: int = 8,
+  ):
+    self.model_runner = model_runner
+    self.output_dir = output_dir
+    self.max_pending = max_pending
+    self._prepare_kwargs = dict(prepare_kwargs)
+    self._seed_batch_size = seed_batch_size
+    self._num_seeds = num_seeds
+    self._compress = compress_large_output_files
+    self._max_bucket_streak = max_bucket_streak
+    self._featurise = threading.BoundedSemaphore(featurise_threads)
+    self._cond = threading.Condition()
+    self._queues: dict[int, collections.deque[_Job]] = {}
+    self._pending = 0
+    self._reserved: set[str] = set()
+    self._ids = itertools.count(1)
+    self._device_thread = threading.Thread(
+        target=self._device_loop, name='intellifold-device', daemon=True
+    )
+    self._device_thread.start()
+
+  # ----------------------------------------------------------------------- #
+  #  Admission
+  # ----------------------------------------------------------------------- #
+  def try_admit(self) -> bool:
+    """Reserves a request slot; False if the server is at capacity."""
+    with self._cond:
+      if self._pending >= self.max_pending:
+        return False
+      self._pending += 1
+      return True
+
+  def _finish(self, output_dir: str | None) -> None:
+    with self._cond:
+      self._pending -= 1
+      self._reserved.discard(output_dir)
+
+  def _reserve_output_dir(
+      self, fold_input: folding_input.Input, request_id: int
+  ) -> str:
+    """A fresh output dir, unique among in-flight requests and on disk."""
+    base = os.path.join(self.output_dir, fold_input.sanitised_name())
+    with self._cond:
+      output_dir = base
+      if output_dir in self._reserved or (
+          os.path.exists(output_dir) and os.listdir(output_dir)
+      ):
+        output_dir = f'{base}_{time.strftime("%Y%m%d_%H%M%S")}_{request_id}'
+      self._reserved.add(output_dir)
+    return output_dir
+
+  def status(self) -> dict[str, Any]:
+    with self._cond:
+      return {
+          'status': 'ok',
+          'pending': self._pending,
+          'max_pending': self.max_pending,
+          'queued': {str(b): len(q) for b, q in self._queues.items() if q},
+      }
+
+  # ----------------------------------------------------------------------- #
+  #  Device scheduling
+  # ----------------------------------------------------------------------- #
+  def _enqueue(self, job: _Job) -> int:
+    with self._cond:
+      self._queues.setdefault(job.bucket, collections.deque()).append(job)
+      self._cond.notify()
+      return sum(len(q) for q in self._queues.values())
+
+  def _next_job(self, last_bucket: int | None, streak: int) -> _Job:
+    """Stays on `last_bucket` for a few jobs, else takes the oldest request."""
+    with self._cond:
+      while not any(self._queues.values()):
+        self._cond.wait()
+      if (
+          last_bucket is not None
+          and self._queues.get(last_bucket)
+          and streak < self._max_bucket_streak
+      ):
+        return self._queues[last_bucket].popleft()
+      bucket = min(
+          (b for b, q in self._queues.items() if q),
+          key=lambda b: self._queues[b][0].enqueued,
+      )
+      return self._queues[bucket].popleft()
+
+  def _device_loop(self) -> None:
+    last_bucket, streak = None, 0
+    while True:
+      job = self._next_job(last_bucket, streak)
+      streak = streak + 1 if job.bucket == last_bucket else 1
+      last_bucket = job.bucket
+      job.started.set()
+      try:
+        results = run_jax_inference.predict_featurised_structure(
+            job.prepared.fold_input,
+            job.prepared.featurised_examples,
+            self.model_runner,
+            seed_batch_size=self._seed_batch_size,
+        )
+      except Exception as e:  # pylint: disable=broad-exception-caught
+        job.future.set_exception(e)
+      else:
+        job.future.set_result(results)
+
+  # ----------------------------------------------------------------------- #
+  #  Request lifecycle
+  # ----------------------------------------------------------------------- #
+  def run(
+      self,
+      fold_input: folding_input.Input,
+      emit: Callable[[dict[str, Any]], None],
+  ) -> None:
+    """Runs one admitted request to completion, reporting progress to `emit`.
+
+    The caller must have obtained a slot with `try_admit`; it is released here.
+    """
+    request_id = next(self._ids)
+    output_dir = None
+    start = time.time()
+    try:
+      if self._num_seeds is not None:
+        fold_input = fold_input.with_multiple_seeds(self._num_seeds)
+      output_dir = self._reserve_output_dir(fold_input, request_id)
+      emit({'event': 'accepted', 'id': request_id, 'name': fold_input.name,
+            'output_dir': output_dir})
+      with self._featurise:
+        prepared = run_jax_inference.prepare_fold_input(
+            fold_input,
+            output_dir=output_dir,
+            force_output_dir=True,
+            **self._prepare_kwargs,
+        )
+      job = _Job(prepared, int(prepared.featurised_examples[0]['seq_mask'].shape[-1]))
+      position = self._enqueue(job)
+      emit({'event': 'queued', 'id': request_id, 'bucket': job.bucket,
+            'position': position})
+      job.started.wait()
+      emit({'event': 'running', 'id': request_id})
+      results = job.future.result()
+      run_jax_inference.write_prepared_outputs(prepared, results, self._compress)
+      emit({
+          'event': 'done',
+          'id': request_id,
+          'output_dir': output_dir,
+          'seconds': round(time.time() - start, 2),
+          'ranking_scores': [
+              {'seed': r.seed, 'sample': i,
+               'ranking_score': float(res.metadata['ranking_score'])}
+              for r in results for i, res in enumerate(r.inference_results)
+          ],
+      })
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      emit({'event': 'error', 'id': request_id,
+            'error': f'{type(e).__name__}: {e}'})
+    finally:
+      self._finish(output_dir)
+
+
+# --------------------------------------------------------------------------- #
+#  HTTP transport
+# --------------------------------------------------------------------------- #
+class _Handler(http.server.BaseHTTPRequestHandler):
+  """`GET /health` and `POST /predict` (streams NDJSON events)."""
+
+  server_version = 'intellifold-serve'
+
+  def address_string(self) -> str:
+    # Unix-socket peers have no (host, port).
+    return self.client_address[0] if self.client_address else 'unix'
+
+  def _send_json(self, code: int, payload: Mapping[str, Any], **headers) -> None:
+    body = (json.dumps(payload) + '\n').encode()
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    for k, v in headers.items():
+      self.send_header(k.replace('_', '-'), v)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self) -> None:  # pylint: disable=invalid-name
+    if self.path.rstrip('/') == '/health':
+      self._send_json(200, self.server.inference.status())
+    else:
+      self._send_json(404, {'error': f'unknown path {self.path}'})
+
+  def do_POST(self) -> None:  # pylint: disable=invalid-name
+    if self.path.rstrip('/') != '/predict':
+      self._send_json(404, {'error': f'unknown path {self.path}'})
+      return
+    inference: InferenceServer = self.server.inference
+    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+    try:
+      fold_input = parse_fold_input(body)
+    except (ValueError, UnicodeDecodeError) as e:
+      self._send_json(400, {'error': f'{type(e).__name__}: {e}'})
+      return
+    if not inference.try_admit():
+      self._send_json(503, {'error': 'server busy, retry later'}, Retry_After='1')
+      return
+
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/x-ndjson')
+    self.end_headers()
+    connected = True
+
+    def emit(event: dict[str, Any]) -> None:
+      nonlocal connected
+      if not connected:
+        return
+      try:
+        self.wfile.write((json.dumps(event) + '\n').encode())
+        self.wfile.flush()
+      except OSError:
+        # The client went away; finish the job anyway, its outputs are on disk.
+        connected = False
+
+    inference.run(fold_input, emit)
+
+
+class _TCPServer(http.server.ThreadingHTTPServer):
+  daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+
+def serve(
+    inference: InferenceServer,
+    *,
+    host: str = '127.0.0.1',
+    port: int = 8765,
+    socket_path: str | None = None,
+) -> None:
+  """Serves `inference` until interrupted (Ctrl-C)."""
+  if socket_path is not None:
+    if os.path.exists(socket_path):
+      os.unlink(socket_path)
+    httpd = _UnixServer(socket_path, _Handler)
+    where = f'unix:{socket_path}'
+  else:
+    httpd = _TCPServer((host, port), _Handler)
+    where = f'http://{host}:{port}'
+  httpd.inference = inference
+  print(f'[serve] listening on {where} (max {inference.max_pending} pending'
+        f' requests); outputs under {inference.output_dir}', flush=True)
+  try:
+    httpd.serve_forever()
+  except KeyboardInterrupt:
+    print('[serve] interrupted -- shutting down.')
+  finally:
+    httpd.server_close()
+    if socket_path is not None and os.path.exists(socket_path):
+      os.unlink(socket_path)
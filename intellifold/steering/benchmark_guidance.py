@@ -0,0 +1,261 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the steering GD loop: on-device loop vs. the unrolled one.
+
+Compares ``guidance.descend`` (one ``lax.fori_loop``, compile size independent
+of the number of GD steps) with the previous formulation, which unrolled
+``num_gd_steps`` Python iterations of ``jax.grad`` into the traced graph. Both
+run on a synthetic target with every potential group populated, vmapped over
+the diffusion samples as in ``diffusion_head.sample``, and report the HLO size,
+the compile time, the runtime of one guided denoising step and the largest
+differences between the two results and from a float64 descent.
+
+``--target ligands`` instead steers noised RDKit conformers of real drug
+molecules with the constraints ``rdkit_features`` derives from them, which is
+what ligand steering sees in practice:
+
+    python -m intellifold.steering.benchmark_guidance --num_tokens 384 \\
+        --num_gd_steps 1 5 20 50
+    python -m intellifold.steering.benchmark_guidance --target ligands
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from intellifold.steering import guidance
+from intellifold.steering import rdkit_features
+
+# Drug-like ligands with rings, chiral centres and E/Z double bonds.
+LIGAND_SMILES = (
+    "Cc1ccc(NC(=O)c2ccc(CN3CCN(C)CC3)cc2)cc1Nc1nccc(-c2cccnc2)n1",  # imatinib
+    "CC(C)c1c(C(=O)Nc2ccccc2)c(-c2ccccc2)c(-c2ccc(F)cc2)n1CC[C@@H](O)C[C@@H](O)CC(=O)O",  # atorvastatin
+    "CC(=O)O[C@H]1C[C@@H]2CC[C@@H]3[C@H](CC[C@]4(C)[C@@H](OC(C)=O)CC[C@@H]34)[C@@]2(C)CC1",  # a steroid diacetate
+    "C/C(=C\\CO)/C=C/C=C(\\C)/C=C/C1=C(C)CCCC1(C)C",  # retinol
+    "O=C(O)C[C@H](NC(=O)[C@@H](N)CC(=O)O)C(=O)OC",  # a dipeptide ester
+)
+
+
+def descend_unrolled(coords, terms, num_gd_steps):
+    """The previous GD loop: ``num_gd_steps`` unrolled Python iterations."""
+
+    def energy_at(x, gd_step):
+        e = jnp.zeros((), dtype=x.dtype)
+        for interval, fn in terms:
+            if gd_step % interval == 0:
+                e = e + fn(x)
+        return e
+
+    grad_energy = jax.grad(energy_at, argnums=0)
+    guidance_update = jnp.zeros_like(coords)
+    for gd_step in range(num_gd_steps):
+        g = grad_energy(coords + guidance_update, gd_step)
+        g = jnp.where(jnp.isfinite(g), g, 0.0)
+        guidance_update = guidance_update - g
+    return guidance_update
+
+
+def synthetic_steering(num_atoms, num_constraints, num_chains, rng):
+    """Random constraints of every group over ``num_atoms`` flat atoms.
+
+    Each constraint spans consecutive atoms, so on a chain-like conformation
+    (see `synthetic_coords`) its dihedrals are well defined.
+    """
+
+    def index(arity):
+        start = rng.integers(0, num_atoms - arity, num_constraints)
+        return (start[None] + np.arange(arity)[:, None]).astype(np.int32)
+
+    def bounds(lo, hi):
+        lower = rng.uniform(lo, hi, num_constraints).astype(np.float32)
+        return lower, lower + rng.uniform(0.1, 0.5, num_constraints).astype(np.float32)
+
+    steering = {}
+    for name, arity, (lo, hi) in (
+        ("posebusters", 2, (1.0, 3.0)),
+        ("connections", 2, (1.2, 1.8)),
+        ("chiral", 4, (0.2, 1.0)),
+        ("stereo", 4, (2.5, 3.0)),
+        ("planar", 4, (0.0, 0.3)),
+    ):
+        lower, upper = bounds(lo, hi)
+        steering[f"{name}_index"] = index(arity)
+        steering[f"{name}_lower"] = lower
+        steering[f"{name}_upper"] = upper
+    steering["vdw_index"] = index(2)
+    steering["vdw_lower"] = rng.uniform(2.5, 3.5, num_constraints).astype(np.float32)
+    steering["vdw_upper"] = np.full(num_constraints, np.inf, np.float32)
+
+    chain = np.sort(rng.integers(0, num_chains, num_atoms))
+    steering["symcom_atoms"] = np.arange(num_atoms, dtype=np.int32)
+    steering["symcom_chain"] = chain.astype(np.int32)
+    steering["symcom_inv_count"] = (
+        1.0 / np.maximum(np.bincount(chain, minlength=num_chains), 1)
+    ).astype(np.float32)
+    steering["symcom_pairs"] = np.stack(
+        np.triu_indices(num_chains, k=1)
+    ).astype(np.int32)
+    return {k: jnp.asarray(v) for k, v in steering.items()}
+
+
+def synthetic_coords(num_samples, num_atoms, rng):
+    """Random-walk chains with 1.5 A steps, one per diffusion sample."""
+    steps = rng.normal(size=(num_samples, num_atoms, 3))
+    steps *= 1.5 / np.linalg.norm(steps, axis=-1, keepdims=True)
+    return jnp.asarray(np.cumsum(steps, axis=1), jnp.float32)
+
+
+def ligand_target(num_copies):
+    """Steering arrays and conformers of copies of `LIGAND_SMILES`.
+
+    Every copy is an independent ETKDG conformer, placed 20 A from the others.
+    Returns the steering dict and the ``[num_atoms, 3]`` coords.
+    """
+    from rdkit import Chem
+    from rdkit.Chem import AllChem
+
+    pb, ch, st, pl, coords = [], [], [], [], []
+    offset = 0
+    for copy in range(num_copies):
+        mol = Chem.AddHs(Chem.MolFromSmiles(LIGAND_SMILES[copy % len(LIGAND_SMILES)]))
+        AllChem.EmbedMolecule(mol, randomSeed=copy)
+        mol = Chem.RemoveHs(mol)
+        Chem.AssignStereochemistry(
+            mol, cleanIt=True, force=True, flagPossibleStereoCenters=True
+        )
+        # Constraints in the molecule's own atom indices, shifted by `offset`
+        idx_map = {i: i for i in range(mol.GetNumAtoms())}
+        atom_vdw = rdkit_features._vdw_radii_table()[
+            [atom.GetAtomicNum() for atom in mol.GetAtoms()]
+        ]
+        pairs, lo, hi, isb, isa = rdkit_features._geometry_constraints(mol, idx_map)
+        lower, upper = rdkit_features._bake_posebusters(pairs, lo, hi, isb, isa, atom_vdw)
+        pb.append((pairs + offset, lower, upper))
+        chiral = rdkit_features._chiral_constraints(mol, idx_map)
+        if chiral is not None:
+            ch.append((chiral[0] + offset, *rdkit_features._bake_chiral(chiral[1])))
+        stereo = rdkit_features._stereo_constraints(mol, idx_map)
+        if stereo is not None:
+            st.append((stereo[0] + offset, *rdkit_features._bake_stereo(stereo[1])))
+        planar = rdkit_features._planar_constraints(mol, idx_map)
+        if planar is not None:
+            pl.append((planar + offset, *rdkit_features._bake_planar(planar.shape[1])))
+        xyz = mol.GetConformer().GetPositions()
+        coords.append(xyz - xyz.mean(0) + 20.0 * np.array([copy, 0, 0]))
+        offset += mol.GetNumAtoms()
+
+    steering = {}
+    for name, entries in (("posebusters", pb), ("chiral", ch), ("stereo", st), ("planar", pl)):
+        if entries:
+            index, lower, upper = (np.concatenate(e, axis=-1) for e in zip(*entries))
+            steering[f"{name}_index"] = jnp.asarray(index, jnp.int32)
+            steering[f"{name}_lower"] = jnp.asarray(lower, jnp.float32)
+            steering[f"{name}_upper"] = jnp.asarray(upper, jnp.float32)
+    return steering, np.concatenate(coords).astype(np.float32)
+
+
+def make_step(descend_fn, steering, num_gd_steps):
+    """One guided denoising step, vmapped over the diffusion samples."""
+    groups = guidance.default_groups()
+
+    def step(coords, t):
+        terms = guidance.guidance_terms(coords, steering, t, 1.0, groups)
+        return coords + descend_fn(coords, terms, num_gd_steps)
+
+    return jax.jit(jax.vmap(step, in_axes=(0, None)))
+
+
+def benchmark(fn, args, repeats):
+    start = time.perf_counter()
+    lowered = fn.lower(*args)
+    compiled = lowered.compile()
+    compile_s = time.perf_counter() - start
+    hlo_size = len(lowered.as_text())
+    compiled(*args).block_until_ready()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        out = compiled(*args)
+    out.block_until_ready()
+    return out, hlo_size, compile_s, (time.perf_counter() - start) / repeats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["synthetic", "ligands"], default="synthetic")
+    parser.add_argument("--num_tokens", type=int, default=256)
+    parser.add_argument("--atoms_per_token", type=int, default=24)
+    parser.add_argument("--num_samples", type=int, default=5)
+    parser.add_argument("--num_constraints", type=int, default=2048)
+    parser.add_argument("--num_chains", type=int, default=4)
+    parser.add_argument("--num_copies", type=int, default=50)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--num_gd_steps", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # For the float64 reference; everything else is explicitly float32
+    jax.config.update("jax_enable_x64", True)
+
+    rng = np.random.default_rng(args.seed)
+    if args.target == "synthetic":
+        num_atoms = args.num_tokens * args.atoms_per_token
+        steering = synthetic_steering(
+            num_atoms, args.num_constraints, args.num_chains, rng
+        )
+        coords = synthetic_coords(args.num_samples, num_atoms, rng)
+    else:
+        # Noised like an x0 prediction midway through sampling
+        steering, conformers = ligand_target(args.num_copies)
+        num_atoms = conformers.shape[0]
+        noise = rng.normal(scale=args.noise, size=(args.num_samples, num_atoms, 3))
+        coords = jnp.asarray(conformers + noise, jnp.float32)
+    t = jnp.asarray(0.3, jnp.float32)
+    steering64 = {
+        k: v.astype(jnp.float64) if v.dtype == jnp.float32 else v
+        for k, v in steering.items()
+    }
+
+    num_constraints = sum(
+        v.size for k, v in steering.items() if k.endswith("_lower")
+    )
+    print(f"backend={jax.default_backend()} target={args.target} atoms={num_atoms}"
+          f" samples={args.num_samples} constraints={num_constraints}")
+    print(f"{'gd_steps':>8} {'impl':>8} {'hlo_chars':>10} {'compile_s':>10}"
+          f" {'step_ms':>9} {'max_diff':>9} {'vs_fp64':>9}")
+    for num_gd_steps in args.num_gd_steps:
+        reference = make_step(guidance.descend, steering64, num_gd_steps)(
+            coords.astype(jnp.float64), t
+        )
+        results = {}
+        for name, descend_fn in (
+            ("unrolled", descend_unrolled),
+            ("loop", guidance.descend),
+        ):
+            fn = make_step(descend_fn, steering, num_gd_steps)
+            results[name] = benchmark(fn, (coords, t), args.repeats)
+        max_diff = float(jnp.max(jnp.abs(results["loop"][0] - results["unrolled"][0])))
+        for name, (out, hlo_size, compile_s, step_s) in results.items():
+            vs_fp64 = float(jnp.max(jnp.abs(out - reference)))
+            print(f"{num_gd_steps:>8} {name:>8} {hlo_size:>10} {compile_s:>10.2f}"
+                  f" {1e3 * step_s:>9.2f} {max_diff:>9.2e} {vs_fp64:>9.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -110,23 +110,129 @@ def abs_dihedral_energy(coords, index, lower, upper):
     return flat_bottom_energy(jnp.abs(dihedral_angle(coords, index)), lower, upper)
 
 
-def com_distance_energy(coords, weight, pairs, lower):
+def chain_coms(coords, atoms, chain, inv_count):
+    """Centres of mass of the chains, as a segment reduction. -> [C, 3].
+
+    ``atoms`` are the flat indices of the chains' real atoms, grouped by chain;
+    ``chain`` is the dense chain label of each (sorted); ``inv_count`` is
+    ``1 / num_atoms`` per chain, whose length gives the (static) chain count.
+    """
+    total = jax.ops.segment_sum(
+        coords[atoms], chain, num_segments=inv_count.shape[0], indices_are_sorted=True
+    )
+    return total * inv_count[:, None]
+
+
+def com_distance_energy(coords, atoms, chain, inv_count, pairs, lower):
     """Flat-bottom repulsion between symmetric chains' centres of mass.
 
-    ``weight`` is a ``[C, N]`` per-chain averaging matrix (rows sum to 1 over a
-    chain's real atoms), so ``weight @ coords`` gives each chain's COM. ``pairs``
-    selects the symmetric chain pairs; ``lower`` is the (time-scheduled) minimum
-    COM separation. Mirrors SymmetricChainCOMPotential.
+    COMs come from ``chain_coms``, so the cost is linear in the chains' atoms
+    rather than a dense ``[C, N_atoms]`` matmul. ``pairs`` selects the symmetric
+    chain pairs; ``lower`` is the (time-scheduled) minimum COM separation, which
+    is also the interaction cutoff: pairs further apart than it add neither
+    energy nor gradient. Mirrors SymmetricChainCOMPotential.
     """
     if pairs.shape[1] == 0:
         return jnp.zeros((), dtype=coords.dtype)
-    com = weight @ coords  # [C, 3]
-    d = jnp.linalg.norm(com[pairs[0]] - com[pairs[1]], axis=-1)  # [M]
+    com = chain_coms(coords, atoms, chain, inv_count)
+    d = pair_distance(com, pairs)  # [M]
     lower = jnp.broadcast_to(jnp.asarray(lower, coords.dtype), d.shape)
     upper = jnp.full_like(d, jnp.inf)
     return flat_bottom_energy(d, lower, upper)
 
 
+# ----------------------------------------------------------------------------
+# On-device neighbour list (cell list) for the VDW-overlap pairs of large
+# assemblies, where the dense inter-chain pair list would be O(N_atoms^2).
+# ----------------------------------------------------------------------------
+
+_CELL_OFFSETS = tuple(
+    (dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+)
+
+
+def _cell_hash(cell, num_cells):
+    """Spatial hash of integer cell coordinates into ``num_cells`` (a power of 2)."""
+    h = (cell[..., 0] * 73856093) ^ (cell[..., 1] * 19349663) ^ (cell[..., 2] * 83492791)
+    return h & (num_cells - 1)
+
+
+def neighbour_pairs(
+    coords,
+    atoms,
+    radius,
+    chain,
+    excluded,
+    *,
+    skin=1.0,
+    cell_capacity=32,
+    max_neighbours=32,
+):
+    """Cutoff neighbour list of VDW pairs, built on device with a cell list.
+
+    Atoms are binned into cubic cells of side ``cutoff = 2 * max(radius) + skin``
+    (hashed into a fixed-size table, so the shapes are static); each atom then
+    only looks at the atoms of its 27 surrounding cells. Pairs from the same or
+    ``excluded`` chains are dropped and each unordered pair is kept once.
+
+    Args:
+      coords: ``[N_atoms, 3]`` flat coordinates.
+      atoms: ``[K]`` flat indices of the candidate atoms.
+      radius: ``[K]`` per-atom radii; a pair's lower bound is their sum.
+      chain: ``[K]`` dense chain label per atom.
+      excluded: ``[C, C]`` bool, chain pairs that must not interact.
+      skin: extra margin (A) so pairs that move into range before the next
+        rebuild are still listed.
+      cell_capacity: atoms read per cell (denser cells are truncated).
+      max_neighbours: neighbours kept per atom (the closest ones).
+
+    Returns:
+      ``(index, lower)`` in the format of ``distance_energy``: ``[2, K * M]``
+      flat atom pairs and their lower bounds, ``-inf`` (no energy) on unused
+      slots.
+    """
+    x = coords[atoms]
+    k = x.shape[0]
+    cutoff = 2.0 * jnp.max(radius) + skin
+    num_cells = 1 << max(1, (2 * k - 1).bit_length())
+
+    cell = jnp.floor(x / cutoff).astype(jnp.int32)                  # [K, 3]
+    order = jnp.argsort(_cell_hash(cell, num_cells))
+    sorted_hash = _cell_hash(cell, num_cells)[order]
+    buckets = jnp.arange(num_cells)
+    start = jnp.searchsorted(sorted_hash, buckets, side="left")
+    end = jnp.searchsorted(sorted_hash, buckets, side="right")
+
+    near = cell[:, None, :] + jnp.asarray(_CELL_OFFSETS, jnp.int32)  # [K, 27, 3]
+    near_hash = _cell_hash(near, num_cells)
+    slot = start[near_hash][..., None] + jnp.arange(cell_capacity)  # [K, 27, cap]
+    cand = order[jnp.minimum(slot, k - 1)]
+    # Keep only atoms really in that cell: drops hash collisions, so no atom is
+    # listed twice.
+    ok = (slot < end[near_hash][..., None]) & jnp.all(
+        cell[cand] == near[:, :, None, :], axis=-1)
+    cand = cand.reshape(k, -1)
+    ok = ok.reshape(k, -1)
+    ok &= cand > jnp.arange(k)[:, None]
+    ok &= ~excluded[chain[:, None], chain[cand]]
+    d2 = jnp.sum((x[:, None, :] - x[cand]) ** 2, axis=-1)
+    ok &= d2 < cutoff * cutoff
+
+    m = min(max_neighbours, cand.shape[1])
+    _, pick = jax.lax.top_k(jnp.where(ok, -d2, -jnp.inf), m)
+    nb = jnp.take_along_axis(cand, pick, axis=1)
+    valid = jnp.take_along_axis(ok, pick, axis=1)
+    index = jnp.stack([jnp.repeat(atoms, m), atoms[nb].reshape(-1)])
+    lower = jnp.where(valid, radius[:, None] + radius[nb], -jnp.inf).reshape(-1)
+    return jax.lax.stop_gradient(index), jax.lax.stop_gradient(lower)
+
+
+def neighbour_distance_energy(coords, atoms, radius, chain, excluded):
+    """``distance_energy`` over a freshly built cell-list neighbour list."""
+    index, lower = neighbour_pairs(coords, atoms, radius, chain, excluded)
+    return distance_energy(coords, index, lower, jnp.full_like(lower, jnp.inf))
+
+
 # Maps a group's variable kind to its energy function. The host tags each group
 # with one of these names.
 ENERGY_FNS = {
@@ -39,6 +39,7 @@ from __future__ import annotations
 
 import logging
 import math
+import os
 from typing import Dict, Optional
 
 import numpy as np
@@ -59,6 +60,9 @@ _PLANAR_BUFFER = 0.26180
 # evaluated in JAX rather than baked; the host only emits chain membership.
 _VDW_BUFFER = 0.225
 _CONNECTIONS_BUFFER = 2.0
+# Above this many inter-chain atom pairs the dense VDW pair list is replaced by
+# an on-device neighbour list (see ``potentials.neighbour_pairs``).
+_VDW_MAX_DENSE_PAIRS = 1 << 21
 
 _PLANAR_SMARTS = "[C;X3;^2](*)(*)=[C;X3;^2](*)(*)"
 
@@ -361,18 +365,15 @@ def _build_connections(example, A):
     )
 
 
-def _build_vdw(asym_id_token, pdam, atom_vdw, A, connected_chain_pairs):
-    """Inter-chain VDW-overlap pairs -> (index[2,P], lower[P]).
+def _vdw_chains(asym_id_token, pdam, A, connected_chain_pairs):
+    """Real-atom flat indices per multi-atom chain, and the connected chain pairs.
 
-    Only real atoms, only chains with more than one atom (drop lone ions), and
-    only chain pairs that are not
-    covalently connected, lower bound = sum of VDW radii * (1 - buffer).
+    Lone-atom chains (ions) are dropped; covalently connected chain pairs are
+    returned as sorted tuples so the caller can exclude them.
     """
     asym_atom = _per_atom_asym(asym_id_token, A)            # [T*A]
     atom_mask = pdam.reshape(-1).astype(bool)               # [T*A]
     real = np.nonzero(atom_mask)[0]
-    if real.size < 2:
-        return np.empty((2, 0), np.int64), np.empty((0,), np.float32)
     asym_real = asym_atom[real]
     # chain sizes over real atoms; keep only multi-atom chains (drop lone ions).
     chains, counts = np.unique(asym_real, return_counts=True)
@@ -383,6 +384,27 @@ def _build_vdw(asym_id_token, pdam, atom_vdw, A, connected_chain_pairs):
             connected.add(tuple(sorted((int(a), int(b)))))
     # group real-atom flat indices by chain
     by_chain = {int(c): real[asym_real == c] for c in chains if int(c) in multi}
+    return by_chain, connected
+
+
+def _vdw_dense_pair_count(by_chain, connected):
+    """Number of pairs ``_build_vdw`` would emit, without building them."""
+    sizes = {c: len(v) for c, v in by_chain.items()}
+    total = sum(sizes.values())
+    n = (total * total - sum(v * v for v in sizes.values())) // 2
+    for a, b in connected:
+        if a in sizes and b in sizes:
+            n -= sizes[a] * sizes[b]
+    return n
+
+
+def _build_vdw(by_chain, connected, atom_vdw):
+    """Inter-chain VDW-overlap pairs -> (index[2,P], lower[P]).
+
+    Only real atoms, only chains with more than one atom (drop lone ions), and
+    only chain pairs that are not
+    covalently connected, lower bound = sum of VDW radii * (1 - buffer).
+    """
     keep_chains = sorted(by_chain)
     pair_a, pair_b = [], []
     for i in range(len(keep_chains)):
@@ -404,50 +426,64 @@ def _build_vdw(asym_id_token, pdam, atom_vdw, A, connected_chain_pairs):
     return index, lower.astype(np.float32)
 
 
+def _build_vdw_atoms(by_chain, connected, atom_vdw):
+    """Per-atom VDW inputs for the on-device neighbour list (O(N), no pairs).
+
+    Returns (atoms[K], chain[K], radius[K], excluded[C, C]): the flat indices of
+    the candidate atoms, their dense chain labels, their VDW radii pre-scaled by
+    ``(1 - buffer)`` (so a pair's lower bound is ``radius_i + radius_j``), and
+    which chain pairs must not interact (same chain, or covalently connected).
+    """
+    keep_chains = sorted(by_chain)
+    dense = {c: i for i, c in enumerate(keep_chains)}
+    atoms = np.concatenate([by_chain[c] for c in keep_chains])
+    chain = np.concatenate(
+        [np.full(len(by_chain[c]), dense[c], np.int64) for c in keep_chains])
+    radius = atom_vdw[atoms] * (1.0 - _VDW_BUFFER)
+    excluded = np.eye(len(keep_chains), dtype=bool)
+    for a, b in connected:
+        if a in dense and b in dense:
+            excluded[dense[a], dense[b]] = excluded[dense[b], dense[a]] = True
+    return atoms, chain, radius.astype(np.float32), excluded
+
+
 def _build_symmetric_chains(example, pdam, A):
-    """Symmetric (same-entity, multi-atom) chains -> (pairs[2,M], atom_chain[T*A], C).
+    """Symmetric (same-entity, multi-atom) chains -> (pairs, atoms, chain, inv_count).
 
     Symmetric-chain COM repulsion: chains sharing an ``entity_id`` repel
-    each other's centre of mass. Returns ``pairs`` as *dense* chain-index pairs
-    (0..C-1), a per-atom dense chain label (-1 for atoms not in any symmetric
-    multi-atom chain), and the chain count C, so the JAX side can build per-chain
+    each other's centre of mass. Returns ``pairs[2, M]`` as *dense* chain-index
+    pairs (0..C-1), the flat indices ``atoms[K]`` of the symmetric chains' real
+    atoms grouped by chain, their dense chain labels ``chain[K]`` (sorted), and
+    ``inv_count[C]`` (1 / atoms per chain), so the JAX side builds per-chain
     COMs with a segment reduction. Empty for monomeric / lone-ion ligands.
     """
     asym_tok = np.asarray(example["asym_id"])
     ent_tok = np.asarray(example["entity_id"])
     asym_atom = _per_atom_asym(asym_tok, A)
     atom_mask = pdam.reshape(-1).astype(bool)
-    real = np.nonzero(atom_mask)[0]
-    asym_real = asym_atom[real]
-    chains, counts = np.unique(asym_real, return_counts=True)
-    multi = {int(c) for c, n in zip(chains, counts) if n > 1}
-    asym_to_ent = {}
-    for a, e in zip(asym_tok.tolist(), ent_tok.tolist()):
-        asym_to_ent.setdefault(int(a), int(e))
-    ent_to_asyms = {}
-    for a in sorted(set(asym_tok.tolist())):
-        if int(a) in multi:
-            ent_to_asyms.setdefault(asym_to_ent[int(a)], []).append(int(a))
-    pairs = []
-    for grp in ent_to_asyms.values():
-        for i in range(len(grp)):
-            for j in range(i + 1, len(grp)):
-                pairs.append([grp[i], grp[j]])
-    if not pairs:
-        return np.empty((2, 0), np.int64), np.empty((0, asym_atom.shape[0]), np.float32)
-    # Dense-index the symmetric chains and build per-chain COM averaging weights
-    # (row c sums to 1 over chain c's real atoms), so JAX gets COM = weight @ coords.
-    used = sorted({c for p in pairs for c in p})
-    dense = {c: i for i, c in enumerate(used)}
-    N = asym_atom.shape[0]
-    weight = np.zeros((len(used), N), np.float32)
-    for c in used:
-        members = (asym_atom == c) & atom_mask
-        n = int(members.sum())
-        if n > 0:
-            weight[dense[c], members] = 1.0 / n
-    dense_pairs = np.asarray([[dense[a], dense[b]] for a, b in pairs], np.int64).T
-    return dense_pairs, weight
+    chains, counts = np.unique(asym_atom[atom_mask], return_counts=True)
+    chains = chains[counts > 1]
+    # Entity of each multi-atom chain (from its first token); keep the chains
+    # whose entity has at least one other copy.
+    asyms, first_tok = np.unique(asym_tok, return_index=True)
+    chain_ent = ent_tok[first_tok[np.searchsorted(asyms, chains)]]
+    ents, ent_counts = np.unique(chain_ent, return_counts=True)
+    sym = ent_counts[np.searchsorted(ents, chain_ent)] > 1
+    chains, chain_ent = chains[sym], chain_ent[sym]
+    if chains.size == 0:
+        return (np.empty((2, 0), np.int64), np.empty((0,), np.int64),
+                np.empty((0,), np.int64), np.empty((0,), np.float32))
+    # Dense-index the symmetric chains (in asym order) and pair every two of
+    # the same entity.
+    i, j = np.nonzero(np.triu(chain_ent[:, None] == chain_ent[None, :], k=1))
+    pairs = np.stack([i, j]).astype(np.int64)
+    members = atom_mask & np.isin(asym_atom, chains)
+    atoms = np.nonzero(members)[0]
+    chain = np.searchsorted(chains, asym_atom[atoms])
+    order = np.argsort(chain, kind="stable")
+    atoms, chain = atoms[order], chain[order]
+    inv_count = 1.0 / np.bincount(chain, minlength=chains.size)
+    return pairs, atoms, chain, inv_count.astype(np.float32)
 
 
 # ----------------------------------------------------------------------------
@@ -461,6 +497,7 @@ def build_steering_features(
     *,
     ligand_only: bool = True,
     atoms_per_token: int = ATOMS_PER_TOKEN,
+    vdw_mode: Optional[str] = None,
 ) -> Optional[Dict[str, np.ndarray]]:
     """Build grouped steering arrays from a featurised example dict.
 
@@ -470,11 +507,19 @@ def build_steering_features(
       ligand_only: restrict constraints to ligand residues (cheap; the
         small-molecule validity signal posebuster scores). Set False to also
         constrain polymer residues (Boltz behaviour).
+      vdw_mode: how inter-chain VDW-overlap pairs are shipped to the device.
+        ``"dense"`` emits every inter-chain atom pair (O(N^2)),
+        ``"neighbour_list"`` emits per-atom arrays from which the sampler
+        builds a cutoff neighbour list on device at every denoising step, and
+        ``"auto"`` picks dense up to ``_VDW_MAX_DENSE_PAIRS`` pairs. Defaults to
+        ``$INTFOLD_STEERING_VDW`` or ``"auto"``.
 
     Returns:
       dict of numpy arrays per group (``<group>_index/_lower/_upper``) or None
       if nothing constrainable was found.
     """
+    if vdw_mode is None:
+        vdw_mode = os.environ.get("INTFOLD_STEERING_VDW", "auto")
     layout = example["token_atoms_layout"]
     layout = layout.item() if isinstance(layout, np.ndarray) and layout.ndim == 0 else layout
     is_ligand = np.asarray(example["is_ligand"]).astype(bool)
@@ -570,16 +615,31 @@ def build_steering_features(
         out["connections_lower"] = np.full(conn_index.shape[1], -np.inf, np.float32)
         out["connections_upper"] = np.full(conn_index.shape[1], _CONNECTIONS_BUFFER, np.float32)
 
-    vdw_index, vdw_lower = _build_vdw(asym_token, pdam, atom_vdw, A, conn_chains)
-    if vdw_index.shape[1]:
+    by_chain, connected = _vdw_chains(asym_token, pdam, A, conn_chains)
+    num_vdw_pairs = _vdw_dense_pair_count(by_chain, connected)
+    if vdw_mode == "auto":
+        vdw_mode = "dense" if num_vdw_pairs <= _VDW_MAX_DENSE_PAIRS else "neighbour_list"
+    if vdw_mode not in ("dense", "neighbour_list"):
+        raise ValueError(f"Unknown VDW steering mode: {vdw_mode!r}")
+    if num_vdw_pairs and vdw_mode == "dense":
+        vdw_index, vdw_lower = _build_vdw(by_chain, connected, atom_vdw)
         out["vdw_index"] = vdw_index.astype(np.int32)
         out["vdw_lower"] = vdw_lower
         out["vdw_upper"] = np.full(vdw_index.shape[1], np.inf, np.float32)
-
-    sym_pairs, sym_weight = _build_symmetric_chains(example, pdam, A)
+    elif num_vdw_pairs:
+        atoms, chain, radius, excluded = _build_vdw_atoms(by_chain, connected, atom_vdw)
+        out["vdw_atoms"] = atoms.astype(np.int32)
+        out["vdw_chain"] = chain.astype(np.int32)
+        out["vdw_radius"] = radius
+        out["vdw_excluded"] = excluded
+
+    sym_pairs, sym_atoms, sym_chain, sym_inv_count = _build_symmetric_chains(
+        example, pdam, A)
     if sym_pairs.shape[1]:
         # COM potential: buffer is time-scheduled so bounds are applied in JAX.
         out["symcom_pairs"] = sym_pairs.astype(np.int32)
-        out["symcom_weight"] = sym_weight.astype(np.float32)
+        out["symcom_atoms"] = sym_atoms.astype(np.int32)
+        out["symcom_chain"] = sym_chain.astype(np.int32)
+        out["symcom_inv_count"] = sym_inv_count
 
     return out or None
@@ -0,0 +1,140 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Three-stage streaming pipeline for directory runs: featurise | infer | write.
+
+AlphaFold 3's script handles one target at a time: featurise it on the CPU
+(RDKit conformers, MSA processing), run the model on the GPU, then write the
+mmCIF/JSON outputs — so the GPU idles during the two CPU stages. This module
+overlaps them:
+
+  * a CPU **process pool** featurises the next target(s) ahead of time,
+  * the **caller's thread** runs the model on the current target (JAX stays in
+    one thread, on one device), and
+  * a single **writer thread** flushes the previous target's outputs.
+
+Every stage is bounded (`prefetch` targets featurised ahead, `max_pending_writes`
+targets waiting to be written), so memory stays flat however long the input
+stream is. Targets are pulled from `items` lazily, which keeps it compatible with
+`parallel.WorkQueue.claim_iter` (a target is only claimed shortly before it is
+featurised).
+
+Like `intellifold.parallel`, this module is dependency-free; the stage functions
+are injected by `run_jax_inference`. `prepare` runs in another process, so it
+and its argument must be picklable.
+"""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+from typing import Any, Callable, Hashable, Iterable
+
+
+def run_pipeline(
+    items: Iterable[tuple[Hashable, Any]],
+    prepare: Callable[[Any], Any],
+    infer: Callable[[Any], Any],
+    write: Callable[[Any, Any], None],
+    *,
+    executor: concurrent.futures.Executor,
+    prefetch: int = 1,
+    max_pending_writes: int = 1,
+    on_done: Callable[[Hashable], None] | None = None,
+    on_error: Callable[[Hashable, BaseException], None] | None = None,
+    on_abort: Callable[[Hashable], None] | None = None,
+) -> int:
+  """Streams `(key, payload)` items through prepare -> infer -> write.
+
+  Args:
+    items: `(key, payload)` pairs, consumed lazily in order.
+    prepare: CPU stage, `prepare(payload) -> prepared`, run on `executor`.
+    infer: device stage, `infer(prepared) -> result`, run on this thread.
+    write: output stage, `write(prepared, result)`, run on a writer thread.
+    executor: where `prepare` runs (typically a spawn-context process pool).
+    prefetch: number of targets featurised ahead of the one being inferred.
+    max_pending_writes: number of targets whose outputs may still be in flight
+      before the device stage waits for the writer.
+    on_done: called with the key once a target has been fully written.
+    on_error: called with the key and exception of a failed target. If None,
+      the first failure is re-raised (the sequential script's behaviour).
+    on_abort: called for every unfinished key when the run is interrupted
+      (e.g. KeyboardInterrupt), before the exception propagates.
+
+  Returns:
+    The number of targets that completed all three stages.
+  """
+  items = iter(items)
+  featurising: collections.deque = collections.deque()  # (key, future)
+  writing: collections.deque = collections.deque()      # (key, future)
+  num_done = 0
+
+  def _fill() -> None:
+    while len(featurising) < prefetch + 1:
+      try:
+        key, payload = next(items)
+      except StopIteration:
+        return
+      featurising.append((key, executor.submit(prepare, payload)))
+
+  def _fail(key, err) -> None:
+    if on_error is None:
+      raise err
+    on_error(key, err)
+
+  def _reap(block: bool) -> None:
+    nonlocal num_done
+    while writing and (
+        block or writing[0][1].done() or len(writing) > max_pending_writes
+    ):
+      key, future = writing.popleft()
+      try:
+        future.result()
+      except Exception as e:  # noqa: BLE001
+        _fail(key, e)
+        continue
+      num_done += 1
+      if on_done is not None:
+        on_done(key)
+
+  current = None
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=1, thread_name_prefix='intellifold-writer') as writer:
+    try:
+      _fill()
+      while featurising:
+        current, future = featurising.popleft()
+        # Keep the CPU pool busy with the next target(s) while this one is on
+        # the device.
+        _fill()
+        try:
+          prepared = future.result()
+          result = infer(prepared)
+        except Exception as e:  # noqa: BLE001
+          _fail(current, e)
+          current = None
+          continue
+        writing.append((current, writer.submit(write, prepared, result)))
+        current = None
+        _reap(block=False)
+      _reap(block=True)
+    except BaseException:
+      for key, future in featurising:
+        future.cancel()
+      if on_abort is not None:
+        pending = [k for k, _ in featurising] + [k for k, _ in writing]
+        for key in ([current] if current is not None else []) + pending:
+          on_abort(key)
+      raise
+  return num_done
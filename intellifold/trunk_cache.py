@@ -0,0 +1,109 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk cache of trunk outputs, shared by the JAX and PyTorch engines.
+
+The trunk (recycled pairformer/evoformer) dominates the cost of a prediction, but
+its output only depends on the featurised input, the weights, the number of
+recycles and, where the trunk is stochastic, the seed. Diffusion samples,
+sampling steps and steering settings only affect the heads run after it. With a
+cache directory set, the engines look up the trunk output of every target/seed
+under a key hashing all of that, and on a hit run only diffusion and confidence:
+
+  <cache_dir>/<key>/<name>.npy    one array per trunk output (e.g. single, pair)
+
+Entries are written to a temporary directory and renamed into place, so
+concurrent runs never see a partial entry, and loaded memory-mapped, so a large
+pair representation is only read when it is copied to the device. Entries can be
+deleted at any time; the cache is never required for correctness.
+
+Like `intellifold.parallel`, this module only depends on numpy so both engines
+can import it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Mapping
+
+import numpy as np
+
+# Prefix of the feature keys carrying cached trunk outputs into the JAX model
+# (see `alphafold3.model.model.Model.__call__`).
+TRUNK_KEY_PREFIX = 'trunk__'
+
+
+def fingerprint_arrays(arrays: Mapping[str, Any]) -> str:
+  """A hash of named arrays: their names, dtypes, shapes and contents."""
+  h = hashlib.blake2b(digest_size=16)
+  for name in sorted(arrays):
+    array = np.ascontiguousarray(arrays[name])
+    h.update(f'{name}|{array.dtype.str}|{array.shape}|'.encode())
+    h.update(array.view(np.uint8).reshape(-1) if array.size else b'')
+  return h.hexdigest()
+
+
+def make_key(**parts: Any) -> str:
+  """The cache key of a trunk output from JSON-serialisable parts."""
+  return hashlib.blake2b(
+      json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=16
+  ).hexdigest()
+
+
+class TrunkCache:
+  """Trunk outputs stored as memory-mappable `.npy` files, one entry per key."""
+
+  def __init__(self, cache_dir: str):
+    self.cache_dir = cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+
+  def _entry_dir(self, key: str) -> str:
+    return os.path.join(self.cache_dir, key)
+
+  def load(
+      self, key: str, mmap_mode: str | None = 'r'
+  ) -> dict[str, np.ndarray] | None:
+    """The arrays stored under `key`, memory-mapped; None on a miss."""
+    entry_dir = self._entry_dir(key)
+    try:
+      names = [n for n in os.listdir(entry_dir) if n.endswith('.npy')]
+      arrays = {
+          n[: -len('.npy')]: np.load(
+              os.path.join(entry_dir, n), mmap_mode=mmap_mode
+          )
+          for n in names
+      }
+    except (OSError, ValueError):
+      # Missing, or removed / truncated under us: recompute.
+      return None
+    return arrays or None
+
+  def store(self, key: str, arrays: Mapping[str, np.ndarray]) -> None:
+    """Stores `arrays` under `key` unless an entry already exists."""
+    entry_dir = self._entry_dir(key)
+    if os.path.isdir(entry_dir):
+      return
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{key}.', dir=self.cache_dir)
+    try:
+      for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.asarray(array))
+      os.rename(tmp_dir, entry_dir)
+    except OSError:
+      # Another run stored the same key first (or the disk is full); the
+      # cache is best-effort.
+      shutil.rmtree(tmp_dir, ignore_errors=True)
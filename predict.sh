@@ -20,7 +20,7 @@
 # * `--out_dir` (`PATH`, default: `./`)  
 #   The path where to save the predictions.
 # * `--cache` (`PATH`, default: `~/.intellifold`)  
-#   The directory where to download the data and model. Will use environment variable `INTELLIFOLD_CACHE` as an absolute path if set.
+#   The directory where to download the data and model. Will use environment variable `INTELLIFOLD_CACHE` as an absolute path if set. The chunk sizes tuned for the trunk (per module, token bucket, dtype and GPU memory) are also saved there, in `chunk_size_cache.json`, so only the first target of each size pays for the tuning; delete the file to re-tune.
 # * `--num_workers` (`INTEGER`, default: `4`)  
 #   The number of dataloader workers to use for prediction.
 # * `--precision` (`str`, default: `bf16`)  
@@ -31,6 +31,8 @@
 #   Number of recycling iterations.
 # * `--num_diffusion_samples` (`INTEGER`, default: `5`)  
 #   The number of diffusion samples.
+# * `--seed_batch_size` (`INTEGER`, default: `1`)  
+#   The number of seeds whose diffusion samples are run together in one batch. The trunk is run once per target and shared by all the seeds whenever no MSA is deeper than the MSA sampling depth (the only seed-dependent step of the trunk); otherwise it is re-run for each batch of seeds. Each seed keeps its own random stream, so the samples match those of separate runs up to floating-point rounding. Larger values use the GPU better at the cost of memory.
 # * `--sampling_steps` (`INTEGER`, default: `200`)  
 #   The number of diffusion sampling steps to use.
 # * `--output_format` (`[pdb,mmcif]`, default: `mmcif`)  
@@ -54,6 +56,24 @@
 #   > Before using this option, please make sure the mmseqs2 tool is installed, you can install it by running `conda install -c conda-forge -c bioconda mmseqs2`
 # * `--model` (`[v1, v2, v2-flash]`, default: `v2-flash`)  
 #   The model to use for prediction. Options are 'v1', 'v2', and 'v2-flash'. 'v2-flash' is the default and recommended model, which is faster and more accurate than 'v1' and 'v2'. 'v1' is the original model used in the IntelliFold paper, and 'v2' is an improved version of the model with better performance but slower inference speed than 'v2-flash'. You can choose the model based on your needs and computational resources.
+# * `--low_memory` (`FLAG`, default: `False`)  
+#   Whether to run the trunk and diffusion module with in-place updates. This lowers the peak GPU memory (reported per target in the log) so that larger complexes fit on the same card; the predictions match the default mode up to floating-point rounding.
+# * `--attention_backend` (`[eager, sdpa]`, default: `eager`)  
+#   The attention implementation used by triangle attention, the pair-biased single attention and the atom transformers. `eager` materialises the attention logits; `sdpa` uses PyTorch's fused `scaled_dot_product_attention`, which selects a memory-efficient kernel for the device (also on CPU and on GPUs without a CUTLASS build for the DeepSpeed kernel) and falls back to `eager` where no kernel applies.
+# * `--diffusion_step_backend` (`[eager, compile, cuda_graph]`, default: `eager`)  
+#   The implementation of the diffusion sampling step, which is run `--sampling_steps` times per seed and dominated by kernel-launch overhead for small targets. `compile` runs the step through `torch.compile`; `cuda_graph` captures it once as a CUDA graph and replays it for every step, seed and target with the same padded token count, atom count and number of samples (targets are already padded to token buckets). The captured graph keeps its own copy of the diffusion conditioning, and the step runs eagerly when it cannot be captured (or off the GPU).
+# * `--trunk_cache_dir` (`PATH`, default: `None`)  
+#   Directory of a trunk-output cache. The trunk outputs (single, pair, input embeddings and distogram logits) of every target are stored there as memory-mapped `.npy` files, keyed by a hash of the input features, the model weights, `--model`, `--precision`, `--recycling_iters` and, when the MSA is subsampled, the seed. A later run on the same input, e.g. with more `--num_diffusion_samples`, other `--sampling_steps` or new seeds, loads the trunk output and only runs the diffusion and confidence modules. The entries are large (`N_tokens^2 * 128 * 4` bytes for the pair representation) and can be deleted at any time.
+# * `--msa_cache_dir` (`PATH`, default: `None`)  
+#   Directory of a content-addressed MSA cache shared across targets and runs. With `--use_msa_server`, every MSA returned by the server is stored there: unpaired MSAs keyed by a hash of the chain sequence (and the server settings), paired MSAs keyed by the sorted set of chain sequences. A chain that was searched before, in any target or run, is not sent to the server again, e.g. a receptor shared by thousands of designed binders is searched once. Several runs can share the directory: writes are atomic and runs missing the same MSA wait for the first one to fetch it.
+# * `--msa_cache_max_gb` (`float`, default: `None`)  
+#   Size budget of the MSA cache. When it is exceeded, the least recently used MSAs are deleted. Unbounded by default.
+# * `--num_preprocessing_workers` (`int`, default: `0`)  
+#   Number of worker processes that parse the input files and generate the RDKit conformers of their ligands. With `0`, inputs are parsed one after another in the main process.
+# * `--max_concurrent_msa_requests` (`int`, default: `1`)  
+#   Maximum number of targets whose MSAs (`--use_msa_server`) and templates (`--use_template`) are computed at the same time. These steps mostly wait on the MSA server, so raising this (e.g. to 4-8) together with `--num_preprocessing_workers` shortens the preprocessing of large input directories considerably; the unpaired MSA searches of concurrent targets are batched into shared server tickets. Processed targets are added to `processed/manifest.json` as they finish, so an interrupted run resumes with the missing ones.
+# * `--conformer_cache_dir` (`PATH`, default: `None`)  
+#   Directory of an on-disk store of the RDKit conformers generated for the SMILES ligands of the inputs. Every conformer is stored there keyed by a hash of the molecule (its canonical SMILES plus its atoms and bonds in input order) and the generation settings, so a ligand that was embedded before, in any target or run, is loaded instead of being embedded again, e.g. when screening one receptor against a ligand library several times. Several runs and `--num_preprocessing_workers` can share the directory; entries are small and can be deleted at any time.
 
 
 #!/bin/bash
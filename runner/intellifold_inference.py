@@ -15,7 +15,7 @@ import logging
 import torch
 import torch.nn.functional as F
 from accelerate import Accelerator, DistributedDataParallelKwargs, InitProcessGroupKwargs
-from accelerate.utils import set_seed
+from accelerate.utils import convert_to_fp32, set_seed
 
 from intellifold.openfold.config import model_config
 from intellifold.openfold.inference_config import get_model_config
@@ -24,6 +24,7 @@ from intellifold.openfold.v2_inference_config import get_model_config as get_v2_
 from intellifold.openfold.model.model import IntelliFold
 from intellifold.openfold.utils.atom_token_conversion import aggregate_fn_advanced as aggregate_fn
 from intellifold.openfold.model.confidences import get_summary_confidence, get_full_confidence
+from intellifold.trunk_cache import TrunkCache, fingerprint_arrays, make_key
 
 #### Data Processing
 from intellifold.data.module.inference import get_inference_dataloader, construct_empty_template_features
@@ -45,61 +46,207 @@ def init_logging():
         filemode="w",
     )
     
+def skip_existing_predictions(args, record, out_dir, seed):
+    """
+    Check whether the predictions of a seed already exist.
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments.
+    record : Record
+        The record to use for prediction.
+    out_dir : Path
+        The output directory to save the predictions to.
+    seed : int
+        The random seed to use for prediction.
+    Returns
+    -------
+    bool
+        Whether the seed can be skipped, i.e. it is finished and --override is not set.
+    """
+    struct_dir = out_dir / "predictions" / record.id
+    finished = check_outputs(record, struct_dir, seed, args.num_diffusion_samples, args.output_format)
+    
+    if finished and not args.override:
+        msg = (
+            f"Found existing predictions for [{record.id}] with seed [{seed}], "
+            "If you wish to override these existing predictions, please set the --override flag."
+        )
+        logger.info(msg)
+        return True
+    
+    elif finished and args.override:
+        msg = (
+            f"Found existing predictions for [{record.id}] with seed [{seed}], "
+            "and will be overridden."
+        )
+        logger.info(msg)
+    return False
+
+## trunk outputs used by forward_sampling, stored in the trunk cache
+TRUNK_OUTPUT_KEYS = ("s_inputs", "s", "z", "distogram_logits")
+
+def tensor_fingerprint(tensors):
+    """
+    Hash the tensors of a dict (names, shapes, dtypes and contents) for the trunk cache key.
+    """
+    return fingerprint_arrays({
+        f"{key}{tuple(value.shape)}{value.dtype}": value.detach().reshape(-1).view(torch.uint8).cpu().numpy()
+        for key, value in tensors.items() if torch.is_tensor(value)
+    })
+
+def forward_trunk(model, input_features, trunk_cache=None, trunk_key=None, dtype=None):
+    """
+    Run the trunk, or load its output from the trunk cache.
+    Called under accelerator.autocast(): accelerate only applies --precision to model.forward.
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The (unwrapped) model to use for prediction.
+    input_features : dict
+        The input features to use for prediction.
+    trunk_cache : TrunkCache, optional
+        The trunk cache, if --trunk_cache_dir is set.
+    trunk_key : str, optional
+        The key of the trunk output in the trunk cache.
+    dtype : torch.dtype, optional
+        The dtype the trunk activations must come out in, i.e. the --precision autocast dtype.
+    Returns
+    -------
+    tuple
+        The (reverse_fn, backbone_outputs) to pass to model.forward_sampling.
+    """
+    if trunk_cache is not None:
+        cached = trunk_cache.load(trunk_key, mmap_mode='c')
+        if cached is not None and set(cached) == set(TRUNK_OUTPUT_KEYS):
+            logger.info(f"Loaded the trunk output from the trunk cache [{trunk_key}]")
+            reverse_fn = model.prepare_features(input_features)
+            device = input_features['seq_mask'].device
+            return reverse_fn, {key: torch.from_numpy(value).to(device) for key, value in cached.items()}
+    with torch.no_grad():
+        reverse_fn, backbone_outputs = model.forward_trunk(input_features)
+    if dtype is not None and backbone_outputs['z'].dtype != dtype:
+        raise RuntimeError(
+            f"The trunk ran in {backbone_outputs['z'].dtype} instead of {dtype}, "
+            f"it must be called under accelerator.autocast()"
+        )
+    if trunk_cache is not None:
+        trunk_cache.store(trunk_key, {key: backbone_outputs[key].float().cpu().numpy() for key in TRUNK_OUTPUT_KEYS})
+    return reverse_fn, backbone_outputs
+
+def split_seed_outputs(outputs, num_seeds, diffusion_batch_size):
+    """
+    Split the outputs of a multi-seed forward pass into one output dict per seed.
+    The samples of the seeds are stacked in order along the batch dimension, 
+    per-target outputs (e.g. the distogram) are shared by all the seeds.
+    """
+    if num_seeds == 1:
+        return [outputs]
+    num_samples = num_seeds * diffusion_batch_size
+    return [
+        {
+            key: value[k * diffusion_batch_size:(k + 1) * diffusion_batch_size] 
+            if torch.is_tensor(value) and value.dim() > 0 and value.shape[0] == num_samples else value
+            for key, value in outputs.items()
+        }
+        for k in range(num_seeds)
+    ]
+
 def predict_and_save(
     args,
     model,
     input_features,
+    trunk,
     record,
     structure,
     out_dir,
-    seed,
+    seeds,
+    accelerator,
     ):
     
     """
-    Predict and save the results.
+    Predict and save the results of one or more seeds from one trunk pass.
     Parameters
     ----------
     args : argparse.Namespace
         The command line arguments.
     model : torch.nn.Module
-        The model to use for prediction.
+        The (unwrapped) model to use for prediction.
     input_features : dict
         The input features to use for prediction.
+    trunk : tuple
+        The (reverse_fn, backbone_outputs) returned by model.forward_trunk.
     record : Record
         The record to use for prediction.
     structure : str
         The structure to use for prediction.
     out_dir : Path
         The output directory to save the predictions to.
-    seed : int
-        The random seed to use for prediction.    
+    seeds : list
+        The random seeds to use for prediction, their diffusion samples are run in one batch.
+    accelerator : Accelerator
+        Its autocast applies --precision to the sampling, outputs are returned in fp32 as by the prepared model.
     """
     
     output_dir = out_dir / "predictions"
     struct_dir = output_dir / record.id
     
-    finished = check_outputs(record, struct_dir, seed, args.num_diffusion_samples, args.output_format)
-    
-    if finished and not args.override:
-        msg = (
-            f"Found existing predictions for [{record.id}] with seed [{seed}], "
-            "If you wish to override these existing predictions, please set the --override flag."
+    ## one generator per seed, each seeds the noise of its own block of samples
+    generators = [torch.Generator(device=model.generator.device).manual_seed(seed) for seed in seeds]
+    reverse_fn, backbone_outputs = trunk
+    with torch.no_grad(), accelerator.autocast():
+        outputs = model.forward_sampling(
+            input_features, 
+            backbone_outputs,
+            reverse_fn,
+            diffusion_batch_size=args.num_diffusion_samples,
+            generators=generators,
+            )
+    outputs = convert_to_fp32(outputs)
+    if torch.cuda.is_available():
+        logger.info(
+            f"[{record.id}] seed {seeds}: peak GPU memory {torch.cuda.max_memory_allocated() / 2**30:.2f} GiB "
+            f"(N_tokens: {input_features['N_tokens'].item()}, low_memory: {getattr(args, 'low_memory', False)})"
         )
-        logger.info(msg)
-        return struct_dir
     
-    elif finished and args.override:
-        msg = (
-            f"Found existing predictions for [{record.id}] with seed [{seed}], "
-            "and will be overridden."
-        )
-        logger.info(msg)
+    # Create the output directories
+    output_dir.mkdir(parents=True, exist_ok=True)
+    struct_dir.mkdir(exist_ok=True)
     
-    with torch.no_grad():
-        outputs = model(
-            input_features, 
-            diffusion_batch_size=args.num_diffusion_samples
-            )
+    for seed, seed_outputs in zip(seeds, split_seed_outputs(outputs, len(seeds), args.num_diffusion_samples)):
+        save_predictions(args, seed_outputs, input_features, record, structure, struct_dir, seed)
+    
+    return struct_dir
+
+def save_predictions(
+    args,
+    outputs,
+    input_features,
+    record,
+    structure,
+    struct_dir,
+    seed,
+    ):
+    
+    """
+    Save the structures and confidences of the diffusion samples of one seed.
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments.
+    outputs : dict
+        The model outputs of the seed.
+    input_features : dict
+        The input features used for prediction.
+    record : Record
+        The record to use for prediction.
+    structure : str
+        The structure to use for prediction.
+    struct_dir : Path
+        The directory to save the predictions to.
+    seed : int
+        The random seed used for prediction.    
+    """
         
     x_predicted = outputs['x_predicted'].cpu()
     plddt = outputs['plddt'].cpu()
@@ -110,10 +257,6 @@ def predict_and_save(
     full_confidences_list    = get_full_confidence(outputs, input_features, structure)
     
     ## save the result
-    # Create the output directories
-    output_dir.mkdir(parents=True, exist_ok=True)
-    struct_dir.mkdir(exist_ok=True)
-    
     for i in range(args.num_diffusion_samples):
         
         aggregated_output, _ = aggregate_fn([x_predicted[i:i+1], plddt[i:i+1]], pred_dense_atom_mask)
@@ -145,8 +288,6 @@ def predict_and_save(
         output_path = struct_dir / outname
         with output_path.open("w") as f:
             json.dump(full_confidences, f, indent=1)
-    
-    return struct_dir
 
 def main(args):
     # #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -274,6 +415,7 @@ def main(args):
         logger.info(f"Number Of Recycling: {config.backbone.recycling_iters}")
         logger.info(f"Number Of Workers: {args.num_workers}")
         logger.info(f"Number Of Seeds: {len(seeds)}, Seeds: {seeds}")
+        logger.info(f"Seed Batch Size: {args.seed_batch_size}")
     
     generator = torch.Generator(device=accelerator.device)
     generator.manual_seed(seeds[0])
@@ -287,6 +429,11 @@ def main(args):
         return
     model_state_dict = torch.load(checkpoint_path, map_location=accelerator.device)
     model.load_state_dict(model_state_dict)
+    ## the trunk cache key covers the weights, the input features, the trunk settings and (if the trunk uses it) the seed
+    trunk_cache = None
+    if getattr(args, 'trunk_cache_dir', None):
+        trunk_cache = TrunkCache(args.trunk_cache_dir)
+        weights_fingerprint = tensor_fingerprint(model_state_dict)
     if accelerator.is_main_process:
         logger.info(f"Successfully loaded model weights from {checkpoint_path}")
     model = accelerator.prepare(model)
@@ -332,34 +479,60 @@ def main(args):
             torch.cuda.empty_cache()
             continue
           
-        seed_completion = 0    
-        for seed in seeds:    
-            input_features.update(dict(zip(ref_keys, original_ref_features)))
-            
-            set_seed(seed)  
+        ## the trunk is run once per target and shared by all the seeds when it does not depend on the seed,
+        ## the diffusion samples of up to --seed_batch_size seeds are run in one batch
+        unwrapped_model = model if hasattr(model, 'generator') else model.module
+        seeds_to_run = [seed for seed in seeds if not skip_existing_predictions(args, record, out_dir, seed)]
+        seed_completion = len(seeds) - len(seeds_to_run)
+        struct_dir = out_dir / "predictions" / record.id
+        share_trunk = unwrapped_model.trunk_is_seed_independent(input_features)
+        if trunk_cache is not None:
+            features_fingerprint = tensor_fingerprint(input_features)
+        seed_batch_size = max(1, getattr(args, 'seed_batch_size', 1))
+        trunk_dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}.get(args.precision)
+        trunk = None
+        for start in range(0, len(seeds_to_run), seed_batch_size):
+            seed_group = seeds_to_run[start:start + seed_batch_size]
             #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             # DO THE FORWARD PASS
             #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             torch.cuda.empty_cache()
-            
-            ### set seed
-            if hasattr(model, 'generator'):
-                model.generator.manual_seed(seed)
-            else:
-                model.module.generator.manual_seed(seed)   
+            if torch.cuda.is_available():
+                torch.cuda.reset_peak_memory_stats()
             
             try:   
+                if trunk is None or not share_trunk:
+                    trunk = None
+                    input_features.update(dict(zip(ref_keys, original_ref_features)))
+                    ### set seed
+                    set_seed(seed_group[0])  
+                    trunk_key = None
+                    if trunk_cache is not None:
+                        trunk_key = make_key(
+                            features=features_fingerprint,
+                            weights=weights_fingerprint,
+                            model=args.model,
+                            precision=args.precision,
+                            recycling_iters=args.recycling_iters,
+                            seed=None if share_trunk else seed_group[0],
+                        )
+                    with accelerator.autocast():
+                        trunk = forward_trunk(
+                            unwrapped_model, input_features, trunk_cache, trunk_key, dtype=trunk_dtype,
+                        )
                 # Run the model
                 struct_dir = predict_and_save(
                     args,
-                    model=model,
+                    model=unwrapped_model,
                     input_features=input_features,
+                    trunk=trunk,
                     record=record,
                     structure=structure,
                     out_dir=out_dir,
-                    seed=seed,
+                    seeds=seed_group,
+                    accelerator=accelerator,
                     )
-                seed_completion += 1
+                seed_completion += len(seed_group)
                 torch.cuda.empty_cache()
             except Exception as e:
                 error_msg = f"Error in prediction: {e}{traceback.format_exc()}\n"
@@ -376,6 +549,7 @@ def main(args):
                 gc.collect()
                 torch.cuda.empty_cache()
                 break
+        trunk = None
             
         if seed_completion == len(seeds):
             logger.info(
@@ -455,6 +629,12 @@ def intellifold_cli():
     default=5, 
     help="Batch size for diffusion"
 )
+@click.option(
+    '--seed_batch_size', 
+    type=int, 
+    default=1, 
+    help="Number of seeds whose diffusion samples are run together in one batch (on a trunk shared by the seeds when no MSA is subsampled). Larger values use the GPU better at the cost of memory. Default is 1."
+)
 @click.option(
     '--sampling_steps', 
     type=int, 
@@ -520,6 +700,59 @@ def intellifold_cli():
     help="The model to use for prediction. Default is 'v2-flash'.",
     default="v2-flash",
 )
+@click.option(
+    "--low_memory",
+    is_flag=True,
+    help="Whether to run the trunk and diffusion module with in-place updates to lower the peak GPU memory. Default is False.",
+)
+@click.option(
+    "--attention_backend",
+    type=click.Choice(["eager", "sdpa"]),
+    help="The attention implementation: 'eager' materialises the attention logits, 'sdpa' uses PyTorch's fused scaled_dot_product_attention (memory-efficient kernels on GPUs without a CUTLASS build, and on CPU). Default is 'eager'.",
+    default="eager",
+)
+@click.option(
+    "--diffusion_step_backend",
+    type=click.Choice(["eager", "compile", "cuda_graph"]),
+    help="The diffusion step implementation: 'eager' runs the step op by op, 'compile' uses torch.compile, 'cuda_graph' captures the step as a CUDA graph and replays it for every step, seed and target of the same size. Default is 'eager'.",
+    default="eager",
+)
+@click.option(
+    "--trunk_cache_dir",
+    type=click.Path(),
+    help="Directory of a trunk-output cache. The trunk output of every target is stored there, keyed by a hash of the input features, the model weights, the trunk settings and (when the MSA is subsampled) the seed, so a later run on the same input with other diffusion samples, sampling steps or seeds only runs the diffusion and confidence modules. Disabled by default.",
+    default=None,
+)
+@click.option(
+    "--msa_cache_dir",
+    type=click.Path(),
+    help="Directory of a content-addressed MSA cache shared across targets and runs. MSA server results are stored there, unpaired MSAs keyed by a hash of the chain sequence and paired MSAs by the set of chain sequences, so a chain that was searched before (e.g. a receptor shared by many designs) is never sent to the server again. Safe to share between concurrent runs. Disabled by default.",
+    default=None,
+)
+@click.option(
+    "--msa_cache_max_gb",
+    type=float,
+    help="Size budget of the MSA cache in GB; the least recently used entries are deleted when it is exceeded. Unbounded by default.",
+    default=None,
+)
+@click.option(
+    "--num_preprocessing_workers",
+    type=int,
+    help="Number of worker processes that parse the inputs and generate their RDKit conformers during preprocessing. 0 (default) parses them in the main process.",
+    default=0,
+)
+@click.option(
+    "--max_concurrent_msa_requests",
+    type=int,
+    help="Maximum number of targets whose MSAs (MSA server queries) and templates are computed at the same time during preprocessing, while further inputs are parsed. Default is 1.",
+    default=1,
+)
+@click.option(
+    "--conformer_cache_dir",
+    type=click.Path(),
+    help="Directory of an on-disk store of the RDKit conformers generated for SMILES ligands, shared across targets and runs. Every conformer is stored there keyed by a hash of the molecule (in atom order) and the generation settings, so a ligand seen before, e.g. in a screen of one receptor against a ligand library, is not embedded again. Safe to share between concurrent runs. Disabled by default.",
+    default=None,
+)
 def predict(
     data: str,
     out_dir: str,
@@ -529,6 +762,7 @@ def predict(
     seed: list,
     recycling_iters: int,
     num_diffusion_samples: int,
+    seed_batch_size: int,
     sampling_steps: int,
     output_format: str,
     override: bool,
@@ -540,6 +774,15 @@ def predict(
     only_run_data_process: bool,
     return_similar_seq: bool,
     model: str,
+    low_memory: bool,
+    attention_backend: str,
+    diffusion_step_backend: str,
+    trunk_cache_dir: str,
+    msa_cache_dir: str,
+    msa_cache_max_gb: float,
+    num_preprocessing_workers: int,
+    max_concurrent_msa_requests: int,
+    conformer_cache_dir: str,
     # no_potentials: bool,
 ):
     ## create a argparse.Namespace object
@@ -548,6 +791,7 @@ def predict(
         out_dir=out_dir,
         cache=cache,
         num_diffusion_samples=num_diffusion_samples,
+        seed_batch_size=seed_batch_size,
         sampling_steps=sampling_steps,
         num_workers=num_workers,
         precision=precision,
@@ -563,6 +807,15 @@ def predict(
         only_run_data_process=only_run_data_process,
         return_similar_seq=return_similar_seq,
         model=model,
+        low_memory=low_memory,
+        attention_backend=attention_backend,
+        diffusion_step_backend=diffusion_step_backend,
+        trunk_cache_dir=trunk_cache_dir,
+        msa_cache_dir=msa_cache_dir,
+        msa_cache_max_gb=msa_cache_max_gb,
+        num_preprocessing_workers=num_preprocessing_workers,
+        max_concurrent_msa_requests=max_concurrent_msa_requests,
+        conformer_cache_dir=conformer_cache_dir,
     )
     main(args=args)
 
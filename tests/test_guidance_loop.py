@@ -0,0 +1,67 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Agreement of the on-device steering GD loop with the unrolled one."""
+
+import pytest
+
+jax = pytest.importorskip("jax")
+pytest.importorskip("rdkit")
+
+import jax.numpy as jnp
+import numpy as np
+
+from intellifold.steering import guidance
+from intellifold.steering.benchmark_guidance import (
+    descend_unrolled,
+    ligand_target,
+    make_step,
+)
+
+# Default of --steering_num_gd_steps
+NUM_GD_STEPS = 20
+
+
+@pytest.fixture
+def x64():
+    jax.config.update("jax_enable_x64", True)
+    yield
+    jax.config.update("jax_enable_x64", False)
+
+
+def test_loop_matches_unrolled_on_ligands(x64):
+    steering, conformers = ligand_target(num_copies=5)
+    rng = np.random.default_rng(0)
+    coords = jnp.asarray(
+        conformers + rng.normal(scale=0.5, size=(2, *conformers.shape)),
+        jnp.float32,
+    )
+    t = jnp.asarray(0.3, jnp.float32)
+
+    loop = make_step(guidance.descend, steering, NUM_GD_STEPS)(coords, t)
+    unrolled = make_step(descend_unrolled, steering, NUM_GD_STEPS)(coords, t)
+    steering64 = {
+        k: v.astype(jnp.float64) if v.dtype == jnp.float32 else v
+        for k, v in steering.items()
+    }
+    reference = make_step(guidance.descend, steering64, NUM_GD_STEPS)(
+        coords.astype(jnp.float64), t
+    )
+
+    assert loop.dtype == jnp.float32
+    # The guidance moves the atoms, and by much more than the difference
+    assert float(jnp.max(jnp.abs(loop - coords))) > 0.1
+    diff = float(jnp.max(jnp.abs(loop - unrolled)))
+    assert diff <= 1e-3
+    assert diff <= float(jnp.max(jnp.abs(loop - reference)))
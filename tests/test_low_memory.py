@@ -0,0 +1,185 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Parity of --low_memory (in-place inference) with the default mode.
+
+Runs the v2-flash model (fewer blocks, random weights) on a synthetic target in
+both modes and compares every output. Also runnable as a script, which reports
+the peak GPU memory of both modes on a target of the given size:
+
+    python tests/test_low_memory.py --num_tokens 512 --num_msa 1024
+"""
+
+import argparse
+
+import pytest
+import torch
+import torch.nn.functional as F
+
+from intellifold.openfold.model.model import IntelliFold
+from intellifold.openfold.v2_flash_inference_config import get_model_config
+
+ATOMS_PER_TOKEN = 24
+
+
+def synthetic_features(num_tokens, num_padded_tokens, num_msa, device, seed=0):
+    """Two-chain protein target in the layout of the inference data loader."""
+    g = torch.Generator().manual_seed(seed)
+    n, a = num_tokens, ATOMS_PER_TOKEN
+    pad = num_padded_tokens - num_tokens
+
+    def tokens(t):
+        # Pad the token dimension (first) and add the batch dimension
+        return F.pad(t, (0, 0) * (t.dim() - 1) + (0, pad))[None]
+
+    def pair(t):
+        return F.pad(t, (0, 0) * (t.dim() - 2) + (0, pad, 0, pad))[None]
+
+    atom_mask = torch.arange(a)[None] < torch.randint(4, 12, (n,), generator=g)[:, None]
+    chain = (torch.arange(n) >= n // 2).int() + 1
+    token_mask = torch.ones(n, dtype=torch.bool)
+    msa = torch.randint(0, 20, (num_msa, n), generator=g)
+    msa_mask = torch.ones(num_msa, n)
+
+    f = {
+        "token_index": tokens(torch.arange(n).int() + 1),
+        "residue_index": tokens((torch.arange(n) % (n // 2)).int() + 1),
+        "asym_id": tokens(chain),
+        "entity_id": tokens(chain),
+        "sym_id": tokens(torch.ones(n).int()),
+        "aatype": tokens(F.one_hot(msa[0], 31).float()),
+        "seq_mask": tokens(token_mask),
+        "token_bonds": pair(torch.zeros(n, n)),
+        "is_protein": tokens(token_mask),
+        "is_rna": tokens(~token_mask),
+        "is_dna": tokens(~token_mask),
+        "is_ligand": tokens(~token_mask),
+        "msa": F.one_hot(F.pad(msa, (0, pad)), 32).float()[None],
+        "msa_mask": F.pad(msa_mask, (0, pad))[None],
+        "deletion_value": torch.zeros(1, num_msa, num_padded_tokens),
+        "has_deletion": torch.zeros(1, num_msa, num_padded_tokens),
+        "deletion_mean": torch.zeros(1, num_padded_tokens),
+        "profile": tokens(torch.rand(n, 31, generator=g)),
+        "num_alignments": torch.tensor([num_msa]).int(),
+        "ref_pos": tokens(torch.randn(n, a, 3, generator=g) * atom_mask[..., None]),
+        "ref_element": tokens(
+            F.one_hot(torch.randint(0, 10, (n, a), generator=g), 128).float()
+            * atom_mask[..., None]
+        ),
+        "ref_charge": tokens(torch.zeros(n, a)),
+        "ref_atom_name_chars": tokens(
+            F.one_hot(torch.randint(0, 64, (n, a, 4), generator=g), 64).float()
+            * atom_mask[..., None, None]
+        ),
+        "ref_space_uid": tokens(torch.arange(n).int()[:, None].repeat(1, a)),
+        "ref_mask": tokens(atom_mask),
+        "pred_dense_atom_mask": tokens(atom_mask),
+        "residue_center_index": tokens(torch.zeros(n, dtype=torch.long)),
+        "atom_pseudo_beta_index": tokens(torch.arange(n) * a),
+        "pseudo_beta_mask": tokens(token_mask),
+        "frame_mask": tokens(token_mask),
+        "N_tokens": torch.tensor([n]),
+        # No templates, as construct_empty_template_features
+        "template_aatype": F.one_hot(torch.zeros(1, 4, num_padded_tokens).long(), 31).float(),
+        "template_distogram": torch.zeros(1, 4, num_padded_tokens, num_padded_tokens, 39),
+        "template_pseudo_beta_mask": torch.zeros(1, 4, num_padded_tokens),
+        "template_unit_vector": torch.zeros(1, 4, num_padded_tokens, num_padded_tokens, 3),
+        "template_backbone_frame_mask": torch.zeros(1, 4, num_padded_tokens),
+    }
+    return {k: v.to(device) for k, v in f.items()}
+
+
+def build_model(low_memory, device, num_blocks=2):
+    args = argparse.Namespace(
+        sampling_steps=2, recycling_iters=1, low_memory=low_memory,
+    )
+    config = get_model_config(args)
+    config.backbone.pairformer_stack.no_blocks = num_blocks
+    config.backbone.msa.msa_stack.no_blocks = 1
+    config.diffusion.diffusion_transformer.no_blocks = num_blocks
+    torch.manual_seed(0)
+    model = IntelliFold(config, generator=torch.Generator(device=device))
+    return model.to(device).eval()
+
+
+def run(low_memory, device, num_tokens, num_padded_tokens, num_msa, num_blocks=2):
+    """Outputs of one trunk pass and one sampling pass, and the peak memory."""
+    model = build_model(low_memory, device, num_blocks)
+    features = synthetic_features(num_tokens, num_padded_tokens, num_msa, device)
+    if device.type == "cuda":
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats(device)
+    with torch.no_grad():
+        reverse_fn, trunk = model.forward_trunk(features)
+        outputs = model.forward_sampling(
+            features, trunk, reverse_fn, diffusion_batch_size=2,
+            generators=[torch.Generator(device=device).manual_seed(1)],
+        )
+    peak = torch.cuda.max_memory_allocated(device) if device.type == "cuda" else None
+    outputs.update(s=trunk["s"], z=trunk["z"])
+    outputs = {
+        k: v.float().cpu() for k, v in outputs.items() if torch.is_tensor(v)
+    }
+    del model, features, trunk
+    return outputs, peak
+
+
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def test_low_memory_matches_default():
+    default, _ = run(False, DEVICE, num_tokens=40, num_padded_tokens=48, num_msa=8)
+    low_memory, _ = run(True, DEVICE, num_tokens=40, num_padded_tokens=48, num_msa=8)
+    assert default.keys() == low_memory.keys()
+    for key in default:
+        torch.testing.assert_close(
+            low_memory[key], default[key], atol=1e-4, rtol=1e-4, msg=key
+        )
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="needs CUDA")
+def test_low_memory_lowers_peak_memory():
+    _, default = run(False, DEVICE, num_tokens=248, num_padded_tokens=256, num_msa=64)
+    _, low_memory = run(True, DEVICE, num_tokens=248, num_padded_tokens=256, num_msa=64)
+    assert low_memory <= default
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_tokens", type=int, default=256)
+    parser.add_argument("--num_padded_tokens", type=int, default=None)
+    parser.add_argument("--num_msa", type=int, default=256)
+    parser.add_argument("--num_blocks", type=int, default=2)
+    args = parser.parse_args()
+    num_padded_tokens = args.num_padded_tokens or args.num_tokens
+
+    results = {
+        low_memory: run(
+            low_memory, DEVICE, args.num_tokens, num_padded_tokens,
+            args.num_msa, args.num_blocks,
+        )
+        for low_memory in (False, True)
+    }
+    print(f"device={DEVICE} tokens={args.num_tokens} msa={args.num_msa}")
+    for key, value in results[False][0].items():
+        diff = (results[True][0][key] - value).abs().max().item()
+        print(f"{key:>20} max abs diff {diff:.3e}")
+    for low_memory, (_, peak) in results.items():
+        if peak is not None:
+            print(f"low_memory={low_memory}: peak GPU memory {peak / 2**30:.2f} GiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MMseqs2Client against a local stub of the ColabFold MSA server.
+
+The stub answers tickets at once with an a3m per query (the query and one
+hit), and fails a given fraction of the requests with a 503, or the requests
+scripted in `failures`. Also runnable as a
+script, which serves the stub for manual runs with --msa_server_url:
+
+    python tests/test_mmseqs2_client.py --port 8000 --fail_rate 0.1
+"""
+
+import argparse
+import io
+import itertools
+import json
+import random
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+from intellifold.data.msa.mmseqs2 import FIRST_QUERY_ID, MMseqs2Client, run_mmseqs2
+
+
+class StubMsaServer(ThreadingHTTPServer):
+    """The ticket/poll/download endpoints of a ColabFold server."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, fail_rate=0.0):
+        super().__init__(("127.0.0.1", port), StubMsaHandler)
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.tickets = {}  # id -> (mode, sequences)
+        # Replies to the next requests, before any is served: an HTTP status
+        # or a ticket status such as "RATELIMIT"
+        self.failures = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def result(self, ticket_id):
+        """The result archive of a ticket, in the layout of the real server."""
+        mode, seqs = self.tickets[ticket_id]
+        a3m = "".join(
+            f"{chr(0) if i else ''}>{FIRST_QUERY_ID + i}\n{seq}\n>hit\n{seq}\n"
+            for i, seq in enumerate(seqs)
+        ).encode()
+        if mode.startswith("pair"):
+            names = ["pair.a3m"]
+        else:
+            names = ["uniref.a3m", "bfd.mgnify30.metaeuk30.smag30.a3m"]
+        out = io.BytesIO()
+        with tarfile.open(fileobj=out, mode="w:gz") as tar:
+            for name in names:
+                info = tarfile.TarInfo(name)
+                info.size = len(a3m)
+                tar.addfile(info, io.BytesIO(a3m))
+        return out.getvalue()
+
+
+class StubMsaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, obj):
+        self._reply(200, json.dumps(obj).encode())
+
+    def _failed(self):
+        with self.server.lock:
+            failure = self.server.failures.pop(0) if self.server.failures else None
+        if isinstance(failure, int):
+            self._reply(failure)
+        elif failure is not None:
+            self._json({"status": failure})
+        elif random.random() < self.server.fail_rate:
+            self._reply(503)
+        else:
+            return False
+        return True
+
+    def do_POST(self):
+        if self._failed():
+            return
+        length = int(self.headers["Content-Length"])
+        form = parse_qs(self.rfile.read(length).decode())
+        seqs = form["q"][0].split("\n")[1::2]
+        with self.server.lock:
+            ticket_id = str(next(self.server.ids))
+            self.server.tickets[ticket_id] = (form["mode"][0], seqs)
+        self._json({"id": ticket_id, "status": "COMPLETE"})
+
+    def do_GET(self):
+        if self._failed():
+            return
+        ticket_id = self.path.rsplit("/", 1)[-1]
+        if self.path.startswith("/result/download/"):
+            self._reply(200, self.server.result(ticket_id), "application/gzip")
+        else:
+            self._json({"id": ticket_id, "status": "COMPLETE"})
+
+
+@pytest.fixture
+def server():
+    server = StubMsaServer(fail_rate=0.2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def backoffs(monkeypatch):
+    """The (attempt, base) of every backoff, which is not waited."""
+    calls = []
+
+    def backoff(attempt, base=1.0, cap=60.0):
+        calls.append((attempt, base))
+        return 0.0
+
+    monkeypatch.setattr(MMseqs2Client, "backoff", staticmethod(backoff))
+    return calls
+
+
+def _sequence(i):
+    return "".join(random.Random(i).choices("ACDEFGHIKLMNPQRSTVWY", k=30))
+
+
+def _query_of(a3m):
+    return a3m.split("\n")[1]
+
+
+def test_concurrent_unpaired_searches_share_tickets(server, tmp_path):
+    client = MMseqs2Client(server.url, batch_window=0.5)
+    targets = [[_sequence(i), _sequence(i + 1)] for i in range(24)]
+
+    def search(i):
+        return run_mmseqs2(targets[i], prefix=str(tmp_path / str(i)), client=client)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(search, range(len(targets))))
+
+    for seqs, a3ms in zip(targets, results):
+        assert [_query_of(a3m) for a3m in a3ms] == seqs
+    assert len(server.tickets) < len(targets)
+
+
+def test_paired_search_keeps_its_own_ticket(server, tmp_path):
+    client = MMseqs2Client(server.url)
+    seqs = [_sequence(0), _sequence(1)]
+    a3ms = run_mmseqs2(
+        seqs, prefix=str(tmp_path / "target"), use_pairing=True, client=client
+    )
+    assert [_query_of(a3m) for a3m in a3ms] == seqs
+    assert [mode for mode, _ in server.tickets.values()] == ["pairgreedy-env"]
+
+
+def test_failed_requests_are_retried(server, tmp_path, backoffs):
+    server.fail_rate = 0.0
+    # Two server errors on submission, then a rate limit, then an error
+    # while downloading the result
+    server.failures = [503, 502, "RATELIMIT", 500]
+    client = MMseqs2Client(server.url)
+    (a3m,) = run_mmseqs2(_sequence(0), prefix=str(tmp_path / "0"), client=client)
+    assert _query_of(a3m) == _sequence(0)
+    # Requests back off from attempt 0 per request; rate limits on a 5 s base
+    assert backoffs == [(0, 1.0), (1, 1.0), (0, 5.0), (0, 1.0)]
+    assert len(server.tickets) == 1
+
+
+def test_retries_give_up(server, tmp_path, backoffs):
+    server.failures = [503] * 3
+    client = MMseqs2Client(server.url, max_retries=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        run_mmseqs2(_sequence(0), prefix=str(tmp_path / "0"), client=client)
+    assert backoffs == [(0, 1.0), (1, 1.0)]
+
+
+def test_serial_search_skips_batch_window(server, tmp_path):
+    client = MMseqs2Client(server.url, batch_window=10.0)
+    start = time.monotonic()
+    for i in range(3):
+        (a3m,) = run_mmseqs2(_sequence(i), prefix=str(tmp_path / str(i)), client=client)
+        assert _query_of(a3m) == _sequence(i)
+    assert time.monotonic() - start < 5.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fail_rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubMsaServer(args.port, args.fail_rate)
+    print(f"Serving a stub MSA server at {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
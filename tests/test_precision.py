@@ -0,0 +1,65 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+--precision bf16 for the split trunk / sampling calls of the runners.
+
+accelerate applies the autocast of --precision only to the prepared model's
+forward, so the runners call forward_trunk and forward_sampling under
+accelerator.autocast(). These tests check that the trunk activations then come
+out in bf16, and that the runner's check rejects a trunk run without it.
+"""
+
+import pytest
+import torch
+
+from test_low_memory import DEVICE, build_model, synthetic_features
+
+
+def _trunk_and_sampling(autocast):
+    model = build_model(False, DEVICE)
+    features = synthetic_features(24, 32, 4, DEVICE)
+    with torch.no_grad(), torch.autocast(DEVICE.type, torch.bfloat16, enabled=autocast):
+        reverse_fn, trunk = model.forward_trunk(features)
+        outputs = model.forward_sampling(
+            features, trunk, reverse_fn, diffusion_batch_size=1,
+            generators=[torch.Generator(device=DEVICE).manual_seed(0)],
+        )
+    return trunk, outputs
+
+
+def test_trunk_runs_in_bf16_under_autocast():
+    trunk, outputs = _trunk_and_sampling(autocast=True)
+    assert trunk["s"].dtype == torch.bfloat16
+    assert trunk["z"].dtype == torch.bfloat16
+    assert outputs["x_predicted"].isfinite().all()
+
+
+def test_trunk_runs_in_fp32_without_autocast():
+    trunk, _ = _trunk_and_sampling(autocast=False)
+    assert trunk["z"].dtype == torch.float32
+
+
+def test_runner_rejects_trunk_outside_autocast():
+    pytest.importorskip("accelerate")
+    pytest.importorskip("numba")
+    from run_intellifold import forward_trunk
+
+    model = build_model(False, DEVICE)
+    features = synthetic_features(24, 32, 4, DEVICE)
+    with pytest.raises(RuntimeError, match="autocast"):
+        forward_trunk(model, features, dtype=torch.bfloat16)
+    with torch.autocast(DEVICE.type, torch.bfloat16):
+        _, trunk = forward_trunk(model, features, dtype=torch.bfloat16)
+    assert trunk["z"].dtype == torch.bfloat16
@@ -0,0 +1,129 @@
+# Copyright 2026 IntelliGen-AI and/or its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Numerical parity of the SDPA attention backend with the eager one."""
+
+import math
+
+import pytest
+import torch
+
+from intellifold.openfold.model import primitives
+from intellifold.openfold.model.primitives import (
+    Attention,
+    _attention,
+    _sdpa_attention,
+    set_attention_backend,
+)
+
+# Batch, rows (I), heads, queries, keys, channels: a triangle-attention layout
+B, I, H, Q, K, C = 1, 12, 4, 12, 12, 16
+
+TOLERANCES = {
+    torch.float32: dict(atol=1e-5, rtol=1e-5),
+    torch.bfloat16: dict(atol=2e-2, rtol=2e-2),
+}
+
+
+def _inputs(dtype, with_mask, with_bias, seed=0):
+    g = torch.Generator().manual_seed(seed)
+    q, k, v = (
+        torch.randn(B, I, H, n, C, generator=g) for n in (Q, K, K)
+    )
+    q = q / math.sqrt(C)
+    biases = []
+    if with_mask:
+        mask = torch.rand(B, I, 1, 1, K, generator=g) > 0.2
+        mask[..., 0] = True  # keep at least one key per row
+        biases.append(1e9 * (mask.float() - 1))
+    if with_bias:
+        biases.append(torch.randn(B, 1, H, Q, K, generator=g))
+    cast = lambda t: t.to(dtype)
+    return cast(q), cast(k), cast(v), [cast(b) for b in biases]
+
+
+def _reference(q, k, v, biases):
+    # Eager attention in fp32, on copies: it adds the biases in place
+    return _attention(
+        q.float(), k.float(), v.float(), [b.float().clone() for b in biases]
+    )
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.bfloat16])
+@pytest.mark.parametrize("with_mask", [False, True])
+@pytest.mark.parametrize("with_bias", [False, True])
+def test_sdpa_matches_eager(dtype, with_mask, with_bias):
+    q, k, v, biases = _inputs(dtype, with_mask, with_bias)
+    expected = _reference(q, k, v, biases)
+    eager = _attention(q, k, v, [b.clone() for b in biases]).float()
+    sdpa = _sdpa_attention(q, k, v, biases).float()
+    torch.testing.assert_close(sdpa, expected, **TOLERANCES[dtype])
+    torch.testing.assert_close(eager, expected, **TOLERANCES[dtype])
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.bfloat16])
+def test_sdpa_chunks_broadcast_mask(dtype, monkeypatch):
+    # A budget below one row forces one SDPA call per row of I
+    monkeypatch.setattr(primitives, "SDPA_MASK_CHUNK_NUMEL", 1)
+    q, k, v, biases = _inputs(dtype, with_mask=True, with_bias=True)
+    calls = []
+    sdpa = torch.nn.functional.scaled_dot_product_attention
+
+    def counting_sdpa(*args, **kwargs):
+        calls.append(kwargs["attn_mask"].shape)
+        return sdpa(*args, **kwargs)
+
+    monkeypatch.setattr(
+        torch.nn.functional, "scaled_dot_product_attention", counting_sdpa
+    )
+    out = _sdpa_attention(q, k, v, biases).float()
+    assert len(calls) == I
+    assert all(shape == (B, 1, H, Q, K) for shape in calls)
+    torch.testing.assert_close(
+        out, _reference(q, k, v, biases), **TOLERANCES[dtype]
+    )
+
+
+def test_attention_module_backends_agree():
+    torch.manual_seed(0)
+    module = Attention(c_q=32, c_k=32, c_v=32, c_hidden=C, no_heads=H)
+    x = torch.randn(B, I, Q, 32)
+    _, _, _, biases = _inputs(torch.float32, with_mask=True, with_bias=True)
+    with torch.no_grad():
+        set_attention_backend(module, "eager")
+        eager = module(x, x, biases=[b.clone() for b in biases])
+        set_attention_backend(module, "sdpa")
+        sdpa = module(x, x, biases=biases)
+    torch.testing.assert_close(sdpa, eager, **TOLERANCES[torch.float32])
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="needs CUDA")
+def test_sdpa_peak_memory_below_logits(monkeypatch):
+    monkeypatch.setattr(primitives, "SDPA_MASK_CHUNK_NUMEL", 2**20)
+    n, heads = 256, 4
+    device = torch.device("cuda")
+    q, k, v = (
+        torch.randn(1, n, heads, n, 32, device=device, dtype=torch.bfloat16)
+        for _ in range(3)
+    )
+    mask = torch.zeros(1, n, 1, 1, n, device=device, dtype=torch.bfloat16)
+    bias = torch.randn(1, 1, heads, n, n, device=device, dtype=torch.bfloat16)
+    logits_bytes = n * heads * n * n * q.element_size()
+
+    torch.cuda.synchronize()
+    start = torch.cuda.memory_allocated()
+    torch.cuda.reset_peak_memory_stats()
+    _sdpa_attention(q, k, v, [mask, bias])
+    torch.cuda.synchronize()
+    assert torch.cuda.max_memory_allocated() - start < logits_bytes / 4
@@ -24,6 +24,7 @@ import os
 import pathlib
 import site
 
+from alphafold3.constants import chemical_components
 import alphafold3.constants.converters
 from alphafold3.constants.converters import ccd_pickle_gen
 from alphafold3.constants.converters import chemical_component_sets_gen
@@ -56,3 +57,5 @@ def build_data():
   chemical_component_sets_gen.main(
       ['', str(chemical_component_sets_pickle_path)]
   )
+  # Build the memory-mapped CCD store while the package directory is writable.
+  chemical_components.Ccd(ccd_pickle_path)
@@ -28,6 +28,7 @@ of silently executing attacker-controlled bytecode.
 """
 
 from collections.abc import Collection
+import io
 import pickle
 from typing import Any, BinaryIO, Final
 
@@ -72,3 +73,8 @@ def load(file_obj: BinaryIO) -> Any:
   """
 
   return _RestrictedUnpickler(file_obj).load()
+
+
+def loads(data: bytes) -> Any:
+  """Safely loads pickle data from bytes, see `load`."""
+  return load(io.BytesIO(data))
@@ -19,11 +19,13 @@
 
 """Chemical Components found in PDB (CCD) constants."""
 
-from collections.abc import ItemsView, Iterator, KeysView, Mapping, Sequence, ValuesView
+from collections.abc import Iterator, Mapping, Sequence
 import dataclasses
 import functools
 import os
+import pickle
 
+from absl import logging
 from alphafold3.common import resources
 from alphafold3.common import safe_pickle
 from alphafold3.cpp import cif_dict
@@ -34,11 +36,37 @@ _CCD_PICKLE_FILE = resources.filename(
 )
 
 
+def _encode_component(component: Mapping[str, Sequence[str]]) -> bytes:
+  return pickle.dumps(component, protocol=pickle.HIGHEST_PROTOCOL)
+
+
 @functools.cache
 def _load_ccd_pickle_cached(
     path: os.PathLike[str],
-) -> dict[str, Mapping[str, Sequence[str]]]:
-  """Loads the CCD pickle file and caches it so that it is only loaded once."""
+) -> Mapping[str, Mapping[str, Sequence[str]]]:
+  """Opens the CCD once per process, memory-mapped where possible.
+
+  The pickle is converted once into a memory-mapped store next to it (see
+  `intellifold.ccd_store`), so processes decode only the components they use
+  and share the rest through the page cache. Falls back to unpickling the
+  whole file if the store cannot be written, or without IntelliFold installed.
+  """
+  try:
+    from intellifold import ccd_store
+  except ImportError:
+    ccd_store = None
+  if ccd_store is not None:
+    try:
+      return ccd_store.open_for_pickle(
+          path,
+          load=safe_pickle.load,
+          encode=_encode_component,
+          decode=safe_pickle.loads,
+      )
+    except OSError as e:
+      logging.warning(
+          'Cannot use a CCD store for %s (%s), unpickling it.', path, e
+      )
   with open(path, 'rb') as f:
     return safe_pickle.load(f)
 
@@ -49,10 +77,11 @@ class Ccd(Mapping[str, Mapping[str, Sequence[str]]]):
   See https://academic.oup.com/bioinformatics/article/31/8/1274/212200 for CCD
   CIF format documentation.
 
-  Wraps the dict to prevent accidental mutation.
+  Wraps the (shared, memory-mapped) CCD to prevent accidental mutation; a user
+  CCD is kept in a separate overlay.
   """
 
-  __slots__ = ('_dict', '_ccd_pickle_path')
+  __slots__ = ('_dict', '_user_dict', '_ccd_pickle_path')
 
   def __init__(
       self,
@@ -71,29 +100,34 @@ class Ccd(Mapping[str, Mapping[str, Sequence[str]]]):
     """
     self._ccd_pickle_path = ccd_pickle_path or _CCD_PICKLE_FILE
     self._dict = _load_ccd_pickle_cached(self._ccd_pickle_path)
+    self._user_dict = {}
 
     if user_ccd is not None:
       if not user_ccd:
         raise ValueError('User CCD cannot be an empty string.')
-      user_ccd_cifs = {
+      self._user_dict = {
           key: value.to_dict()
           for key, value in cif_dict.parse_multi_data_cif(user_ccd).items()
       }
-      self._dict.update(user_ccd_cifs)
 
   def __getitem__(self, key: object) -> Mapping[str, Sequence[str]]:
     if not isinstance(key, str):
       raise TypeError(f'The CCD key must be a string, got {type(key)}')
+    if key in self._user_dict:
+      return self._user_dict[key]
     return self._dict[key]
 
   def __contains__(self, key: object) -> bool:
-    return key in self._dict
+    return key in self._user_dict or key in self._dict
 
   def __iter__(self) -> Iterator[str]:
-    return self._dict.__iter__()
+    yield from self._user_dict
+    for key in self._dict:
+      if key not in self._user_dict:
+        yield key
 
   def __len__(self) -> int:
-    return len(self._dict)
+    return len(self._dict) + sum(k not in self._dict for k in self._user_dict)
 
   def __hash__(self) -> int:
     return id(self)  # Ok since this is immutable.
@@ -101,17 +135,10 @@ class Ccd(Mapping[str, Mapping[str, Sequence[str]]]):
   def get(  # pyrefly: ignore[bad-override]
       self, key: str, default: None | Mapping[str, Sequence[str]] = None
   ) -> Mapping[str, Sequence[str]] | None:
+    if key in self._user_dict:
+      return self._user_dict[key]
     return self._dict.get(key, default)
 
-  def items(self) -> ItemsView[str, Mapping[str, Sequence[str]]]:
-    return self._dict.items()
-
-  def values(self) -> ValuesView[Mapping[str, Sequence[str]]]:
-    return self._dict.values()
-
-  def keys(self) -> KeysView[str]:
-    return self._dict.keys()
-
 
 @dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
 class ComponentInfo:
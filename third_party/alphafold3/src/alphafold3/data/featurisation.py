@@ -52,6 +52,7 @@ def featurise_input(
     conformer_max_iterations: int | None = None,
     resolve_msa_overlaps: bool = True,
     fix_standalone_glycans: bool = False,
+    conformer_cache_dir: str | None = None,
     verbose: bool = False,
 ) -> Sequence[features.BatchDict]:
   """Featurise the folding input.
@@ -82,10 +83,13 @@ def featurise_input(
       undesirable behavior, but moves away from the regime where AlphaFold 3 was
       trained and evaluated. This has only an effect if filter_leaving_atoms is
       True in the WholePdbPipeline.Config.
+    conformer_cache_dir: Optional directory of an on-disk store of the RDKit
+      reference conformers, shared across targets, seeds and runs.
     verbose: Whether to print progress messages.
 
   Returns:
-    A featurised batch for each rng_seed in the input.
+    A featurised batch for each rng_seed in the input. The seed-independent
+    features are computed once, so the batches share those arrays.
   """
   validate_fold_input(fold_input)
 
@@ -97,16 +101,27 @@ def featurise_input(
           conformer_max_iterations=conformer_max_iterations,
           resolve_msa_overlaps=resolve_msa_overlaps,
           fix_standalone_glycans=fix_standalone_glycans,
+          conformer_cache_dir=conformer_cache_dir,
       ),
   )
 
+  # Everything but the reference conformers is independent of the seed, so it
+  # is computed once and shared by the batches of all seeds.
+  featurisation_start_time = time.time()
+  prepared = data_pipeline.prepare_item(fold_input=fold_input, ccd=ccd)
+  if verbose:
+    print(
+        'Featurising seed-independent data took'
+        f' {time.time() - featurisation_start_time:.2f} seconds.'
+    )
+
   batches = []
   for rng_seed in fold_input.rng_seeds:
     featurisation_start_time = time.time()
     if verbose:
       print(f'Featurising data with seed {rng_seed}.')
-    batch = data_pipeline.process_item(
-        fold_input=fold_input,
+    batch = data_pipeline.process_prepared_item(
+        prepared,
         ccd=ccd,
         random_state=np.random.RandomState(rng_seed),
         random_seed=rng_seed,
@@ -209,6 +209,20 @@ def _get_rna_msa(
   return rna_msa
 
 
+def _msa_cache_settings(*run_configs: msa_config.RunConfig) -> dict[str, str]:
+  """The search settings an MSA cache entry depends on (not CPUs/sharding)."""
+  return {
+      run_config.config.database_config.name: repr((
+          run_config.config.database_config.path,
+          run_config.config.e_value,
+          run_config.config.z_value,
+          run_config.config.max_sequences,
+          run_config.crop_size,
+      ))
+      for run_config in run_configs
+  }
+
+
 @dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
 class DataPipelineConfig:
   """The configuration for the data pipeline.
@@ -260,6 +274,10 @@ class DataPipelineConfig:
       parallel. If None, one Nhmmer instance will be run per shard. Only
       applicable if the database is sharded.
     max_template_date: The latest date of templates to use.
+    msa_cache_dir: Directory of a content-addressed MSA cache shared across
+      targets and runs (see `intellifold.msa_cache`). If None, every chain is
+      searched.
+    msa_cache_max_bytes: Size budget of the MSA cache. If None, unbounded.
   """
 
   # Binary paths.
@@ -297,6 +315,10 @@ class DataPipelineConfig:
 
   max_template_date: datetime.date
 
+  # Optional MSA cache.
+  msa_cache_dir: str | None = None
+  msa_cache_max_bytes: int | None = None
+
 
 class DataPipeline:
   """Runs the alignment tools and assembles the input features."""
@@ -463,6 +485,60 @@ class DataPipeline:
     )
     self._pdb_database_path = data_pipeline_config.pdb_database_path
 
+    self._msa_cache = None
+    self._msa_cache_lib = None
+    if data_pipeline_config.msa_cache_dir is not None:
+      # Imported here so AF3 works without IntelliFold when it is not used.
+      from intellifold import msa_cache as msa_cache_lib
+
+      self._msa_cache_lib = msa_cache_lib
+      self._msa_cache = msa_cache_lib.MsaCache(
+          data_pipeline_config.msa_cache_dir,
+          max_bytes=data_pipeline_config.msa_cache_max_bytes,
+      )
+    self._protein_msa_cache_settings = _msa_cache_settings(
+        self._uniref90_msa_config,
+        self._mgnify_msa_config,
+        self._small_bfd_msa_config,
+        self._uniprot_msa_config,
+    )
+    self._rna_msa_cache_settings = _msa_cache_settings(
+        self._nt_rna_msa_config,
+        self._rfam_msa_config,
+        self._rnacentral_msa_config,
+    )
+
+  def _get_cached_protein_msas(self, sequence: str) -> tuple[str, str]:
+    """The unpaired and paired MSA of a sequence, searched on a cache miss.
+
+    AlphaFold 3 pairs MSAs at featurisation time, so the paired (UniProt) MSA
+    is a per-chain search too and is keyed by the chain alone.
+    """
+    settings = self._protein_msa_cache_settings
+
+    def compute(missing):
+      unpaired_msa, paired_msa, _ = _get_protein_msa_and_templates(
+          sequence=sequence,
+          run_template_search=False,
+          uniref90_msa_config=self._uniref90_msa_config,
+          mgnify_msa_config=self._mgnify_msa_config,
+          small_bfd_msa_config=self._small_bfd_msa_config,
+          uniprot_msa_config=self._uniprot_msa_config,
+          templates_config=self._templates_config,
+          pdb_database_path=self._pdb_database_path,
+      )
+      a3ms = (unpaired_msa.to_a3m(), paired_msa.to_a3m())
+      return [a3ms[i] for i in missing]
+
+    unpaired_msa, paired_msa = self._msa_cache.get_or_compute(
+        [
+            self._msa_cache_lib.unpaired_key(sequence, **settings),
+            self._msa_cache_lib.paired_key([sequence], **settings),
+        ],
+        compute,
+    )
+    return unpaired_msa, paired_msa
+
   def process_protein_chain(
       self, chain: folding_input.ProteinChain
   ) -> folding_input.ProteinChain:
@@ -473,18 +549,30 @@ class DataPipeline:
 
     if not has_unpaired_msa and not has_paired_msa and not chain.templates:
       # MSA None - search. Templates either [] - don't search, or None - search.
-      unpaired_msa, paired_msa, template_hits = _get_protein_msa_and_templates(
-          sequence=chain.sequence,
-          run_template_search=not has_templates,  # Skip template search if [].
-          uniref90_msa_config=self._uniref90_msa_config,
-          mgnify_msa_config=self._mgnify_msa_config,
-          small_bfd_msa_config=self._small_bfd_msa_config,
-          uniprot_msa_config=self._uniprot_msa_config,
-          templates_config=self._templates_config,
-          pdb_database_path=self._pdb_database_path,
-      )
-      unpaired_msa = unpaired_msa.to_a3m()
-      paired_msa = paired_msa.to_a3m()
+      if self._msa_cache is not None:
+        unpaired_msa, paired_msa = self._get_cached_protein_msas(chain.sequence)
+        template_hits = _get_protein_templates(
+            sequence=chain.sequence,
+            input_msa_a3m=unpaired_msa,
+            run_template_search=not has_templates,
+            templates_config=self._templates_config,
+            pdb_database_path=self._pdb_database_path,
+        )
+      else:
+        unpaired_msa, paired_msa, template_hits = (
+            _get_protein_msa_and_templates(
+                sequence=chain.sequence,
+                run_template_search=not has_templates,  # Skip search if [].
+                uniref90_msa_config=self._uniref90_msa_config,
+                mgnify_msa_config=self._mgnify_msa_config,
+                small_bfd_msa_config=self._small_bfd_msa_config,
+                uniprot_msa_config=self._uniprot_msa_config,
+                templates_config=self._templates_config,
+                pdb_database_path=self._pdb_database_path,
+            )
+        )
+        unpaired_msa = unpaired_msa.to_a3m()
+        paired_msa = paired_msa.to_a3m()
       templates = [
           folding_input.Template(
               mmcif=struc.to_mmcif(),
@@ -570,12 +658,23 @@ class DataPipeline:
       ).to_a3m()
       unpaired_msa = chain.unpaired_msa or empty_msa
     else:
-      unpaired_msa = _get_rna_msa(
+      get_rna_msa_a3m = lambda: _get_rna_msa(
           sequence=chain.sequence,
           nt_rna_msa_config=self._nt_rna_msa_config,
           rfam_msa_config=self._rfam_msa_config,
           rnacentral_msa_config=self._rnacentral_msa_config,
       ).to_a3m()
+      if self._msa_cache is not None:
+        (unpaired_msa,) = self._msa_cache.get_or_compute(
+            [
+                self._msa_cache_lib.unpaired_key(
+                    chain.sequence, **self._rna_msa_cache_settings
+                )
+            ],
+            lambda missing: [get_rna_msa_a3m()],
+        )
+      else:
+        unpaired_msa = get_rna_msa_a3m()
     return folding_input.RnaChain(
         id=chain.id,
         sequence=chain.sequence,
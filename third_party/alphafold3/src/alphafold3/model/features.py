@@ -23,7 +23,7 @@ from collections.abc import Mapping, Sequence
 import dataclasses
 import datetime
 import itertools
-from typing import Any, Self, TypeAlias
+from typing import Any, Self, TYPE_CHECKING, TypeAlias
 
 from absl import logging
 from alphafold3 import structure
@@ -47,6 +47,10 @@ import jax.numpy as jnp
 import numpy as np
 from rdkit import Chem
 
+if TYPE_CHECKING:
+  # Only imported when a conformer cache is used, so AF3 works without it.
+  from intellifold import conformer_cache as conformer_cache_lib
+
 
 xnp_ndarray: TypeAlias = np.ndarray | jnp.ndarray  # pylint: disable=invalid-name
 BatchDict: TypeAlias = dict[str, xnp_ndarray]
@@ -1548,6 +1552,7 @@ def get_reference(
     random_state: np.random.RandomState,
     ref_max_modified_date: datetime.date,
     conformer_max_iterations: int | None,
+    conformer_cache: 'conformer_cache_lib.ConformerCache | None' = None,
 ) -> tuple[dict[str, Any], Any, Any]:
   """Reference structure for residue from CCD or SMILES.
 
@@ -1564,6 +1569,8 @@ def get_reference(
       modified to be allowed to use reference coordinates.
     conformer_max_iterations: Optional override for maximum number of iterations
       to run for RDKit conformer search.
+    conformer_cache: Optional on-disk store of the RDKit conformers, shared
+      across targets, seeds and runs.
 
   Returns:
     Mapping from atom names to features, from_atoms, dest_atoms.
@@ -1613,12 +1620,29 @@ def get_reference(
   # an RDKit conformer.
   if mol is not None:
     conformer_random_seed = int(random_state.randint(1, 1 << 31))
-    conformer = rdkit_utils.get_random_conformer(
-        mol=mol,
-        random_seed=conformer_random_seed,
-        max_iterations=conformer_max_iterations,
-        logging_name=res_name,
-    )
+
+    def get_conformer():
+      return rdkit_utils.get_random_conformer(
+          mol=mol,
+          random_seed=conformer_random_seed,
+          max_iterations=conformer_max_iterations,
+          logging_name=res_name,
+      )
+
+    if conformer_cache is None:
+      conformer = get_conformer()
+    else:
+      from intellifold import conformer_cache as conformer_cache_lib
+
+      conformer = conformer_cache.get_or_compute(
+          conformer_cache_lib.molecule_key(
+              mol,
+              method='etkdg_v3',
+              random_seed=conformer_random_seed,
+              max_iterations=conformer_max_iterations,
+          ),
+          get_conformer,
+      )
     if conformer:
       for idx, atom in enumerate(mol.GetAtoms()):
         atom_names.append(atom.GetProp('atom_name'))
@@ -1695,6 +1719,7 @@ class RefStructure:
       ref_max_modified_date: datetime.date,
       conformer_max_iterations: int | None,
       ligand_ligand_bonds: atom_layout.AtomLayout | None = None,
+      conformer_cache: 'conformer_cache_lib.ConformerCache | None' = None,
   ) -> tuple[Self, Any]:
     """Reference structure information for each residue."""
 
@@ -1733,6 +1758,7 @@ class RefStructure:
               random_state=random_state,
               ref_max_modified_date=ref_max_modified_date,
               conformer_max_iterations=conformer_max_iterations,
+              conformer_cache=conformer_cache,
           )
           conformations[(chain_id, res_id)] = conf
 
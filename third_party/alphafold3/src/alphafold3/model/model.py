@@ -237,6 +237,8 @@ class Model(hk.Module):
     num_recycles: int = 10
     return_embeddings: bool = False
     return_distogram: bool = False
+    # Return the full-precision trunk outputs (for a trunk cache).
+    return_trunk: bool = False
 
   def __init__(self, config: Config, name: str = 'diffuser'):
     super().__init__(name=name)
@@ -286,6 +288,14 @@ class Model(hk.Module):
         for k, v in batch.items()
         if k.startswith(steering_prefix)
     } or None
+    # Trunk outputs loaded from a trunk cache replace the trunk pass; they are
+    # attached on the host like the steering arrays.
+    trunk_prefix = 'trunk__'
+    cached_trunk = {
+        k[len(trunk_prefix):]: v
+        for k, v in batch.items()
+        if k.startswith(trunk_prefix)
+    } or None
 
     batch = feat_batch.Batch.from_data_dict(batch)
 
@@ -323,7 +333,13 @@ class Model(hk.Module):
         ),
         'target_feat': target_feat,
     }
-    if hk.running_init():
+    if cached_trunk is not None:
+      embeddings = {
+          'pair': cached_trunk['pair'].astype(jnp.float32),
+          'single': cached_trunk['single'].astype(jnp.float32),
+          'target_feat': target_feat,
+      }
+    elif hk.running_init():
       embeddings, _ = recycle_body(None, (embeddings, key))
     else:
       # Number of recycles is number of additional forward trunk passes.
@@ -363,6 +379,9 @@ class Model(hk.Module):
     if self.config.return_embeddings:
       output['single_embeddings'] = embeddings['single']
       output['pair_embeddings'] = embeddings['pair']
+    if self.config.return_trunk and cached_trunk is None:
+      output['trunk_single'] = embeddings['single']
+      output['trunk_pair'] = embeddings['pair']
     return output
 
   @classmethod
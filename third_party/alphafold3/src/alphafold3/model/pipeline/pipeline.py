@@ -21,6 +21,7 @@
 
 import bisect
 from collections.abc import Mapping, Sequence
+import dataclasses
 import datetime
 import itertools
 
@@ -31,6 +32,7 @@ from alphafold3.common import folding_input
 from alphafold3.constants import chemical_components
 from alphafold3.model import feat_batch
 from alphafold3.model import features
+from alphafold3.model.atom_layout import atom_layout
 from alphafold3.model.pipeline import inter_chain_bonds
 from alphafold3.model.pipeline import structure_cleaning
 from alphafold3.structure import chemical_components as struc_chem_comps
@@ -83,6 +85,59 @@ class MmcifNumChainsError(Exception):
   """Raised if the mmcif file contains too many / too few chains."""
 
 
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class PreparedStructure:
+  """The seed-independent features of a structure.
+
+  Only the random reference conformers (and the ligand-ligand bond features and,
+  without deterministic frames, the frames derived from them) depend on the
+  seed, so `WholePdbPipeline.prepare_structure` computes everything else once
+  and `WholePdbPipeline.process_prepared` completes it for each seed.
+
+  Attributes:
+    name: Name of the structure, for logging.
+    all_tokens: Token layout, see `features.tokenizer`.
+    all_token_atoms_layout: Atom layout of the tokens.
+    padding_shapes: Padding shapes of every feature.
+    chemical_components_data: Chemical components used for the reference
+      structures.
+    ligand_ligand_bonds: Bonds between ligands of the cleaned structure, before
+      adding the intra-ligand bonds.
+    frames: Frames from the fixed-seed reference structure, if the pipeline
+      uses deterministic frames, else None.
+  """
+
+  name: str
+  all_tokens: atom_layout.AtomLayout
+  all_token_atoms_layout: atom_layout.AtomLayout
+  padding_shapes: features.PaddingShapes
+  chemical_components_data: struc_chem_comps.ChemicalComponentsData
+  ligand_ligand_bonds: atom_layout.AtomLayout | None
+  msa: features.MSA
+  templates: features.Templates
+  token_features: features.TokenFeatures
+  predicted_structure_info: features.PredictedStructureInfo
+  polymer_ligand_bond_info: features.PolymerLigandBondInfo
+  pseudo_beta_info: features.PseudoBetaInfo
+  atom_cross_att: features.AtomCrossAtt
+  convert_model_output: features.ConvertModelOutput
+  frames: features.Frames | None
+
+  def seed_independent_data_dict(self) -> features.BatchDict:
+    """The shared features, keyed like `feat_batch.Batch.as_data_dict`."""
+    return {
+        **self.msa.as_data_dict(),
+        **self.templates.as_data_dict(),
+        **self.token_features.as_data_dict(),
+        **self.predicted_structure_info.as_data_dict(),
+        **self.polymer_ligand_bond_info.as_data_dict(),
+        **self.pseudo_beta_info.as_data_dict(),
+        **self.atom_cross_att.as_data_dict(),
+        **self.convert_model_output.as_data_dict(),
+        **(self.frames.as_data_dict() if self.frames is not None else {}),
+    }
+
+
 class WholePdbPipeline:
   """Processes an entire mmcif entity and merges the content."""
 
@@ -136,6 +191,9 @@ class WholePdbPipeline:
         undesirable behavior, but moves away from the regime where AlphaFold 3
         was trained and evaluated. This has only an effect if
         drop_ligand_leaving_atoms is True.
+      conformer_cache_dir: Optional directory of an on-disk store of the RDKit
+        reference conformers, shared across targets, seeds and runs (see
+        `intellifold.conformer_cache`). If None, every conformer is generated.
     """
 
     max_atoms_per_token: int = 24
@@ -157,6 +215,7 @@ class WholePdbPipeline:
     conformer_max_iterations: int | None = None
     resolve_msa_overlaps: bool = True
     fix_standalone_glycans: bool = False
+    conformer_cache_dir: str | None = None
 
   def __init__(self, *, config: Config):
     """Initializes WholePdb data pipeline.
@@ -165,24 +224,26 @@ class WholePdbPipeline:
       config: Pipeline configuration.
     """
     self._config = config
+    self._conformer_cache = None
+    if config.conformer_cache_dir:
+      # Imported here so AF3 works without IntelliFold when it is not used.
+      from intellifold import conformer_cache as conformer_cache_lib
 
-  def process_structure(
+      self._conformer_cache = conformer_cache_lib.ConformerCache(
+          config.conformer_cache_dir
+      )
+
+  def prepare_structure(
       self,
       struct: structure.Structure,
-      random_state: np.random.RandomState,
       ccd: chemical_components.Ccd,
       unpaired_msa_by_chain_id: Mapping[str, str],
       paired_msa_by_chain_id: Mapping[str, str],
       templates_by_chain_id: Mapping[str, Sequence[folding_input.Template]],
-      random_seed: int | None = None,
-  ) -> feat_batch.Batch:
-    """Computes features for a structure and associated MSAs/templates."""
-    if random_seed is None:
-      random_seed = random_state.randint(2**31)
-
-    random_state = np.random.RandomState(seed=random_seed)
-    logging_name = f'{struct.name}, random_seed={random_seed}'
-    logging.info('Processing %s', logging_name)
+  ) -> PreparedStructure:
+    """Computes the features of a structure that do not depend on the seed."""
+    logging_name = struct.name
+    logging.info('Preparing %s', logging_name)
 
     # Clean structure.
     cleaned_struc = structure_cleaning.clean_structure(
@@ -357,21 +418,10 @@ class WholePdbPipeline:
         logging_name=logging_name,
     )
 
-    ref_max_modified_date = self._config.ref_max_modified_date
-    conformer_max_iterations = self._config.conformer_max_iterations
-    batch_ref_structure, ligand_ligand_bonds = (
-        features.RefStructure.compute_features(
-            all_token_atoms_layout=all_token_atoms_layout,
-            ccd=ccd,
-            padding_shapes=padding_shapes,
-            chemical_components_data=chemical_components_data,
-            random_state=random_state,
-            ref_max_modified_date=ref_max_modified_date,
-            conformer_max_iterations=conformer_max_iterations,
-            ligand_ligand_bonds=ligand_ligand_bonds,
-        )
-    )
-    deterministic_ref_structure = None
+    # The deterministic reference structure uses a fixed seed, so it (and the
+    # frames built from it) is shared by every seed. Its features do not depend
+    # on the ligand-ligand bonds passed in, only the returned bonds do.
+    batch_frames = None
     if self._config.deterministic_frames:
       deterministic_ref_structure, _ = features.RefStructure.compute_features(
           all_token_atoms_layout=all_token_atoms_layout,
@@ -381,9 +431,16 @@ class WholePdbPipeline:
           random_state=(
               np.random.RandomState(_DETERMINISTIC_FRAMES_RANDOM_SEED)
           ),
-          ref_max_modified_date=ref_max_modified_date,
+          ref_max_modified_date=self._config.ref_max_modified_date,
           conformer_max_iterations=None,
           ligand_ligand_bonds=ligand_ligand_bonds,
+          conformer_cache=self._conformer_cache,
+      )
+      batch_frames = features.Frames.compute_features(
+          all_tokens=all_tokens,
+          all_token_atoms_layout=all_token_atoms_layout,
+          ref_structure=deterministic_ref_structure,
+          padding_shapes=padding_shapes,
       )
 
     # Create ligand-polymer bond features.
@@ -393,12 +450,6 @@ class WholePdbPipeline:
         bond_layout=polymer_ligand_bonds,
         padding_shapes=padding_shapes,
     )
-    # Create ligand-ligand bond features.
-    ligand_ligand_bond_info = features.LigandLigandBondInfo.compute_features(
-        all_tokens,
-        ligand_ligand_bonds,
-        padding_shapes,
-    )
 
     # Create the Pseudo-beta layout for distogram head and distance error head.
     batch_pseudo_beta_info = features.PseudoBetaInfo.compute_features(
@@ -408,43 +459,114 @@ class WholePdbPipeline:
         logging_name=logging_name,
     )
 
-    # Frame construction.
-    batch_frames = features.Frames.compute_features(
+    return PreparedStructure(
+        name=struct.name,
         all_tokens=all_tokens,
         all_token_atoms_layout=all_token_atoms_layout,
-        ref_structure=(
-            deterministic_ref_structure
-            if self._config.deterministic_frames
-            else batch_ref_structure
-        ),
         padding_shapes=padding_shapes,
-    )
-
-    # Assemble the Batch object.
-    batch = feat_batch.Batch(
+        chemical_components_data=chemical_components_data,
+        ligand_ligand_bonds=ligand_ligand_bonds,
         msa=batch_msa,
         templates=batch_templates,
         token_features=batch_token_features,
-        ref_structure=batch_ref_structure,
         predicted_structure_info=batch_predicted_structure_info,
         polymer_ligand_bond_info=polymer_ligand_bond_info,
-        ligand_ligand_bond_info=ligand_ligand_bond_info,
         pseudo_beta_info=batch_pseudo_beta_info,
         atom_cross_att=batch_atom_cross_att,
         convert_model_output=batch_convert_model_output,
         frames=batch_frames,
     )
 
+  def process_prepared(
+      self,
+      prepared: PreparedStructure,
+      random_state: np.random.RandomState,
+      ccd: chemical_components.Ccd,
+      random_seed: int | None = None,
+  ) -> feat_batch.Batch:
+    """Completes the features of a prepared structure for one seed."""
+    if random_seed is None:
+      random_seed = random_state.randint(2**31)
+
+    random_state = np.random.RandomState(seed=random_seed)
+    logging.info('Processing %s, random_seed=%d', prepared.name, random_seed)
+
+    batch_ref_structure, ligand_ligand_bonds = (
+        features.RefStructure.compute_features(
+            all_token_atoms_layout=prepared.all_token_atoms_layout,
+            ccd=ccd,
+            padding_shapes=prepared.padding_shapes,
+            chemical_components_data=prepared.chemical_components_data,
+            random_state=random_state,
+            ref_max_modified_date=self._config.ref_max_modified_date,
+            conformer_max_iterations=self._config.conformer_max_iterations,
+            ligand_ligand_bonds=prepared.ligand_ligand_bonds,
+            conformer_cache=self._conformer_cache,
+        )
+    )
+
+    # Create ligand-ligand bond features.
+    ligand_ligand_bond_info = features.LigandLigandBondInfo.compute_features(
+        prepared.all_tokens,
+        ligand_ligand_bonds,
+        prepared.padding_shapes,
+    )
+
+    # Frame construction.
+    batch_frames = prepared.frames
+    if batch_frames is None:
+      batch_frames = features.Frames.compute_features(
+          all_tokens=prepared.all_tokens,
+          all_token_atoms_layout=prepared.all_token_atoms_layout,
+          ref_structure=batch_ref_structure,
+          padding_shapes=prepared.padding_shapes,
+      )
+
+    # Assemble the Batch object.
+    batch = feat_batch.Batch(
+        msa=prepared.msa,
+        templates=prepared.templates,
+        token_features=prepared.token_features,
+        ref_structure=batch_ref_structure,
+        predicted_structure_info=prepared.predicted_structure_info,
+        polymer_ligand_bond_info=prepared.polymer_ligand_bond_info,
+        ligand_ligand_bond_info=ligand_ligand_bond_info,
+        pseudo_beta_info=prepared.pseudo_beta_info,
+        atom_cross_att=prepared.atom_cross_att,
+        convert_model_output=prepared.convert_model_output,
+        frames=batch_frames,
+    )
+
     return batch
 
-  def process_item(
+  def process_structure(
       self,
-      fold_input: folding_input.Input,
+      struct: structure.Structure,
       random_state: np.random.RandomState,
       ccd: chemical_components.Ccd,
+      unpaired_msa_by_chain_id: Mapping[str, str],
+      paired_msa_by_chain_id: Mapping[str, str],
+      templates_by_chain_id: Mapping[str, Sequence[folding_input.Template]],
       random_seed: int | None = None,
-  ) -> features.BatchDict:
-    """Takes requests from in_queue, adds (key, serialized ex) to out_queue."""
+  ) -> feat_batch.Batch:
+    """Computes features for a structure and associated MSAs/templates."""
+    prepared = self.prepare_structure(
+        struct=struct,
+        ccd=ccd,
+        unpaired_msa_by_chain_id=unpaired_msa_by_chain_id,
+        paired_msa_by_chain_id=paired_msa_by_chain_id,
+        templates_by_chain_id=templates_by_chain_id,
+    )
+    return self.process_prepared(
+        prepared, random_state=random_state, ccd=ccd, random_seed=random_seed
+    )
+
+  def prepare_item(
+      self,
+      fold_input: folding_input.Input,
+      ccd: chemical_components.Ccd,
+  ) -> PreparedStructure:
+    """Computes the seed-independent features of a fold input, once."""
     struct = fold_input.to_structure(ccd=ccd)
     unpaired_msa_by_chain_id = {}
     paired_msa_by_chain_id = {}
@@ -458,25 +580,64 @@ class WholePdbPipeline:
         paired_msa_by_chain_id[chain.id] = chain.paired_msa
         templates_by_chain_id[chain.id] = list(chain.templates)
 
-    batch = self.process_structure(
+    prepared = self.prepare_structure(
         struct=struct,
-        random_state=random_state,
         ccd=ccd,
         unpaired_msa_by_chain_id=unpaired_msa_by_chain_id,
         paired_msa_by_chain_id=paired_msa_by_chain_id,
         templates_by_chain_id=templates_by_chain_id,
-        random_seed=random_seed,
     )
-    np_example = batch.as_data_dict()
+    # The shared features are checked once here, the per-seed ones in
+    # `process_prepared_item`.
+    _check_no_nans(
+        prepared.seed_independent_data_dict(), prepared.name, random_seed=None
+    )
+    return prepared
 
-    for name, value in np_example.items():
-      if (
-          value.dtype.kind not in {'U', 'S'}
-          and value.dtype.name != 'object'
-          and np.isnan(np.sum(value))
-      ):
-        raise NanDataError(
-            f'Data pipeline output for struct.name={struct.name},'
-            f' random_seed={random_seed} contains NaNs. NaN feature: {name}'
-        )
-    return np_example
+  def process_prepared_item(
+      self,
+      prepared: PreparedStructure,
+      random_state: np.random.RandomState,
+      ccd: chemical_components.Ccd,
+      random_seed: int | None = None,
+  ) -> features.BatchDict:
+    """The features of a prepared fold input for one seed."""
+    batch = self.process_prepared(
+        prepared, random_state=random_state, ccd=ccd, random_seed=random_seed
+    )
+    seed_dependent = {
+        **batch.ref_structure.as_data_dict(),
+        **batch.ligand_ligand_bond_info.as_data_dict(),
+        **batch.frames.as_data_dict(),
+    }
+    _check_no_nans(seed_dependent, prepared.name, random_seed=random_seed)
+    return batch.as_data_dict()
+
+  def process_item(
+      self,
+      fold_input: folding_input.Input,
+      random_state: np.random.RandomState,
+      ccd: chemical_components.Ccd,
+      random_seed: int | None = None,
+  ) -> features.BatchDict:
+    """Takes requests from in_queue, adds (key, serialized ex) to out_queue."""
+    prepared = self.prepare_item(fold_input, ccd=ccd)
+    return self.process_prepared_item(
+        prepared, random_state=random_state, ccd=ccd, random_seed=random_seed
+    )
+
+
+def _check_no_nans(
+    np_example: features.BatchDict, name: str, random_seed: int | None
+) -> None:
+  for feature_name, value in np_example.items():
+    if (
+        value.dtype.kind not in {'U', 'S'}
+        and value.dtype.name != 'object'
+        and np.isnan(np.sum(value))
+    ):
+      raise NanDataError(
+          f'Data pipeline output for struct.name={name},'
+          f' random_seed={random_seed} contains NaNs. NaN feature:'
+          f' {feature_name}'
+      )